@@ -0,0 +1,90 @@
+"""
+Mede o tempo e a memória alocada, por execução do script, do caminho de dados do dashboard
+(obtenção do conjunto de dados, opções dos filtros, filtragem, indicadores e espécies da lista)
+sobre dados sintéticos, comparando:
+
+- antes: conjunto de dados em st.cache_data, desserializado (pickle) a cada execução, com os
+  valores dos filtros, os dados filtrados e os indicadores recalculados a cada vez;
+- depois: conjunto de dados imutável compartilhado (st.cache_resource), com opções pré-calculadas
+  e indicadores/espécies presentes em cache por filtros.
+
+Uso: python benchmarks/bench_execucao.py [--registros 100000 1000000] [--repeticoes 5]
+"""
+import argparse
+import os
+import pickle
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dashbirds_motor as motor  # noqa: E402
+from dados_sinteticos import gerar_tabela_base, gerar_tabela_dados  # noqa: E402
+
+
+def execucao_antes(dados_serializados, filtros):
+    dados = pickle.loads(dados_serializados)
+    tabela_dados = dados['tabela_dados']
+    sorted(tabela_dados['Year'].unique())
+    sorted(tabela_dados['Location'].unique())
+    sorted(dados['tabela_base']['Habitat (AVONET)'].dropna().unique())
+    dados_filtrados = motor.filtrar_dados(tabela_dados, dados['indice_filtros'], filtros)
+    motor.calcular_indicadores(dados_filtrados, dados['tabela_especies'])
+    dados_filtrados['species_id'].unique()
+
+
+def execucao_depois(dados, filtros):
+    dados['opcoes_filtros']['Year']
+    motor.obter_indicadores(dados, filtros)
+    motor.selecionar_lista_especies(dados, filtros, 'geral')
+
+
+def medir(executar, repeticoes):
+    """Mediana do tempo (ms) e do pico de memória alocada (MB) por execução"""
+    tempos = []
+    picos = []
+    for _ in range(repeticoes):
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        executar()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        picos.append(tracemalloc.get_traced_memory()[1] / 2 ** 20)
+        tracemalloc.stop()
+    return statistics.median(tempos), statistics.median(picos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--registros', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--especies', type=int, default=1000)
+    parser.add_argument('--locais', type=int, default=300)
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'registros':>10} {'filtros':>8} {'caminho':>8} {'tempo (ms)':>11} {'pico (MB)':>10}")
+
+    for n_registros in args.registros:
+        tabela_base, tabela_dados = motor.processar_dados(
+            gerar_tabela_base(args.especies),
+            gerar_tabela_dados(n_registros, args.especies, args.locais)
+        )
+        dados = motor.montar_conjunto_dados({'versao': str(n_registros)}, tabela_base, tabela_dados)
+        dados_serializados = pickle.dumps(dados)
+
+        cenarios = [
+            ('nenhum', {}),
+            ('ano', {'Year': dados['opcoes_filtros']['Year'][-1]})
+        ]
+        for nome, filtros in cenarios:
+            for caminho, executar in [
+                ('antes', lambda: execucao_antes(dados_serializados, filtros)),
+                ('depois', lambda: execucao_depois(dados, filtros))
+            ]:
+                tempo, pico = medir(executar, args.repeticoes)
+                print(f"{n_registros:>10} {nome:>8} {caminho:>8} {tempo:>11.1f} {pico:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
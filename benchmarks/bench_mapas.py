@@ -0,0 +1,56 @@
+"""
+Mede o tempo de construção e o tamanho do HTML dos mapas de riqueza e de ocorrência
+sobre dados sintéticos, com e sem a troca automática para mapa de calor/agrupamento.
+
+Uso: python benchmarks/bench_mapas.py [--registros 1000 10000 100000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dashbirds_motor as motor  # noqa: E402
+import dashbirds_visualizacoes as visualizacoes  # noqa: E402
+from dados_sinteticos import gerar_tabela_base, gerar_tabela_dados  # noqa: E402
+
+
+def medir(construir):
+    """Tempo (s) para construir e renderizar o mapa e tamanho do HTML gerado (KB)"""
+    inicio = time.perf_counter()
+    html = construir().get_root().render()
+    return time.perf_counter() - inicio, len(html.encode('utf-8')) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--registros', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--especies', type=int, default=500)
+    parser.add_argument('--locais', type=int, default=300)
+    args = parser.parse_args()
+
+    limite_padrao = visualizacoes.LIMITE_PONTOS_MAPA
+    print(f"{'registros':>10} {'mapa':>10} {'modo':>12} {'tempo (s)':>10} {'HTML (KB)':>10}")
+
+    for n_registros in args.registros:
+        tabela_base, tabela_dados = motor.processar_dados(
+            gerar_tabela_base(args.especies),
+            gerar_tabela_dados(n_registros, args.especies, args.locais)
+        )
+        especie = tabela_dados['Scientific Name'].value_counts().index[0]
+
+        for modo, limite in [('geojson', float('inf')), ('automatico', limite_padrao)]:
+            visualizacoes.LIMITE_PONTOS_MAPA = limite
+            for nome, construir in [
+                ('riqueza', lambda: visualizacoes.gerar_mapa_riqueza(tabela_dados)),
+                ('ocorrencia', lambda: visualizacoes.gerar_mapa_ocorrencia(tabela_dados, especie))
+            ]:
+                tempo, tamanho = medir(construir)
+                print(f"{n_registros:>10} {nome:>10} {modo:>12} {tempo:>10.3f} {tamanho:>10.0f}")
+
+    visualizacoes.LIMITE_PONTOS_MAPA = limite_padrao
+
+
+if __name__ == '__main__':
+    main()
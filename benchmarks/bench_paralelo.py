@@ -0,0 +1,128 @@
+"""
+Mede o tempo total (relógio de parede) das construções de uma execução completa do dashboard
+(indicadores, gráfico geral, lista de espécies, mapa geral, gráfico de sazonalidade e mapa de
+ocorrência da espécie e perfis sazonais), com as escolhas padrão dos widgets e sem cache,
+comparando:
+
+- sequencial: uma construção depois da outra, como na execução do script sem o pool;
+- pool de N threads: todas disparadas juntas, como em antecipar_secoes (dashbirds.py).
+
+Cada repetição usa uma versão nova dos dados, de modo que nenhuma construção vem dos caches.
+O ganho depende do número de processadores e da parte de cada construção que libera o GIL
+(agregações do NumPy e do pandas); a montagem das figuras do Plotly e do HTML dos mapas é
+Python puro e não se sobrepõe. A linha 'limite' é o tempo da construção mais lenta, abaixo do
+qual nenhum pool chega, com o ganho máximo correspondente.
+
+Uso: python benchmarks/bench_paralelo.py [--registros 100000 1000000] [--trabalhadores 2 4]
+                                         [--repeticoes 3]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import dashbirds_motor as motor  # noqa: E402
+import dashbirds_visualizacoes as visualizacoes  # noqa: E402
+from dados_sinteticos import gerar_tabela_base, gerar_tabela_dados  # noqa: E402
+
+
+def construcoes_execucao(dados, filtros):
+    """Construções de uma execução completa com as escolhas padrão dos widgets (ver antecipar_secoes)"""
+    def grafico_sazonalidade():
+        return visualizacoes.obter_grafico_sazonalidade(dados, filtros, motor.especie_exibida(dados, filtros))
+
+    def mapa_ocorrencia():
+        return visualizacoes.obter_html_mapa(dados, filtros, 'ocorrencia', motor.especie_exibida(dados, filtros))
+
+    return [
+        lambda: motor.obter_indicadores(dados, filtros),
+        lambda: visualizacoes.obter_grafico_geral(dados, filtros, 'familias'),
+        lambda: motor.selecionar_lista_especies(dados, filtros, 'geral'),
+        lambda: visualizacoes.obter_html_mapa(dados, filtros, 'riqueza'),
+        grafico_sazonalidade,
+        mapa_ocorrencia,
+        lambda: visualizacoes.obter_grafico_perfis_sazonais(dados, filtros, 4)
+    ]
+
+
+def executar_sequencial(construcoes):
+    """Executa as construções em sequência; retorna o tempo (s) de cada uma"""
+    tempos = []
+    for construir in construcoes:
+        inicio = time.perf_counter()
+        construir()
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+
+def executar_em_pool(construcoes, executor):
+    for futuro in [executor.submit(construir) for construir in construcoes]:
+        futuro.result()
+
+
+def medir(executar, dados, filtros, repeticoes, rotulo):
+    """
+    Mediana do tempo (s) de parede das construções e o que executar retornou em cada
+    repetição, cada uma sobre uma versão nova dos dados
+    """
+    tempos = []
+    retornos = []
+    for repeticao in range(repeticoes):
+        dados_versao = {**dados, 'versao': f"{dados['versao']}-{rotulo}-{repeticao}"}
+        construcoes = construcoes_execucao(dados_versao, filtros)
+        inicio = time.perf_counter()
+        retornos.append(executar(construcoes))
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos), retornos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--registros', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--especies', type=int, default=1000)
+    parser.add_argument('--locais', type=int, default=300)
+    parser.add_argument('--trabalhadores', type=int, nargs='+', default=[2, 4])
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"processadores: {os.cpu_count()}")
+    print(f"{'registros':>10} {'filtros':>8} {'execução':>14} {'tempo (s)':>10} {'ganho':>7}")
+
+    for n_registros in args.registros:
+        tabela_base, tabela_dados = motor.processar_dados(
+            gerar_tabela_base(args.especies),
+            gerar_tabela_dados(n_registros, args.especies, args.locais)
+        )
+        dados = motor.montar_conjunto_dados({'versao': str(n_registros)}, tabela_base, tabela_dados)
+
+        # Aquecimento: importações tardias e primeiras figuras do Plotly fora da medição
+        executar_sequencial(construcoes_execucao({**dados, 'versao': 'aquecimento'}, {}))
+
+        cenarios = [
+            ('nenhum', {}),
+            ('ano', {'Year': dados['opcoes_filtros']['Year'][-1]})
+        ]
+        for nome, filtros in cenarios:
+            sequencial, tempos_construcoes = medir(
+                executar_sequencial, dados, filtros, args.repeticoes, f"{nome}-sequencial"
+            )
+            limite = statistics.median(max(tempos) for tempos in tempos_construcoes)
+            print(f"{n_registros:>10} {nome:>8} {'sequencial':>14} {sequencial:>10.3f} {1:>7.2f}")
+            print(f"{n_registros:>10} {nome:>8} {'limite':>14} {limite:>10.3f} {sequencial / limite:>7.2f}")
+
+            for trabalhadores in args.trabalhadores:
+                with ThreadPoolExecutor(max_workers=trabalhadores) as executor:
+                    tempo, _ = medir(
+                        lambda construcoes: executar_em_pool(construcoes, executor),
+                        dados, filtros, args.repeticoes, f"{nome}-pool{trabalhadores}"
+                    )
+                print(f"{n_registros:>10} {nome:>8} {f'pool de {trabalhadores}':>14} {tempo:>10.3f} "
+                      f"{sequencial / tempo:>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+"""
+Mede, sobre dados sintéticos e sem rede, o tempo de cada etapa do pipeline do dashboard:
+processamento das planilhas, montagem do conjunto de dados, filtragem, indicadores, cada
+gráfico (gerar_grafico_*), a matriz de sazonalidade, a grade espacial dos mapas de riqueza e
+cada mapa (gerar_mapa_*, incluindo a renderização do HTML).
+
+Os resultados são gravados em JSON (benchmarks/resultados/pipeline_<data>.json) e podem ser
+comparados com uma execução anterior; a comparação termina com código 1 se alguma etapa ficou
+mais lenta que o limite de regressão.
+
+Uso:
+    python benchmarks/bench_pipeline.py [--registros 1000 100000 1000000 10000000]
+                                        [--especies 1000] [--locais 300] [--repeticoes 3]
+    python benchmarks/bench_pipeline.py --comparar benchmarks/resultados/pipeline_<data>.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+import dashbirds_motor as motor  # noqa: E402
+import dashbirds_visualizacoes as visualizacoes  # noqa: E402
+from dados_sinteticos import gerar_tabela_base, gerar_tabela_dados  # noqa: E402
+
+DIRETORIO_RESULTADOS = os.path.join(RAIZ, 'benchmarks', 'resultados')
+
+# Diferença mínima (s) para uma etapa mais lenta contar como regressão, abaixo dela é ruído
+DIFERENCA_MINIMA_REGRESSAO = 0.005
+
+
+def cronometrar(executar, repeticoes, preparar=None):
+    """Tempos (s) de cada repetição; 'preparar' roda antes de cada uma, fora da medição"""
+    tempos = []
+    for _ in range(repeticoes):
+        argumentos = preparar() if preparar else ()
+        inicio = time.perf_counter()
+        executar(*argumentos)
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+
+def renderizar(mapa):
+    return mapa.get_root().render() if mapa is not None else None
+
+
+def sem_cache_resumos():
+    """Preparação que esvazia o cache de resumos, para medir a construção e não a consulta"""
+    motor._cache_resumos.itens.clear()
+    return ()
+
+
+def etapas_pipeline(tabela_base_bruta, tabela_dados_bruta):
+    """
+    Lista de (nome da etapa, função, preparação) na ordem do pipeline. As etapas seguintes ao
+    processamento usam um conjunto de dados processado uma única vez.
+    """
+    tabela_base, tabela_dados = motor.processar_dados(tabela_base_bruta.copy(), tabela_dados_bruta.copy())
+    # Versão distinta por tamanho: os caches do motor são indexados pela versão dos dados
+    metadados = {'versao': f"benchmark-{len(tabela_dados)}"}
+    dados = motor.montar_conjunto_dados(metadados, tabela_base, tabela_dados)
+
+    ano = dados['opcoes_filtros']['Year'][-1]
+    local = tabela_dados['Location'].value_counts().index[0]
+    filtro_ano = {'Year': ano}
+    filtro_ano_local = {'Year': ano, 'Location': local}
+    dados_ano = motor.filtrar_dados(tabela_dados, dados['indice_filtros'], filtro_ano)
+    especie = tabela_dados['Scientific Name'].value_counts().index[0]
+    indice_especies = motor.construir_indice_especies(tabela_dados)
+    detalhe = motor.detalhe_especie(indice_especies, especie)
+
+    etapas = [
+        ('processar_dados', motor.processar_dados,
+         lambda: (tabela_base_bruta.copy(), tabela_dados_bruta.copy())),
+        ('montar_conjunto_dados',
+         lambda: motor.montar_conjunto_dados(metadados, tabela_base, tabela_dados), None),
+        ('filtrar_dados[ano]',
+         lambda: motor.filtrar_dados(tabela_dados, dados['indice_filtros'], filtro_ano), None),
+        ('filtrar_dados[ano+local]',
+         lambda: motor.filtrar_dados(tabela_dados, dados['indice_filtros'], filtro_ano_local), None),
+        ('calcular_indicadores[todos]',
+         lambda: motor.calcular_indicadores(tabela_dados, dados['tabela_especies']), None),
+        ('calcular_indicadores[ano]',
+         lambda: motor.calcular_indicadores(dados_ano, dados['tabela_especies']), None),
+    ]
+
+    # Gráficos gerais como o dashboard os gera: sobre o cubo de agregação
+    for tipo, gerar in visualizacoes.GRAFICOS_GERAIS.items():
+        etapas.append((f"{gerar.__name__}[cubo]", lambda gerar=gerar: gerar(dados['cubo'], tabela_base), None))
+
+    etapas += [
+        ('gerar_grafico_sazonalidade[varredura]',
+         lambda: visualizacoes.gerar_grafico_sazonalidade(tabela_dados, especie), None),
+        ('gerar_grafico_sazonalidade[indice]',
+         lambda: visualizacoes.gerar_grafico_sazonalidade(tabela_dados, especie, detalhe['mensal']), None),
+        ('construir_sazonalidade',
+         lambda: motor.construir_sazonalidade(tabela_dados, len(dados['tabela_especies'])), None),
+        ('sazonalidade_filtrada[ano+local]',
+         lambda: motor.sazonalidade_filtrada(dados, filtro_ano_local), sem_cache_resumos),
+        ('agrupar_perfis_sazonais[4]',
+         lambda: motor.agrupar_perfis_sazonais(motor.sazonalidade_filtrada(dados, {}), 4), None),
+        ('gerar_mapa_riqueza[todos]', lambda: renderizar(visualizacoes.gerar_mapa_riqueza(tabela_dados)), None),
+        ('gerar_mapa_riqueza[ano]', lambda: renderizar(visualizacoes.gerar_mapa_riqueza(dados_ano)), None),
+        ('construir_grade[1 km]', lambda: motor.construir_grade(tabela_dados, 1.0), None),
+        ('riqueza_por_celula[1 km, ano]', lambda: motor.riqueza_por_celula(dados, filtro_ano, 1.0), None),
+        ('gerar_mapa_riqueza_grade[1 km]',
+         lambda: renderizar(visualizacoes.gerar_mapa_riqueza_grade(*motor.riqueza_por_celula(dados, {}, 1.0))),
+         None),
+        ('gerar_mapa_ocorrencia',
+         lambda: renderizar(visualizacoes.gerar_mapa_ocorrencia(tabela_dados.take(detalhe['posicoes']), especie)),
+         None),
+        ('construir_indice_especies', lambda: motor.construir_indice_especies(tabela_dados), None),
+        ('selecionar_lista_especies[ano]',
+         lambda: motor.selecionar_lista_especies(dados, filtro_ano, 'geral'), None),
+    ]
+    return etapas
+
+
+def ambiente():
+    """Versões e máquina da execução, gravadas com os resultados para comparação"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'plataforma': platform.platform(),
+        'processadores': os.cpu_count()
+    }
+
+
+def executar_benchmark(args):
+    resultados = []
+    print(f"{'registros':>10} {'etapa':<42} {'mediana (s)':>12} {'mínimo (s)':>11}")
+
+    for n_registros in args.registros:
+        tabela_base_bruta = gerar_tabela_base(args.especies)
+        tabela_dados_bruta = gerar_tabela_dados(n_registros, args.especies, args.locais)
+
+        for nome, executar, preparar in etapas_pipeline(tabela_base_bruta, tabela_dados_bruta):
+            tempos = cronometrar(executar, args.repeticoes, preparar)
+            resultados.append({
+                'etapa': nome,
+                'registros': n_registros,
+                'especies': args.especies,
+                'locais': args.locais,
+                'repeticoes': args.repeticoes,
+                'mediana_s': statistics.median(tempos),
+                'minimo_s': min(tempos)
+            })
+            print(f"{n_registros:>10} {nome:<42} {statistics.median(tempos):>12.4f} {min(tempos):>11.4f}")
+
+    return {
+        'criado_em': datetime.now().isoformat(timespec='seconds'),
+        'ambiente': ambiente(),
+        'resultados': resultados
+    }
+
+
+def comparar(atual, anterior, limite):
+    """Imprime a razão entre os tempos atual e anterior de cada etapa e retorna as regressões"""
+    chave = lambda resultado: (resultado['etapa'], resultado['registros'], resultado['especies'], resultado['locais'])  # noqa: E731
+    tempos_anteriores = {chave(resultado): resultado['mediana_s'] for resultado in anterior['resultados']}
+
+    print(f"\nComparação com {anterior['criado_em']} (commit {anterior['ambiente'].get('commit')})")
+    print(f"{'registros':>10} {'etapa':<42} {'antes (s)':>10} {'agora (s)':>10} {'razão':>7}")
+
+    regressoes = []
+    for resultado in atual['resultados']:
+        antes = tempos_anteriores.get(chave(resultado))
+        if antes is None:
+            continue
+        agora = resultado['mediana_s']
+        razao = agora / antes if antes > 0 else float('inf')
+        regressao = razao > limite and agora - antes > DIFERENCA_MINIMA_REGRESSAO
+        if regressao:
+            regressoes.append(resultado)
+        print(f"{resultado['registros']:>10} {resultado['etapa']:<42} {antes:>10.4f} {agora:>10.4f} "
+              f"{razao:>7.2f}{'  REGRESSÃO' if regressao else ''}")
+
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--registros', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--especies', type=int, default=1000)
+    parser.add_argument('--locais', type=int, default=300)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    parser.add_argument('--saida', default=None, help="arquivo JSON dos resultados (padrão: benchmarks/resultados)")
+    parser.add_argument('--comparar', default=None, help="resultados de uma execução anterior")
+    parser.add_argument('--limite-regressao', type=float, default=1.25,
+                        help="razão de tempo a partir da qual uma etapa conta como regressão")
+    args = parser.parse_args()
+
+    atual = executar_benchmark(args)
+
+    saida = args.saida or os.path.join(
+        DIRETORIO_RESULTADOS, f"pipeline_{datetime.now():%Y%m%d_%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(atual, arquivo, indent=2, ensure_ascii=False)
+    print(f"\nResultados gravados em {saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            anterior = json.load(arquivo)
+        if comparar(atual, anterior, args.limite_regressao):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
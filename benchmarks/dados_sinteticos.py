@@ -0,0 +1,54 @@
+"""
+Geração de dados sintéticos com as mesmas colunas das planilhas do DashBirds,
+para medir o desempenho do dashboard sem acesso à rede.
+"""
+import numpy as np
+import pandas as pd
+
+STATUS = ['LC', 'NT', 'VU', 'EN', 'CR', 'DD', 'Quase ameaçada', 'Vulnerável', 'Em perigo', None]
+HABITATS = ['Forest', 'Woodland', 'Shrubland', 'Grassland', 'Wetland', 'Riverine', 'Human Modified', None]
+NICHOS = ['Invertivore', 'Frugivore', 'Omnivore', 'Granivore', 'Nectarivore', 'Vertivore', 'Aquatic predator']
+
+
+def gerar_tabela_base(n_especies, seed=0):
+    """Tabela base sintética: uma linha por espécie com atributos taxonômicos e ecológicos"""
+    rng = np.random.default_rng(seed)
+    indices = np.arange(n_especies)
+
+    return pd.DataFrame({
+        'Nome científico': [f"Genus{i // 5} species{i}" for i in indices],
+        'Nomes em Português': [f"Ave {i}" for i in indices],
+        'Nomes da Ordens': [f"Ordem{i % 20}" for i in indices],
+        'Nome da Família': [f"Familia{i % max(1, n_especies // 8)}" for i in indices],
+        'Habitat (AVONET)': rng.choice(np.array(HABITATS, dtype=object), n_especies),
+        'Nicho trófico (AVONET)': rng.choice(NICHOS, n_especies),
+        'IUCN 2021': rng.choice(np.array(STATUS, dtype=object), n_especies),
+        'MMA 2022': rng.choice(np.array(STATUS, dtype=object), n_especies),
+        'Ameaçadas Bahia 2017': rng.choice(np.array(['VU', 'EN', None, None, None, None], dtype=object), n_especies),
+        'Endêmicas do Brasil (CBRO 2021)': rng.choice([1.0, np.nan, np.nan], n_especies),
+        'Espécies Endêmicas da Mata Atlântica': rng.choice([1.0, np.nan, np.nan], n_especies),
+        'Migratórias Somenzari et al. 2017': rng.choice(np.array(['MGT', 'MPR', None, None], dtype=object), n_especies),
+    })
+
+
+def gerar_tabela_dados(n_registros, n_especies, n_locais, seed=0):
+    """
+    Tabela de observações sintética. Cada local tem uma coordenada base com pequeno ruído
+    de GPS, e a frequência das espécies segue uma distribuição de cauda longa.
+    """
+    rng = np.random.default_rng(seed)
+
+    especies = np.minimum(rng.zipf(1.3, n_registros) - 1, n_especies - 1)
+    locais = rng.integers(0, n_locais, n_registros)
+    lat_locais = -16.4 + rng.random(n_locais) * 0.3
+    lon_locais = -39.2 + rng.random(n_locais) * 0.3
+    datas = pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 5 * 365, n_registros), unit='D')
+
+    return pd.DataFrame({
+        'Scientific Name': np.array([f"Genus{i // 5} species{i}" for i in range(n_especies)])[especies],
+        'Location': np.array([f"Local {i}" for i in range(n_locais)])[locais],
+        'Latitude': lat_locais[locais] + rng.normal(0, 0.0003, n_registros),
+        'Longitude': lon_locais[locais] + rng.normal(0, 0.0003, n_registros),
+        'Date': datas.strftime('%Y-%m-%d'),
+        'ListID': rng.integers(0, max(1, n_registros // 15), n_registros),
+    })
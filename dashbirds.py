@@ -1,14 +1,25 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-import folium
 from streamlit_folium import st_folium
-import requests
-from io import StringIO
+from concurrent.futures import as_completed
 from datetime import datetime
-import calendar
+import functools
+import json
+import os
+import threading
+
+from dashbirds_motor import (
+    CAMINHO_FONTE, FONTE_DADOS, MINIMO_REGISTROS_PERFIL, PERFIL_ATIVO, TAMANHOS_CELULA_KM, VALIDADE_SNAPSHOT,
+    AtualizadorDados, anexar_atributos, coletar_perfil, detalhe_especie, especie_exibida, especies_presentes,
+    executar_em_paralelo, medido, medir_etapa, obter_grupos_sazonais, obter_indicadores, obter_indice_especies,
+    perfil_em_coleta, sazonalidade_filtrada, selecionar_lista_especies
+)
+from dashbirds_visualizacoes import (
+    gerar_grafico_sazonalidade_comparada, obter_grafico_geral, obter_grafico_perfis_sazonais,
+    obter_grafico_sazonalidade, obter_html_mapa, obter_mapa
+)
 
 # Configuração da página
 st.set_page_config(
@@ -181,483 +192,418 @@ def configurar_tema():
     return cores
 
 
-# Função para download direto da planilha como CSV
-@st.cache_data(ttl=3600)
-def download_csv_from_google_sheet(sheet_url):
-    """
-    Faz download direto da planilha como CSV, sem necessidade de API ou credenciais.
-    Funciona apenas se a planilha estiver configurada para "Qualquer pessoa com o link pode visualizar".
-    """
-    try:
-        # Extrai o ID da planilha
-        sheet_id = sheet_url.split('/d/')[1].split('/edit')[0]
-
-        # Constrói a URL de exportação como CSV
-        export_url = f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv"
-
-        # Faz a requisição HTTP
-        response = requests.get(export_url)
-
-        # Verifica se a requisição foi bem-sucedida
-        if response.status_code == 200:
-            # Lê o conteúdo como CSV
-            csv_content = StringIO(response.content.decode('utf-8'))
-            df = pd.read_csv(csv_content, low_memory=False)
-            return df
-        else:
-            st.error(f"Erro ao baixar a planilha: {response.status_code}")
-            st.warning("Verifique se a planilha está configurada para 'Qualquer pessoa com o link pode visualizar'.")
-            return pd.DataFrame()
+# Perfil de execução (DASHBIRDS_PERFIL=1, ver dashbirds_motor): as etapas de cada execução do
+# script são exibidas em um painel da barra lateral e exportáveis em JSON lines (também gravadas
+# em DASHBIRDS_PERFIL_ARQUIVO, se definido)
+ARQUIVO_PERFIL = os.environ.get('DASHBIRDS_PERFIL_ARQUIVO')
+
+# Número de execuções mantidas por sessão para exportação
+EXECUCOES_PERFIL_SESSAO = 50
 
-    except Exception as e:
-        st.error(f"Erro ao fazer download da planilha: {e}")
-        return pd.DataFrame()
+
+@st.cache_resource
+def obter_trava_arquivo_perfil():
+    """Trava das gravações em DASHBIRDS_PERFIL_ARQUIVO, compartilhada por todas as sessões do processo"""
+    return threading.Lock()
+
+
+@st.cache_resource
+def obter_atualizador():
+    """Atualizador dos dados compartilhado por todas as sessões do processo"""
+    return AtualizadorDados(VALIDADE_SNAPSHOT)
 
 
-# Carregamento dos dados
-@st.cache_data
 def load_and_process_data():
-    """Carrega e processa os dados iniciais"""
-    # Exibe mensagem de carregamento
-    with st.spinner("Carregando dados das planilhas..."):
-        # Tabela base com informações taxonômicas e ecológicas
-        tabela_base = download_csv_from_google_sheet(
-            "https://docs.google.com/spreadsheets/d/1HBBDPNcITK9qHeJik3gZy6H0f4jG-s5QsTJKCcSfts0/edit?usp=sharing"
-        )
+    """
+    Carrega e processa os dados iniciais.
+    Retorna o conjunto de dados atual do processo; depois da primeira carga, as atualizações
+    são feitas pela thread do AtualizadorDados e nenhuma execução do script espera por elas.
+    """
+    atualizador = obter_atualizador()
+
+    if atualizador.dados is None:
+        # Exibe mensagem de carregamento
+        with st.spinner("Carregando dados das planilhas..."):
+            if not atualizador.carregar():
+                for erro in atualizador.erros:
+                    st.error(erro)
+                if FONTE_DADOS == 'google_sheets':
+                    st.error("Não foi possível carregar os dados. Verifique a conexão e as permissões das planilhas.")
+                else:
+                    st.error(f"Não foi possível carregar os dados da fonte local '{FONTE_DADOS}' em {CAMINHO_FONTE}.")
+                st.stop()
 
-        # Tabela de dados de observações
-        tabela_dados = download_csv_from_google_sheet(
-            "https://docs.google.com/spreadsheets/d/1pkT3tP_2lDpoWl3m04tsQuvBbClTLhGf2IIEihcwWDs/edit?usp=sharing"
-        )
+    atualizador.iniciar()
+    return atualizador.dados
 
-        # Verificação de dados
-        if tabela_base.empty or tabela_dados.empty:
-            st.error("Não foi possível carregar os dados. Verifique a conexão e as permissões das planilhas.")
-            st.stop()
-
-        # Processamento básico
-        # Convertendo datas
-        if 'Date' in tabela_dados.columns:
-            tabela_dados['Date'] = pd.to_datetime(tabela_dados['Date'], errors='coerce')
-            tabela_dados['Year'] = tabela_dados['Date'].dt.year
-            tabela_dados['Month'] = tabela_dados['Date'].dt.month
-
-        # Combinando os dados
-        # Assumindo que ambas tabelas têm uma coluna em comum (nome científico)
-        if 'Scientific Name' in tabela_dados.columns and 'Nome científico' in tabela_base.columns:
-            # Criando coluna comum para merge
-            tabela_dados['species_key'] = tabela_dados['Scientific Name'].str.strip().str.lower()
-            tabela_base['species_key'] = tabela_base['Nome científico'].str.strip().str.lower()
-
-            # Merge das tabelas
-            dados_completos = pd.merge(
-                tabela_dados,
-                tabela_base,
-                on='species_key',
-                how='left',
-                suffixes=('_obs', '_base')
-            )
-        else:
-            dados_completos = tabela_dados.copy()
-            st.warning("Não foi possível combinar as tabelas. Verificar nomes das colunas.")
 
-        return tabela_base, tabela_dados, dados_completos
+# Paginação das listas de espécies
+ESPECIES_POR_PAGINA = 50
+
+# Os mapas são exibidos como HTML estático: mover ou ampliar o mapa não envia nada ao script.
+# Os tipos de mapa listados em DASHBIRDS_MAPAS_INTERATIVOS (separados por vírgula, entre
+# 'riqueza', 'riqueza_ameacadas' e 'ocorrencia') usam o componente do st_folium, que devolve o
+# estado do mapa (limites, zoom, cliques) e reexecuta a seção a cada interação.
+MAPAS_INTERATIVOS = {
+    tipo.strip() for tipo in os.environ.get('DASHBIRDS_MAPAS_INTERATIVOS', '').split(',') if tipo.strip()
+}
+
+ALTURA_MAPAS = 450
 
 
-# Funções de análise
-def calcular_indicadores(df_filtered):
-    """Calcula os indicadores principais com base nos dados filtrados"""
-    # Número de registros
-    n_registros = len(df_filtered)
+@st.cache_resource
+def obter_trava_mapas():
+    """
+    Trava compartilhada por todas as sessões do processo: o st_folium altera o objeto do mapa ao
+    serializá-lo, e os mapas em cache são exibidos um por vez
+    """
+    return threading.Lock()
 
-    # Número de espécies
-    n_especies = df_filtered['Scientific Name'].nunique() if 'Scientific Name' in df_filtered.columns else 0
 
-    # Localizações únicas
-    n_localizacoes = df_filtered['Location'].nunique() if 'Location' in df_filtered.columns else 0
+def preparar_mapa(dados, filtros, tipo, especie=None, tamanho_celula=None):
+    """Mapa do tipo pedido na forma em que é exibido: objeto do Folium (interativo) ou HTML (estático)"""
+    if tipo in MAPAS_INTERATIVOS:
+        return obter_mapa(dados, filtros, tipo, especie, tamanho_celula)
+    return obter_html_mapa(dados, filtros, tipo, especie, tamanho_celula)
 
-    # Número de listas (se houver algum identificador de lista)
-    n_listas = df_filtered['ListID'].nunique() if 'ListID' in df_filtered.columns else 458  # Valor fixo do exemplo
 
-    # Período dos dados
-    if 'Date' in df_filtered.columns:
-        data_inicio = df_filtered['Date'].min().strftime('%d/%m/%Y')
-        data_fim = df_filtered['Date'].max().strftime('%d/%m/%Y')
-        periodo_dados = f"{data_inicio} a {data_fim}"
+@medido('exibição do mapa')
+def exibir_mapa(dados, filtros, tipo, especie=None, tamanho_celula=None):
+    """
+    Exibe o mapa do tipo pedido ocupando toda a largura disponível, estático ou interativo
+    (MAPAS_INTERATIVOS). Retorna False, sem exibir nada, quando não há dados para o mapa.
+    """
+    mapa = preparar_mapa(dados, filtros, tipo, especie, tamanho_celula)
+    if mapa is None:
+        return False
+
+    if tipo in MAPAS_INTERATIVOS:
+        with obter_trava_mapas():
+            st_folium(mapa, width='100%', height=ALTURA_MAPAS, key=f"mapa_{tipo}")
+    elif hasattr(st, 'iframe'):
+        st.iframe(mapa, height=ALTURA_MAPAS)
     else:
-        periodo_dados = "03/02/2025 a 15/02/2025"  # Valor do exemplo
-
-    # Espécies ameaçadas - incluindo agora "Quase ameaçada"
-    especies_ameacadas_iucn = 0
-    if 'IUCN 2021' in df_filtered.columns:
-        especies_ameacadas_iucn = df_filtered[
-            df_filtered['IUCN 2021'].isin([
-                'Vulnerável', 'Em perigo', 'Criticamente ameaçada', 'Quase ameaçada',
-                'VU', 'EN', 'CR', 'NT'  # Incluindo também abreviações
-            ])
-        ]['Scientific Name'].nunique()
-
-    especies_ameacadas_brasil = 0
-    if 'MMA 2022' in df_filtered.columns:
-        especies_ameacadas_brasil = df_filtered[
-            df_filtered['MMA 2022'].isin([
-                'Vulnerável', 'Em perigo', 'Criticamente ameaçada', 'Quase ameaçada',
-                'VU', 'EN', 'CR', 'NT'  # Incluindo também abreviações
-            ])
-        ]['Scientific Name'].nunique()
-
-    especies_ameacadas_estado = 0
-    if 'Ameaçadas Bahia 2017' in df_filtered.columns:
-        especies_ameacadas_estado = df_filtered[
-            df_filtered['Ameaçadas Bahia 2017'].notna() &
-            (df_filtered['Ameaçadas Bahia 2017'] != '')
-            ]['Scientific Name'].nunique()
-
-    # Espécies endêmicas
-    endemicas_brasil = 0
-    if 'Endêmicas do Brasil (CBRO 2021)' in df_filtered.columns:
-        endemicas_brasil = df_filtered[df_filtered['Endêmicas do Brasil (CBRO 2021)'] == 1][
-            'Scientific Name'].nunique()
-
-    endemicas_mata_atlantica = 0
-    if 'Espécies Endêmicas da Mata Atlântica' in df_filtered.columns:
-        endemicas_mata_atlantica = df_filtered[df_filtered['Espécies Endêmicas da Mata Atlântica'] == 1][
-            'Scientific Name'].nunique()
-
-    # Espécies migratórias
-    migratorias = 0
-    if 'Migratórias Somenzari et al. 2017' in df_filtered.columns:
-        migratorias = df_filtered[df_filtered['Migratórias Somenzari et al. 2017'].notna()][
-            'Scientific Name'].nunique()
+        # Versões do Streamlit anteriores ao st.iframe
+        components.html(mapa, height=ALTURA_MAPAS)
+    return True
 
-    return {
-        'n_registros': n_registros,
-        'n_especies': n_especies,
-        'n_localizacoes': n_localizacoes,
-        'n_listas': n_listas,
-        'periodo_dados': periodo_dados,
-        'especies_ameacadas_iucn': especies_ameacadas_iucn,
-        'especies_ameacadas_brasil': especies_ameacadas_brasil,
-        'especies_ameacadas_estado': especies_ameacadas_estado,
-        'endemicas_brasil': endemicas_brasil,
-        'endemicas_mata_atlantica': endemicas_mata_atlantica,
-        'migratorias': migratorias
+
+def secao(nome):
+    """
+    Decorador das seções do dashboard, executadas como fragmentos do Streamlit: a interação com
+    os widgets de uma seção reexecuta apenas essa seção, com os dados e os filtros recebidos na
+    última execução completa do script (alterar um filtro da barra lateral reexecuta tudo).
+    """
+    def decorador(funcao):
+        @st.fragment
+        @functools.wraps(funcao)
+        def fragmento(dados, filtros):
+            if PERFIL_ATIVO and not perfil_em_coleta():
+                # Reexecução apenas do fragmento: medida à parte e acrescentada ao histórico da sessão
+                with coletar_perfil() as registros:
+                    with medir_etapa(f"{nome} (fragmento)"):
+                        funcao(dados, filtros)
+                registrar_perfil(registros, dados['versao'])
+                return
+
+            with medir_etapa(nome):
+                funcao(dados, filtros)
+
+        return fragmento
+    return decorador
+
+
+# Opções dos widgets das seções e o que cada uma seleciona. Os widgets têm chave própria para
+# que as escolhas atuais sejam conhecidas antes das seções executarem (ver antecipar_secoes).
+GRAFICOS_OPCOES = {
+    "Famílias mais representativas": 'familias',
+    "Espécies mais representativas": 'especies',
+    "Habitats preferenciais": 'habitats',
+    "Nicho trófico": 'nicho_trofico',
+    "Outros?": None
+}
+
+LISTAS_OPCOES = {
+    "Geral": 'geral',
+    "Filtrar espécies ameaçadas": 'ameacadas',
+    "Filtrar espécies endêmicas da Mata Atlântica": 'endemicas_mata_atlantica'
+}
+
+MAPAS_OPCOES = {
+    "Riqueza de espécies por área": 'riqueza',
+    "Riqueza de espécies ameaçadas por área": 'riqueza_ameacadas'
+}
+
+# Riqueza por local de observação ou por célula de uma grade espacial do tamanho escolhido
+AGRUPAMENTOS_MAPA = {
+    "Por local de observação": None,
+    **{
+        f"Grade de {tamanho * 1000:.0f} m" if tamanho < 1 else f"Grade de {tamanho:g} km": tamanho
+        for tamanho in TAMANHOS_CELULA_KM
     }
+}
 
 
-def gerar_grafico_familias(df_filtered):
-    """Gera gráfico de barras das famílias mais representativas"""
-    if 'Nome da Família' not in df_filtered.columns:
-        return None
+@secao('gráficos gerais')
+def secao_graficos_gerais(dados, filtros):
+    """Gráfico geral escolhido na lista, para os filtros ativos"""
+    st.write("## Gráficos gerais")
 
-    # Agrupando por família e contando espécies
-    familia_counts = df_filtered.groupby('Nome da Família')['Nome científico'].nunique().reset_index()
-    familia_counts.columns = ['Família', 'Número de Espécies']
-    familia_counts = familia_counts.sort_values('Número de Espécies', ascending=False).head(10)
+    grafico_selecionado = st.selectbox("Opção de selecionar dropdown", list(GRAFICOS_OPCOES), key='grafico_geral')
+    tipo = GRAFICOS_OPCOES[grafico_selecionado]
 
-    fig = px.bar(
-        familia_counts,
-        x='Família',
-        y='Número de Espécies',
-        title='Famílias mais Representativas',
-        color='Número de Espécies',
-        color_continuous_scale='Viridis'
-    )
-    fig.update_layout(xaxis_title='Família', yaxis_title='Número de Espécies')
+    if tipo is None:
+        st.info("Outros gráficos podem ser adicionados conforme necessário.")
+        return
 
-    return fig
+    fig = obter_grafico_geral(dados, filtros, tipo)
+    if fig:
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.warning("Dados insuficientes para gerar o gráfico.")
 
 
-def gerar_grafico_especies(df_filtered):
-    """Gera gráfico de barras das espécies mais frequentemente registradas"""
-    if 'Scientific Name' not in df_filtered.columns:
-        return None
+@secao('listas de espécies')
+def secao_listas_especies(dados, filtros):
+    """Lista de espécies escolhida, com busca e paginação"""
+    st.write("## Listas de espécies")
 
-    # Contando observações por espécie
-    especies_counts = df_filtered['Scientific Name'].value_counts().reset_index()
-    especies_counts.columns = ['Espécie', 'Número de Registros']
-    especies_counts = especies_counts.sort_values('Número de Registros', ascending=False).head(10)
+    lista_selecionada = st.selectbox("", list(LISTAS_OPCOES), key='lista_especies')
+    busca_especie = st.text_input("Buscar espécie", placeholder="Nome científico ou popular", key='busca_especie')
 
-    fig = px.bar(
-        especies_counts,
-        x='Espécie',
-        y='Número de Registros',
-        title='Espécies mais Registradas',
-        color='Número de Registros',
-        color_continuous_scale='Viridis'
-    )
-    fig.update_layout(xaxis_title='Espécie', yaxis_title='Número de Registros',
-                      xaxis={'categoryorder': 'total descending'})
-
-    return fig
-
-
-def gerar_grafico_habitats(df_filtered):
-    """Gera gráfico de distribuição por habitats preferenciais"""
-    if 'Habitat (AVONET)' not in df_filtered.columns:
-        return None
-
-    # Agrupando por habitat
-    habitat_counts = df_filtered.groupby('Habitat (AVONET)')['Nome científico'].nunique().reset_index()
-    habitat_counts = habitat_counts[habitat_counts['Habitat (AVONET)'].notna()]  # Remover valores NA
-    habitat_counts.columns = ['Habitat', 'Número de Espécies']
-    habitat_counts = habitat_counts.sort_values('Número de Espécies', ascending=False)
-
-    fig = px.bar(
-        habitat_counts,
-        x='Habitat',
-        y='Número de Espécies',
-        title='Habitats Preferenciais',
-        color='Número de Espécies',
-        color_continuous_scale='Viridis'
+    # Apenas a página visível da lista é enviada ao navegador
+    especies_lista = selecionar_lista_especies(
+        dados, filtros, LISTAS_OPCOES[lista_selecionada], busca_especie
     )
-    fig.update_layout(xaxis_title='Habitat', yaxis_title='Número de Espécies')
 
-    return fig
+    if not especies_lista.empty:
+        n_paginas = -(-len(especies_lista) // ESPECIES_POR_PAGINA)
+        pagina = 1
+        if n_paginas > 1:
+            pagina = st.number_input("Página", min_value=1, max_value=n_paginas, value=1, step=1)
 
+        inicio = (pagina - 1) * ESPECIES_POR_PAGINA
+        st.dataframe(
+            especies_lista.iloc[inicio:inicio + ESPECIES_POR_PAGINA], height=450, hide_index=True
+        )
+        st.markdown(f"**Total: {len(especies_lista)} espécies** (página {pagina} de {n_paginas})")
+    elif busca_especie:
+        st.warning("Nenhuma espécie encontrada para a busca.")
+    else:
+        st.warning("Não há espécies para exibir com os filtros aplicados.")
 
-def gerar_grafico_nicho_trofico(df_filtered):
-    """Gera gráfico de pizza para níveis tróficos"""
-    if 'Nicho trófico (AVONET)' not in df_filtered.columns:
-        return None
 
-    # Agrupando por nível trófico
-    trophic_counts = df_filtered.groupby('Nicho trófico (AVONET)')['Nome científico'].nunique().reset_index()
-    trophic_counts.columns = ['Nicho Trófico', 'Número de Espécies']
+@secao('mapa geral')
+def secao_mapa_geral(dados, filtros):
+    """Mapa de riqueza de espécies (todas ou apenas as ameaçadas)"""
+    st.write("## Mapa geral")
 
-    fig = px.pie(
-        trophic_counts,
-        values='Número de Espécies',
-        names='Nicho Trófico',
-        title='Distribuição por Nicho Trófico',
-        color_discrete_sequence=px.colors.qualitative.Set3
-    )
+    mapa_selecionado = st.selectbox("Selecionar tipo de mapa:", list(MAPAS_OPCOES), key='tipo_mapa_geral')
+    agrupamento_selecionado = st.selectbox("Agrupar registros:", list(AGRUPAMENTOS_MAPA), key='agrupamento_mapa')
+    tipo = MAPAS_OPCOES[mapa_selecionado]
 
-    return fig
-
-
-def gerar_mapa_riqueza(df_filtered):
-    """Gera mapa de calor de riqueza de espécies por localização com visualização adaptada aos dados"""
-    if 'Latitude' not in df_filtered.columns or 'Longitude' not in df_filtered.columns:
-        return None
-
-    # Agrupando por localização e contando espécies
-    location_species = df_filtered.groupby(['Latitude', 'Longitude', 'Location'])[
-        'Scientific Name'].nunique().reset_index()
-    location_species.columns = ['Latitude', 'Longitude', 'Location', 'Riqueza de Espécies']
-
-    if len(location_species) == 0:
-        return None
-
-    # Criando mapa - usando fit_bounds para adaptar automaticamente aos dados
-    # Primeiro, determinamos os limites (bounds) dos nossos dados
-    min_lat = location_species['Latitude'].min()
-    max_lat = location_species['Latitude'].max()
-    min_lon = location_species['Longitude'].min()
-    max_lon = location_species['Longitude'].max()
-
-    # Adicionamos uma pequena margem para melhorar a visualização
-    lat_margin = (max_lat - min_lat) * 0.1
-    lon_margin = (max_lon - min_lon) * 0.1
-
-    # Criando o mapa sem definir location e zoom_start iniciais
-    mapa = folium.Map(tiles=None)
-
-    # Adicionando camada de satélite
-    folium.TileLayer(
-        tiles='https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
-        attr='Esri',
-        name='Esri Satellite',
-        overlay=False,
-        control=True
-    ).add_to(mapa)
-
-    # Adicionando marcadores para cada localização
-    for idx, row in location_species.iterrows():
-        folium.CircleMarker(
-            location=[row['Latitude'], row['Longitude']],
-            radius=row['Riqueza de Espécies'] / 2,  # Raio proporcional à riqueza
-            popup=f"Local: {row['Location']}<br>Riqueza: {row['Riqueza de Espécies']} espécies",
-            color='yellow',
-            fill=True,
-            fill_color='yellow',
-            fill_opacity=0.6
-        ).add_to(mapa)
-
-    # Ajustando o mapa para mostrar todos os pontos (com margem)
-    mapa.fit_bounds([
-        [min_lat - lat_margin, min_lon - lon_margin],
-        [max_lat + lat_margin, max_lon + lon_margin]
-    ])
-
-    return mapa
-
-
-def gerar_grafico_sazonalidade(df_filtered, especie):
-    """Gera gráfico de sazonalidade (registros por mês) para uma espécie específica"""
-    if 'Scientific Name' not in df_filtered.columns or 'Month' not in df_filtered.columns:
-        return None
-
-    # Filtrando pela espécie selecionada
-    df_especie = df_filtered[df_filtered['Scientific Name'] == especie]
-
-    # Contando registros por mês
-    monthly_counts = df_especie.groupby('Month').size().reindex(range(1, 13), fill_value=0)
-    monthly_counts.index = [calendar.month_abbr[i] for i in monthly_counts.index]
-
-    fig = px.bar(
-        x=monthly_counts.index,
-        y=monthly_counts.values,
-        title=f"Sazonalidade: {especie}",
-        labels={'x': 'Mês', 'y': 'Número de Registros'}
-    )
+    if not exibir_mapa(dados, filtros, tipo, tamanho_celula=AGRUPAMENTOS_MAPA[agrupamento_selecionado]):
+        if tipo == 'riqueza':
+            st.warning("Dados insuficientes para gerar o mapa.")
+        else:
+            # Apenas espécies ameaçadas
+            st.warning("Não há dados de espécies ameaçadas para exibir.")
 
-    return fig
 
+@secao('detalhe da espécie')
+def secao_detalhe_especie(dados, filtros):
+    """Painel "Olha o passarinho": informações, sazonalidade e mapa de ocorrência da espécie escolhida"""
+    tabela_base = dados['tabela_base']
+    tabela_dados = dados['tabela_dados']
 
-def gerar_mapa_ocorrencia(df_filtered, especie):
-    """Gera mapa de ocorrência para uma espécie específica com visualização adaptada aos dados"""
-    if 'Scientific Name' not in df_filtered.columns or 'Latitude' not in df_filtered.columns:
-        return None
+    st.write("## Olha o passarinho:")
 
-    # Filtrando pela espécie selecionada
-    df_especie = df_filtered[df_filtered['Scientific Name'] == especie]
+    # Espécies disponíveis nos dados filtrados, com as observações e contagens de cada uma
+    indice_especies = obter_indice_especies(dados, filtros)
+    especies_disponiveis = indice_especies['especies'] if indice_especies else []
 
-    if len(df_especie) == 0:
-        return None
+    if len(especies_disponiveis) > 0:
+        # Nome científico (selecionável)
+        especie_selecionada = st.selectbox(
+            "Nome científico (selecione):",
+            especies_disponiveis,
+            key='especie_detalhe'
+        )
 
-    # Determinando os limites dos dados
-    min_lat = df_especie['Latitude'].min()
-    max_lat = df_especie['Latitude'].max()
-    min_lon = df_especie['Longitude'].min()
-    max_lon = df_especie['Longitude'].max()
+        # Informações da espécie selecionada, sem percorrer os dados filtrados
+        detalhe = detalhe_especie(indice_especies, especie_selecionada)
+        info_especie = anexar_atributos(
+            tabela_dados.take(detalhe['posicoes'][:1]), tabela_base, ['Nomes em Português', 'IUCN 2021', 'MMA 2022']
+        ).iloc[0]
 
-    # Adicionando uma pequena margem para melhorar a visualização
-    lat_margin = max(0.01, (max_lat - min_lat) * 0.1)  # Garantindo margem mínima
-    lon_margin = max(0.01, (max_lon - min_lon) * 0.1)
+        # Nome comum (selecionável) - na prática, isso já é determinado pelo nome científico
+        nome_comum = info_especie.get('Nomes em Português', 'Nome desconhecido')
 
-    # Criando mapa sem definir location e zoom_start iniciais
-    mapa = folium.Map(tiles=None)
+        # Status de conservação
+        status_iucn = info_especie.get('IUCN 2021', 'Não avaliada')
+        status_brasil = info_especie.get('MMA 2022', 'Não avaliada')
 
-    # Adicionando camada de satélite
-    folium.TileLayer(
-        tiles='https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
-        attr='Esri',
-        name='Esri Satellite',
-        overlay=False,
-        control=True
-    ).add_to(mapa)
+        # Número total de registros
+        n_registros_especie = len(detalhe['posicoes'])
 
-    # Adicionando marcadores para cada registro
-    for idx, row in df_especie.iterrows():
-        folium.Marker(
-            location=[row['Latitude'], row['Longitude']],
-            popup=f"Data: {row['Date']}<br>Local: {row['Location']}",
-            icon=folium.Icon(color='green', icon='leaf', prefix='fa')
-        ).add_to(mapa)
+        # Abundância na área
+        if n_registros_especie > 20:
+            abundancia = "comum"
+        elif n_registros_especie > 5:
+            abundancia = "incomum"
+        else:
+            abundancia = "rara"
 
-    # Ajustando o mapa para mostrar todos os pontos (com margem)
-    mapa.fit_bounds([
-        [min_lat - lat_margin, min_lon - lon_margin],
-        [max_lat + lat_margin, max_lon + lon_margin]
-    ])
+        # Exibindo informações em mini-cards (em uma linha com 2 colunas)
+        col_info1, col_info2 = st.columns(2)
 
-    return mapa
+        with col_info1:
+            st.markdown(
+                f"""
+                <div class="mini-card">
+                    <div class="mini-card-titulo">Nome comum</div>
+                    <div class="mini-card-valor">{nome_comum}</div>
+                </div>
 
+                <div class="mini-card">
+                    <div class="mini-card-titulo">Status IUCN</div>
+                    <div class="mini-card-valor">{status_iucn}</div>
+                </div>
 
-# UI do Dashboard - Layout principal
-def main():
-    # Aplicando o tema
-    cores = configurar_tema()
+                <div class="mini-card">
+                    <div class="mini-card-titulo">Status Brasil</div>
+                    <div class="mini-card-valor">{status_brasil}</div>
+                </div>
+                """,
+                unsafe_allow_html=True
+            )
 
-    # Controle para alternar entre tema claro e escuro
-    col_titulo, col_tema = st.columns([5, 1])
+        with col_info2:
+            st.markdown(
+                f"""
+                <div class="mini-card">
+                    <div class="mini-card-titulo">Número total de registros</div>
+                    <div class="mini-card-valor">{n_registros_especie}</div>
+                </div>
 
-    with col_titulo:
-        st.title("DashBirds: Observatório de Aves - RPPN Estação Veracel")
+                <div class="mini-card">
+                    <div class="mini-card-titulo">Abundância na área</div>
+                    <div class="mini-card-valor">{abundancia}</div>
+                </div>
+                """,
+                unsafe_allow_html=True
+            )
 
-    with col_tema:
-        st.markdown('<div class="tema-toggle">', unsafe_allow_html=True)
-        if st.button("🌓 Alternar Tema"):
-            # Alternar entre os temas
-            if st.session_state.tema == 'escuro':
-                st.session_state.tema = 'claro'
+        # Gráficos de detalhes da espécie
+        col1, col2 = st.columns(2)
+
+        with col1:
+            st.write("### Gráfico Sazonalidade (mensal)")
+
+            fig_sazon = obter_grafico_sazonalidade(dados, filtros, especie_selecionada)
+            if fig_sazon:
+                st.plotly_chart(fig_sazon, use_container_width=True)
             else:
-                st.session_state.tema = 'escuro'
-            st.rerun()  # Recarregar a aplicação com o novo tema
-        st.markdown('</div>', unsafe_allow_html=True)
+                st.warning("Dados insuficientes para gerar o gráfico de sazonalidade.")
 
-    # Sidebar - Filtros
-    st.sidebar.title("Filtros")
+        with col2:
+            st.write("### Mapa de ocorrência na área de estudo")
 
-    # Exibe mensagem de carregamento inicial
-    with st.spinner("Inicializando o Dashboard de Biodiversidade..."):
-        # Carregando dados
-        tabela_base, tabela_dados, dados_completos = load_and_process_data()
+            if not exibir_mapa(dados, filtros, 'ocorrencia', especie_selecionada):
+                st.warning("Dados insuficientes para gerar o mapa de ocorrência.")
 
-        # Preparando dados para os filtros
-        anos_disponiveis = sorted(tabela_dados['Year'].unique()) if 'Year' in tabela_dados.columns else []
-        locais_disponiveis = sorted(tabela_dados['Location'].unique()) if 'Location' in tabela_dados.columns else []
+    else:
+        st.warning("Não há espécies disponíveis com os filtros aplicados.")
 
-        # Usando a coluna correta para habitats
-        if 'Habitat (AVONET)' in tabela_base.columns:
-            ambientes_disponiveis = sorted(tabela_base['Habitat (AVONET)'].dropna().unique())
-        else:
-            ambientes_disponiveis = []
 
-    # Filtro anual
-    ano_selecionado = st.sidebar.selectbox(
-        "Filtro anual",
-        options=["Todos"] + anos_disponiveis,
-        index=0
-    )
+# Número máximo de espécies no gráfico de sazonalidade comparada (e das pré-selecionadas)
+ESPECIES_COMPARADAS = 8
+ESPECIES_COMPARADAS_PADRAO = 3
 
-    # Filtro ambiente
-    ambiente_selecionado = st.sidebar.selectbox(
-        "Filtro ambiente",
-        options=["Todos"] + ambientes_disponiveis,
-        index=0
-    )
+GRUPOS_SAZONAIS_PADRAO = 4
 
-    # Filtro local
-    local_selecionado = st.sidebar.selectbox(
-        "Filtro local",
-        options=["Todos"] + locais_disponiveis,
-        index=0
-    )
 
-    # Informações adicionais na sidebar
-    st.sidebar.markdown("---")
-    with st.sidebar.expander("ℹ️ Informações", expanded=False):
-        st.markdown("""
-        **Instruções:**
+@secao('sazonalidade comparada')
+def secao_sazonalidade_comparada(dados, filtros):
+    """Sazonalidade de várias espécies lado a lado e agrupamento das espécies pelo perfil sazonal"""
+    st.write("## Sazonalidade comparada")
 
-        * Use os filtros acima para refinar os dados visualizados
-        * O filtro anual seleciona dados apenas do ano escolhido
-        * O filtro de ambiente mostra espécies associadas ao habitat selecionado
-        * O filtro local restringe dados a uma localização específica
+    # Linhas da matriz espécie × mês pré-calculada, sem percorrer as observações
+    mensal = sazonalidade_filtrada(dados, filtros)
+    if mensal is None:
+        st.warning("Não há datas nas observações para calcular a sazonalidade.")
+        return
 
-        **Fonte dos dados:**
+    tabela_listas = dados['tabela_listas']
+    ids = tabela_listas.index.to_numpy()
+    presentes = especies_presentes(dados, filtros)
+    if presentes is not None:
+        ids = ids[presentes[ids]]
+    ids = ids[mensal[ids].sum(axis=1) > 0]
 
-        * Tabela base: informações taxonômicas e ecológicas
-        * Tabela de dados: registros de campo das espécies
-        """)
+    if len(ids) == 0:
+        st.warning("Não há espécies disponíveis com os filtros aplicados.")
+        return
 
-    # Aplicando filtros
-    dados_filtrados = dados_completos.copy()
+    nomes = dict(zip(ids.tolist(), tabela_listas.loc[ids, 'Scientific Name']))
 
-    if ano_selecionado != "Todos" and 'Year' in dados_filtrados.columns:
-        dados_filtrados = dados_filtrados[dados_filtrados['Year'] == ano_selecionado]
+    col1, col2 = st.columns(2)
 
-    if local_selecionado != "Todos" and 'Location' in dados_filtrados.columns:
-        dados_filtrados = dados_filtrados[dados_filtrados['Location'] == local_selecionado]
+    with col1:
+        st.write("### Comparar espécies")
+
+        # Pré-seleção: as espécies com mais registros
+        mais_registradas = ids[np.argsort(-mensal[ids].sum(axis=1), kind='stable')[:ESPECIES_COMPARADAS_PADRAO]]
+        especies_comparadas = st.multiselect(
+            "Espécies comparadas:",
+            ids.tolist(),
+            default=mais_registradas.tolist(),
+            format_func=nomes.get,
+            max_selections=ESPECIES_COMPARADAS
+        )
+        proporcao = st.checkbox("Mostrar a fração dos registros de cada espécie", value=False)
+
+        if especies_comparadas:
+            st.plotly_chart(
+                gerar_grafico_sazonalidade_comparada(
+                    mensal[especies_comparadas], [nomes[id_especie] for id_especie in especies_comparadas], proporcao
+                ),
+                use_container_width=True
+            )
+        else:
+            st.info("Selecione as espécies para comparar.")
 
-    if ambiente_selecionado != "Todos":
-        if 'Habitat (AVONET)' in dados_filtrados.columns:
-            dados_filtrados = dados_filtrados[dados_filtrados['Habitat (AVONET)'] == ambiente_selecionado]
+    with col2:
+        st.write("### Grupos por perfil sazonal")
+
+        n_grupos = st.slider(
+            "Número de grupos:", min_value=2, max_value=8, value=GRUPOS_SAZONAIS_PADRAO, key='grupos_sazonais'
+        )
+        grupos = obter_grupos_sazonais(dados, filtros, n_grupos)
+
+        if grupos is None:
+            st.warning(
+                f"São necessárias ao menos duas espécies com {MINIMO_REGISTROS_PERFIL} registros para agrupar."
+            )
+        else:
+            st.plotly_chart(obter_grafico_perfis_sazonais(dados, filtros, n_grupos), use_container_width=True)
 
-    # Calculando indicadores
-    indicadores = calcular_indicadores(dados_filtrados)
+            with st.expander("Espécies de cada grupo", expanded=False):
+                st.dataframe(
+                    pd.DataFrame({
+                        'Grupo': grupos['grupos'] + 1,
+                        'Scientific Name': tabela_listas['Scientific Name'].reindex(grupos['ids']).to_numpy(),
+                        'Registros': mensal[grupos['ids']].sum(axis=1)
+                    }).sort_values(['Grupo', 'Scientific Name'], kind='stable'),
+                    height=300,
+                    hide_index=True
+                )
+
+
+def exibir_indicadores(dados, filtros):
+    """Indicadores principais dos filtros ativos, em duas linhas de cards"""
+    # Indicadores em cache por filtros (sem copiar as observações filtradas a cada execução)
+    indicadores = obter_indicadores(dados, filtros)
 
     # Seção de indicadores com layout organizado em duas linhas
     st.markdown("## Indicadores")
@@ -734,281 +680,258 @@ def main():
             unsafe_allow_html=True
         )
 
-    st.markdown("---")
 
-    # Detalhes e Gráficos
-    col1, col2 = st.columns(2)
+def exibir_indicadores_detalhados(dados, filtros):
+    """Mini-cards com as espécies ameaçadas, endêmicas e migratórias dos filtros ativos"""
+    indicadores = obter_indicadores(dados, filtros)
 
-    # Coluna de indicadores detalhados - modificado para usar mini-cards
-    with col1:
-        st.write("## Indicadores Detalhados")
+    st.write("## Indicadores Detalhados")
 
-        # Criar mini-cards para cada indicador detalhado
-        st.markdown(
-            f"""
-            <div class="mini-card">
-                <div class="mini-card-titulo">Espécies ameaçadas (IUCN)</div>
-                <div class="mini-card-valor">{indicadores['especies_ameacadas_iucn']}</div>
-            </div>
-
-            <div class="mini-card">
-                <div class="mini-card-titulo">Espécies ameaçadas (Brasil)</div>
-                <div class="mini-card-valor">{indicadores['especies_ameacadas_brasil']}</div>
-            </div>
-
-            <div class="mini-card">
-                <div class="mini-card-titulo">Espécies ameaçadas (Bahia)</div>
-                <div class="mini-card-valor">{indicadores['especies_ameacadas_estado']}</div>
-            </div>
+    # Criar mini-cards para cada indicador detalhado
+    st.markdown(
+        f"""
+        <div class="mini-card">
+            <div class="mini-card-titulo">Espécies ameaçadas (IUCN)</div>
+            <div class="mini-card-valor">{indicadores['especies_ameacadas_iucn']}</div>
+        </div>
 
-            <div class="mini-card">
-                <div class="mini-card-titulo">Espécies endêmicas do Brasil</div>
-                <div class="mini-card-valor">{indicadores['endemicas_brasil']}</div>
-            </div>
+        <div class="mini-card">
+            <div class="mini-card-titulo">Espécies ameaçadas (Brasil)</div>
+            <div class="mini-card-valor">{indicadores['especies_ameacadas_brasil']}</div>
+        </div>
 
-            <div class="mini-card">
-                <div class="mini-card-titulo">Espécies endêmicas da Mata Atlântica</div>
-                <div class="mini-card-valor">{indicadores['endemicas_mata_atlantica']}</div>
-            </div>
+        <div class="mini-card">
+            <div class="mini-card-titulo">Espécies ameaçadas (Bahia)</div>
+            <div class="mini-card-valor">{indicadores['especies_ameacadas_estado']}</div>
+        </div>
 
-            <div class="mini-card">
-                <div class="mini-card-titulo">Espécies migratórias</div>
-                <div class="mini-card-valor">{indicadores['migratorias']}</div>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+        <div class="mini-card">
+            <div class="mini-card-titulo">Espécies endêmicas do Brasil</div>
+            <div class="mini-card-valor">{indicadores['endemicas_brasil']}</div>
+        </div>
 
-    # Coluna de gráficos gerais
-    with col2:
-        st.write("## Gráficos gerais")
-
-        grafico_opcoes = [
-            "Famílias mais representativas",
-            "Espécies mais representativas",
-            "Habitats preferenciais",
-            "Nicho trófico",
-            "Outros?"
-        ]
+        <div class="mini-card">
+            <div class="mini-card-titulo">Espécies endêmicas da Mata Atlântica</div>
+            <div class="mini-card-valor">{indicadores['endemicas_mata_atlantica']}</div>
+        </div>
 
-        grafico_selecionado = st.selectbox("Opção de selecionar dropdown", grafico_opcoes)
+        <div class="mini-card">
+            <div class="mini-card-titulo">Espécies migratórias</div>
+            <div class="mini-card-valor">{indicadores['migratorias']}</div>
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
 
-        if grafico_selecionado == "Famílias mais representativas":
-            fig = gerar_grafico_familias(dados_filtrados)
-            if fig:
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.warning("Dados insuficientes para gerar o gráfico.")
 
-        elif grafico_selecionado == "Espécies mais representativas":
-            fig = gerar_grafico_especies(dados_filtrados)
-            if fig:
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.warning("Dados insuficientes para gerar o gráfico.")
+def antecipar_secoes(dados, filtros):
+    """
+    Dispara no pool de construções (ver executar_em_paralelo) o que as seções vão exibir com as
+    escolhas atuais dos widgets (as padrão, antes de eles existirem): indicadores, gráfico
+    geral, lista de espécies, mapas, gráfico de sazonalidade da espécie e perfis sazonais.
+    As seções consultam os mesmos caches e recebem o resultado pronto ou esperam pela
+    construção em andamento, sem repeti-la. Retorna os Futures de cada seção.
+    """
+    def escolha(chave, opcoes):
+        valor = st.session_state.get(chave)
+        return opcoes[valor] if valor in opcoes else next(iter(opcoes.values()))
+
+    tipo_grafico = escolha('grafico_geral', GRAFICOS_OPCOES)
+    lista = escolha('lista_especies', LISTAS_OPCOES)
+    busca = st.session_state.get('busca_especie', '')
+    tipo_mapa = escolha('tipo_mapa_geral', MAPAS_OPCOES)
+    tamanho_celula = escolha('agrupamento_mapa', AGRUPAMENTOS_MAPA)
+    especie = st.session_state.get('especie_detalhe')
+    n_grupos = st.session_state.get('grupos_sazonais', GRUPOS_SAZONAIS_PADRAO)
+
+    # A espécie do detalhe depende do índice por espécie, construído (uma vez) no próprio pool
+    def grafico_sazonalidade():
+        return obter_grafico_sazonalidade(dados, filtros, especie_exibida(dados, filtros, especie))
+
+    def mapa_ocorrencia():
+        especie_atual = especie_exibida(dados, filtros, especie)
+        return preparar_mapa(dados, filtros, 'ocorrencia', especie_atual) if especie_atual is not None else None
 
-        elif grafico_selecionado == "Habitats preferenciais":
-            fig = gerar_grafico_habitats(dados_filtrados)
-            if fig:
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.warning("Dados insuficientes para gerar o gráfico.")
+    return {
+        'indicadores': [executar_em_paralelo('indicadores', obter_indicadores, dados, filtros)],
+        'graficos_gerais': [
+            executar_em_paralelo('gráfico geral', obter_grafico_geral, dados, filtros, tipo_grafico)
+        ] if tipo_grafico is not None else [],
+        'listas_especies': [
+            executar_em_paralelo('lista de espécies', selecionar_lista_especies, dados, filtros, lista, busca)
+        ],
+        'mapa_geral': [
+            executar_em_paralelo('mapa geral', preparar_mapa, dados, filtros, tipo_mapa, None, tamanho_celula)
+        ],
+        'detalhe_especie': [
+            executar_em_paralelo('gráfico de sazonalidade da espécie', grafico_sazonalidade),
+            executar_em_paralelo('mapa de ocorrência', mapa_ocorrencia)
+        ],
+        'sazonalidade_comparada': [
+            executar_em_paralelo('perfis sazonais', obter_grafico_perfis_sazonais, dados, filtros, n_grupos)
+        ]
+    }
 
-        elif grafico_selecionado == "Nicho trófico":
-            fig = gerar_grafico_nicho_trofico(dados_filtrados)
-            if fig:
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.warning("Dados insuficientes para gerar o gráfico.")
 
-        elif grafico_selecionado == "Outros?":
-            st.info("Outros gráficos podem ser adicionados conforme necessário.")
+def secoes_concluidas(futuros):
+    """Nomes das seções, na ordem em que todas as construções de cada uma terminam"""
+    pendentes = {nome: len(futuros_secao) for nome, futuros_secao in futuros.items()}
+    secao_do_futuro = {futuro: nome for nome, futuros_secao in futuros.items() for futuro in futuros_secao}
 
-    st.markdown("---")
+    for nome, n_pendentes in pendentes.items():
+        if n_pendentes == 0:
+            yield nome
 
-    # Listas de Espécies e Mapa Geral
-    col1, col2 = st.columns(2)
+    for futuro in as_completed(secao_do_futuro):
+        nome = secao_do_futuro[futuro]
+        pendentes[nome] -= 1
+        if pendentes[nome] == 0:
+            yield nome
 
-    # Seção de Listas de Espécies com filtro atualizado
-    with col1:
-        st.write("## Listas de espécies")
 
-        lista_opcoes = [
-            "Geral",
-            "Filtrar espécies ameaçadas",
-            "Filtrar espécies endêmicas da Mata Atlântica"
-        ]
+# UI do Dashboard - Layout principal
+def main():
+    # Aplicando o tema
+    cores = configurar_tema()
 
-        lista_selecionada = st.selectbox("", lista_opcoes)
-
-        if lista_selecionada == "Geral":
-            especies_lista = dados_filtrados[
-                ['Scientific Name', 'Nome científico', 'Nomes em Português', 'Nomes da Ordens',
-                 'Nome da Família']].drop_duplicates(subset='Scientific Name').sort_values('Scientific Name')
-
-        elif lista_selecionada == "Filtrar espécies ameaçadas":
-            # Filtro atualizado para incluir espécies "Quase ameaçada"
-            especies_lista = dados_filtrados[
-                (dados_filtrados['IUCN 2021'].isin(
-                    ['Vulnerável', 'Em perigo', 'Criticamente ameaçada', 'Quase ameaçada', 'VU', 'EN', 'CR', 'NT'])) |
-                (dados_filtrados['MMA 2022'].isin(
-                    ['Vulnerável', 'Em perigo', 'Criticamente ameaçada', 'Quase ameaçada', 'VU', 'EN', 'CR', 'NT'])) |
-                (dados_filtrados['Ameaçadas Bahia 2017'].notna() & (dados_filtrados['Ameaçadas Bahia 2017'] != ''))
-                ][['Scientific Name', 'Nome científico', 'Nomes em Português', 'IUCN 2021', 'MMA 2022',
-                   'Ameaçadas Bahia 2017', 'Nome da Família']].drop_duplicates(subset='Scientific Name').sort_values(
-                'Scientific Name')
-
-        elif lista_selecionada == "Filtrar espécies endêmicas da Mata Atlântica":
-            especies_lista = dados_filtrados[
-                dados_filtrados['Espécies Endêmicas da Mata Atlântica'] == 1
-                ][['Scientific Name', 'Nome científico', 'Nomes em Português', 'Nome da Família']].drop_duplicates(
-                subset='Scientific Name').sort_values('Scientific Name')
-
-        if not especies_lista.empty and len(especies_lista) > 0:
-            st.dataframe(especies_lista, height=450)
-            st.markdown(f"**Total: {len(especies_lista)} espécies**")
-        else:
-            st.warning("Não há espécies para exibir com os filtros aplicados.")
+    # Controle para alternar entre tema claro e escuro
+    col_titulo, col_tema = st.columns([5, 1])
 
-    # Mapa geral
-    with col2:
-        st.write("## Mapa geral")
+    with col_titulo:
+        st.title("DashBirds: Observatório de Aves - RPPN Estação Veracel")
 
-        mapa_opcoes = [
-            "Riqueza de espécies por área",
-            "Riqueza de espécies ameaçadas por área"
-        ]
+    with col_tema:
+        st.markdown('<div class="tema-toggle">', unsafe_allow_html=True)
+        if st.button("🌓 Alternar Tema"):
+            # Alternar entre os temas
+            if st.session_state.tema == 'escuro':
+                st.session_state.tema = 'claro'
+            else:
+                st.session_state.tema = 'escuro'
+            st.rerun()  # Recarregar a aplicação com o novo tema
+        st.markdown('</div>', unsafe_allow_html=True)
 
-        mapa_selecionado = st.selectbox("Selecionar tipo de mapa:", mapa_opcoes)
+    # Sidebar - Filtros
+    st.sidebar.title("Filtros")
 
-        if mapa_selecionado == "Riqueza de espécies por área":
-            mapa = gerar_mapa_riqueza(dados_filtrados)
-            if mapa:
-                # Ajustando para ocupar todo o espaço horizontal
-                st_folium(mapa, width='100%', height=450)
-            else:
-                st.warning("Dados insuficientes para gerar o mapa.")
-
-        elif mapa_selecionado == "Riqueza de espécies ameaçadas por área":
-            # Filtrando apenas espécies ameaçadas
-            dados_ameacados = dados_filtrados[
-                (dados_filtrados['IUCN 2021'].isin(
-                    ['Vulnerável', 'Em perigo', 'Criticamente ameaçada', 'Quase ameaçada', 'VU', 'EN', 'CR', 'NT'])) |
-                (dados_filtrados['MMA 2022'].isin(
-                    ['Vulnerável', 'Em perigo', 'Criticamente ameaçada', 'Quase ameaçada', 'VU', 'EN', 'CR', 'NT'])) |
-                (dados_filtrados['Ameaçadas Bahia 2017'].notna() & (dados_filtrados['Ameaçadas Bahia 2017'] != ''))
-                ] if (
-                        'IUCN 2021' in dados_filtrados.columns or 'MMA 2022' in dados_filtrados.columns or 'Ameaçadas Bahia 2017' in dados_filtrados.columns) else pd.DataFrame()
-
-            if not dados_ameacados.empty:
-                mapa = gerar_mapa_riqueza(dados_ameacados)
-                if mapa:
-                    # Ajustando para ocupar todo o espaço horizontal
-                    st_folium(mapa, width='100%', height=450)
-                else:
-                    st.warning("Dados insuficientes para gerar o mapa.")
-            else:
-                st.warning("Não há dados de espécies ameaçadas para exibir.")
+    # Exibe mensagem de carregamento inicial
+    with st.spinner("Inicializando o Dashboard de Biodiversidade..."):
+        # Carregando dados
+        dados = load_and_process_data()
+        atualizador = obter_atualizador()
 
-    st.markdown("---")
+        # Valores dos filtros, pré-calculados com os dados
+        anos_disponiveis = dados['opcoes_filtros']['Year']
+        locais_disponiveis = dados['opcoes_filtros']['Location']
+        ambientes_disponiveis = dados['opcoes_filtros']['Habitat (AVONET)']
 
-    # Olha o Passarinho (Detalhes da Espécie) - Formatado com mini-cards
-    st.write("## Olha o passarinho:")
+    # Filtro anual
+    ano_selecionado = st.sidebar.selectbox(
+        "Filtro anual",
+        options=["Todos"] + anos_disponiveis,
+        index=0
+    )
 
-    # Lista única de espécies disponíveis nos dados filtrados
-    especies_disponiveis = sorted(dados_filtrados['Scientific Name'].unique())
+    # Filtro ambiente
+    ambiente_selecionado = st.sidebar.selectbox(
+        "Filtro ambiente",
+        options=["Todos"] + ambientes_disponiveis,
+        index=0
+    )
 
-    if len(especies_disponiveis) > 0:
-        # Nome científico (selecionável)
-        especie_selecionada = st.selectbox(
-            "Nome científico (selecione):",
-            especies_disponiveis
-        )
+    # Filtro local
+    local_selecionado = st.sidebar.selectbox(
+        "Filtro local",
+        options=["Todos"] + locais_disponiveis,
+        index=0
+    )
 
-        # Filtrando informações da espécie selecionada
-        info_especie = dados_filtrados[dados_filtrados['Scientific Name'] == especie_selecionada].iloc[0]
+    # Informações adicionais na sidebar
+    st.sidebar.markdown("---")
+    with st.sidebar.expander("ℹ️ Informações", expanded=False):
+        st.markdown("""
+        **Instruções:**
 
-        # Nome comum (selecionável) - na prática, isso já é determinado pelo nome científico
-        nome_comum = info_especie.get('Nomes em Português', 'Nome desconhecido')
+        * Use os filtros acima para refinar os dados visualizados
+        * O filtro anual seleciona dados apenas do ano escolhido
+        * O filtro de ambiente mostra espécies associadas ao habitat selecionado
+        * O filtro local restringe dados a uma localização específica
 
-        # Status de conservação
-        status_iucn = info_especie.get('IUCN 2021', 'Não avaliada')
-        status_brasil = info_especie.get('MMA 2022', 'Não avaliada')
+        **Fonte dos dados:**
 
-        # Número total de registros
-        n_registros_especie = len(dados_filtrados[dados_filtrados['Scientific Name'] == especie_selecionada])
+        * Tabela base: informações taxonômicas e ecológicas
+        * Tabela de dados: registros de campo das espécies
+        """)
+        ultima_atualizacao = (
+            f" · última atualização: {atualizador.atualizado_em:%d/%m/%Y %H:%M}" if atualizador.atualizado_em else ""
+        )
+        st.caption(f"Versão dos dados: {dados['versao']}{ultima_atualizacao}")
+        st.caption(
+            f"Memória dos dados: {dados['memoria']['depois'] / 2 ** 20:.1f} MB "
+            f"({dados['memoria']['antes'] / 2 ** 20:.1f} MB sem otimização de tipos)"
+        )
 
-        # Abundância na área
-        if n_registros_especie > 20:
-            abundancia = "comum"
-        elif n_registros_especie > 5:
-            abundancia = "incomum"
-        else:
-            abundancia = "rara"
+    # Falhas na última atualização (os dados exibidos são os da última versão carregada)
+    for erro in atualizador.erros:
+        st.sidebar.warning(erro)
 
-        # Exibindo informações em mini-cards (em uma linha com 2 colunas)
-        col_info1, col_info2 = st.columns(2)
+    # Avisos sobre o conteúdo das planilhas
+    for aviso in dados['avisos']:
+        st.warning(aviso)
 
-        with col_info1:
-            st.markdown(
-                f"""
-                <div class="mini-card">
-                    <div class="mini-card-titulo">Nome comum</div>
-                    <div class="mini-card-valor">{nome_comum}</div>
-                </div>
+    # Nomes das observações sem correspondência na tabela base
+    if dados['especies_nao_encontradas']:
+        with st.sidebar.expander(
+                f"⚠️ {len(dados['especies_nao_encontradas'])} nomes sem correspondência na tabela base",
+                expanded=False):
+            st.markdown("\n".join(f"* {nome}" for nome in dados['especies_nao_encontradas']))
 
-                <div class="mini-card">
-                    <div class="mini-card-titulo">Status IUCN</div>
-                    <div class="mini-card-valor">{status_iucn}</div>
-                </div>
+    # Aplicando filtros
+    filtros = {}
+    if ano_selecionado != "Todos":
+        filtros['Year'] = ano_selecionado
 
-                <div class="mini-card">
-                    <div class="mini-card-titulo">Status Brasil</div>
-                    <div class="mini-card-valor">{status_brasil}</div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+    if local_selecionado != "Todos":
+        filtros['Location'] = local_selecionado
 
-        with col_info2:
-            st.markdown(
-                f"""
-                <div class="mini-card">
-                    <div class="mini-card-titulo">Número total de registros</div>
-                    <div class="mini-card-valor">{n_registros_especie}</div>
-                </div>
+    if ambiente_selecionado != "Todos":
+        filtros['Habitat (AVONET)'] = ambiente_selecionado
 
-                <div class="mini-card">
-                    <div class="mini-card-titulo">Abundância na área</div>
-                    <div class="mini-card-valor">{abundancia}</div>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+    # As construções das seções (indicadores, gráficos, listas e mapas) são disparadas juntas
+    # no pool de construções; as seções as encontram nos caches ou esperam por elas
+    futuros = antecipar_secoes(dados, filtros)
 
-        # Gráficos de detalhes da espécie
-        col1, col2 = st.columns(2)
+    # Espaços do layout, preenchidos na ordem em que as construções de cada seção terminam
+    espaco_indicadores = st.container()
+    st.markdown("---")
 
-        with col1:
-            st.write("### Gráfico Sazonalidade (mensal)")
+    # Detalhes e Gráficos
+    col_detalhados, col_graficos = st.columns(2)
+    st.markdown("---")
 
-            fig_sazon = gerar_grafico_sazonalidade(dados_filtrados, especie_selecionada)
-            if fig_sazon:
-                st.plotly_chart(fig_sazon, use_container_width=True)
-            else:
-                st.warning("Dados insuficientes para gerar o gráfico de sazonalidade.")
+    # Listas de Espécies e Mapa Geral
+    col_listas, col_mapa = st.columns(2)
+    st.markdown("---")
 
-        with col2:
-            st.write("### Mapa de ocorrência na área de estudo")
+    # Olha o Passarinho (Detalhes da Espécie) - Formatado com mini-cards
+    espaco_detalhe = st.container()
+    st.markdown("---")
 
-            mapa_especie = gerar_mapa_ocorrencia(dados_filtrados, especie_selecionada)
-            if mapa_especie:
-                st_folium(mapa_especie, width='100%', height=450)
-            else:
-                st.warning("Dados insuficientes para gerar o mapa de ocorrência.")
+    # Sazonalidade de várias espécies e grupos de espécies com o mesmo perfil sazonal
+    espaco_sazonalidade = st.container()
 
-    else:
-        st.warning("Não há espécies disponíveis com os filtros aplicados.")
+    exibicoes = {
+        'indicadores': [(espaco_indicadores, exibir_indicadores), (col_detalhados, exibir_indicadores_detalhados)],
+        'graficos_gerais': [(col_graficos, secao_graficos_gerais)],
+        'listas_especies': [(col_listas, secao_listas_especies)],
+        'mapa_geral': [(col_mapa, secao_mapa_geral)],
+        'detalhe_especie': [(espaco_detalhe, secao_detalhe_especie)],
+        'sazonalidade_comparada': [(espaco_sazonalidade, secao_sazonalidade_comparada)]
+    }
+    for nome in secoes_concluidas(futuros):
+        for espaco, exibir in exibicoes[nome]:
+            with espaco:
+                exibir(dados, filtros)
 
     # Rodapé com informações adicionais
     st.markdown("---")
@@ -1022,5 +945,71 @@ def main():
     )
 
 
+def registrar_perfil(registros, versao):
+    """
+    Acrescenta as etapas de uma execução (completa ou de um fragmento) ao histórico da sessão
+    e ao arquivo DASHBIRDS_PERFIL_ARQUIVO, se definido. Retorna o histórico da sessão.
+    """
+    execucao = {'execucao': datetime.now().isoformat(timespec='milliseconds'), 'versao': versao}
+    linhas_json = [json.dumps({**execucao, **registro}, ensure_ascii=False) for registro in registros]
+
+    historico = st.session_state.setdefault('perfil_execucoes', [])
+    historico.append(linhas_json)
+    del historico[:-EXECUCOES_PERFIL_SESSAO]
+
+    if ARQUIVO_PERFIL:
+        with obter_trava_arquivo_perfil(), open(ARQUIVO_PERFIL, 'a', encoding='utf-8') as arquivo:
+            arquivo.write(''.join(f"{linha}\n" for linha in linhas_json))
+
+    return historico
+
+
+def exibir_perfil(registros, atualizador):
+    """Painel da barra lateral com as etapas da execução e exportação em JSON lines"""
+    if not PERFIL_ATIVO or not registros:
+        return
+
+    historico = registrar_perfil(
+        registros, atualizador.dados['versao'] if atualizador.dados is not None else None
+    )
+
+    def tabela_etapas(etapas):
+        return pd.DataFrame({
+            'Etapa': ['\u2003' * etapa['nivel'] + etapa['etapa'] for etapa in etapas],
+            'Tempo (ms)': [round(etapa['tempo_ms'], 1) for etapa in etapas],
+            'Pico (MB)': [round(etapa['pico_mb'], 2) if etapa['pico_mb'] is not None else None
+                          for etapa in etapas],
+            'Alocado (MB)': [round(etapa['alocado_mb'], 2) for etapa in etapas],
+            'Linhas': [etapa['linhas_entrada'] if etapa['linhas_entrada'] is not None else etapa['linhas_saida']
+                       for etapa in etapas]
+        })
+
+    with st.sidebar.expander("⏱️ Perfil da execução", expanded=False):
+        st.dataframe(tabela_etapas(registros), hide_index=True)
+        st.caption(
+            "Pico (MB) em branco: a etapa executou ao mesmo tempo que outra medição (outra sessão, a "
+            "atualização dos dados ou uma construção no pool de threads), e o pico de memória do "
+            "processo não pode ser atribuído a ela. Com DASHBIRDS_TRABALHADORES=0 as construções não "
+            "usam o pool."
+        )
+        if atualizador.perfil:
+            st.caption("Última atualização dos dados em segundo plano")
+            st.dataframe(tabela_etapas(atualizador.perfil), hide_index=True)
+        st.download_button(
+            f"Exportar as últimas {len(historico)} execuções (JSON lines)",
+            data=''.join(f"{linha}\n" for linhas in historico for linha in linhas),
+            file_name='perfil_dashbirds.jsonl',
+            mime='application/x-ndjson'
+        )
+
+
+def executar():
+    """Executa o dashboard, medindo as etapas quando o perfil de execução está ativo"""
+    with coletar_perfil() as registros:
+        with medir_etapa('execução completa'):
+            main()
+    exibir_perfil(registros, obter_atualizador())
+
+
 if __name__ == "__main__":
-    main()
+    executar()
@@ -0,0 +1,2046 @@
+"""
+Motor de análise do DashBirds: leitura das fontes de dados, snapshot local, processamento,
+filtros, indicadores e agregações. Não depende do Streamlit e pode ser importado por scripts,
+tarefas de pré-processamento e benchmarks; a interface fica em dashbirds.py.
+"""
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3HTTPError
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+import contextvars
+import functools
+import hashlib
+import io
+import json
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import closing, contextmanager
+from types import MappingProxyType
+
+# Copy-on-Write (sempre ativo a partir do pandas 3): as tabelas compartilhadas entre as execuções
+# do script nunca são alteradas no lugar por operações do pandas
+if pd.__version__.startswith('2.'):
+    pd.set_option('mode.copy_on_write', True)
+
+
+# Perfil de execução: com DASHBIRDS_PERFIL=1 cada execução do script (ou bloco em coletar_perfil)
+# registra, por etapa, o tempo, a memória alocada (tracemalloc) e o número de linhas processadas
+PERFIL_ATIVO = os.environ.get('DASHBIRDS_PERFIL') == '1'
+
+# Coleta de etapas da execução atual (None fora de uma coleta ou com o perfil desativado)
+_perfil_atual = contextvars.ContextVar('perfil_atual', default=None)
+
+# Coletas em andamento no processo (sessões simultâneas, a atualização em segundo plano e as
+# construções no pool de threads) e número de coletas já iniciadas. O tracemalloc mede o processo
+# inteiro e reset_peak() vale para todas as threads: o pico de memória de uma etapa só é
+# registrado quando nenhuma outra coleta executou ao mesmo tempo que ela.
+_coletas = {'ativas': 0, 'iniciadas': 0}
+_trava_coletas = threading.Lock()
+
+
+@contextmanager
+def _coleta_ativa():
+    with _trava_coletas:
+        _coletas['ativas'] += 1
+        _coletas['iniciadas'] += 1
+    try:
+        yield
+    finally:
+        with _trava_coletas:
+            _coletas['ativas'] -= 1
+
+
+def _estado_coletas():
+    with _trava_coletas:
+        return _coletas['ativas'], _coletas['iniciadas']
+
+
+@contextmanager
+def coletar_perfil():
+    """Coleta as etapas medidas enquanto o bloco executa; produz a lista de registros das etapas"""
+    if not PERFIL_ATIVO:
+        yield []
+        return
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    coleta = {'registros': [], 'pilha': []}
+    token = _perfil_atual.set(coleta)
+    try:
+        with _coleta_ativa():
+            yield coleta['registros']
+    finally:
+        _perfil_atual.reset(token)
+
+
+def perfil_em_coleta():
+    """Indica se as etapas medidas no contexto atual estão sendo coletadas"""
+    return _perfil_atual.get() is not None
+
+
+@contextmanager
+def medir_etapa(nome):
+    """
+    Mede uma etapa (tempo, pico e saldo de memória alocada) dentro da coleta atual.
+    Etapas podem ser aninhadas: o pico de cada uma inclui o das etapas internas. O pico fica
+    None quando outra coleta executou ao mesmo tempo (ver _coletas).
+    Produz o registro da etapa, onde o chamador pode anotar o número de linhas.
+    """
+    coleta = _perfil_atual.get()
+    if coleta is None:
+        yield {}
+        return
+
+    pilha = coleta['pilha']
+    memoria, pico = tracemalloc.get_traced_memory()
+    if pilha:
+        pilha[-1]['pico'] = max(pilha[-1]['pico'], pico)
+    tracemalloc.reset_peak()
+
+    ativas, iniciadas = _estado_coletas()
+    quadro = {'memoria': memoria, 'pico': memoria}
+    registro = {'etapa': nome, 'nivel': len(pilha), 'linhas_entrada': None, 'linhas_saida': None}
+    coleta['registros'].append(registro)
+    pilha.append(quadro)
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        registro['tempo_ms'] = (time.perf_counter() - inicio) * 1000
+        memoria, pico = tracemalloc.get_traced_memory()
+        pilha.pop()
+        pico = max(quadro['pico'], pico)
+        exclusiva = ativas == 1 and _estado_coletas() == (ativas, iniciadas)
+        registro['pico_mb'] = (pico - quadro['memoria']) / 2 ** 20 if exclusiva else None
+        registro['alocado_mb'] = (memoria - quadro['memoria']) / 2 ** 20
+        if pilha:
+            pilha[-1]['pico'] = max(pilha[-1]['pico'], pico)
+
+
+def _numero_linhas(valor):
+    if isinstance(valor, (pd.DataFrame, pd.Series, np.ndarray)):
+        return len(valor)
+    if isinstance(valor, tuple) and valor and isinstance(valor[-1], pd.DataFrame):
+        return len(valor[-1])
+    return None
+
+
+def medido(nome):
+    """Decorador que mede cada chamada da função como uma etapa do perfil de execução"""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def funcao_medida(*args, **kwargs):
+            if _perfil_atual.get() is None:
+                return funcao(*args, **kwargs)
+
+            with medir_etapa(nome) as registro:
+                registro['linhas_entrada'] = next(
+                    (len(arg) for arg in args if isinstance(arg, pd.DataFrame)), None
+                )
+                resultado = funcao(*args, **kwargs)
+                registro['linhas_saida'] = _numero_linhas(resultado)
+                return resultado
+
+        return funcao_medida
+    return decorador
+
+
+# Planilhas de origem dos dados (podem apontar para um CSV servido localmente)
+URL_PLANILHA_BASE = os.environ.get(
+    'DASHBIRDS_URL_BASE',
+    "https://docs.google.com/spreadsheets/d/1HBBDPNcITK9qHeJik3gZy6H0f4jG-s5QsTJKCcSfts0/edit?usp=sharing"
+)
+URL_PLANILHA_DADOS = os.environ.get(
+    'DASHBIRDS_URL_DADOS',
+    "https://docs.google.com/spreadsheets/d/1pkT3tP_2lDpoWl3m04tsQuvBbClTLhGf2IIEihcwWDs/edit?usp=sharing"
+)
+
+# Snapshot local dos dados já processados, compartilhado entre os processos do Streamlit
+DIRETORIO_SNAPSHOT = os.environ.get(
+    'DASHBIRDS_SNAPSHOT_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.dashbirds_snapshot')
+)
+# Tempo (em segundos) antes de consultar novamente as planilhas de origem
+VALIDADE_SNAPSHOT = int(os.environ.get('DASHBIRDS_SNAPSHOT_TTL', 3600))
+
+TABELAS_SNAPSHOT = ['tabela_base', 'tabela_dados']
+
+# Com DASHBIRDS_MEMORIA_COMPARTILHADA=1 o snapshot também é gravado em Arrow IPC sem compressão,
+# e os processos do Streamlit mapeiam esses arquivos em memória (somente leitura) em vez de manter
+# cada um a sua cópia das tabelas: as páginas dos dados são compartilhadas pelo sistema operacional
+MEMORIA_COMPARTILHADA = os.environ.get('DASHBIRDS_MEMORIA_COMPARTILHADA') == '1'
+
+# Origem dos dados: 'google_sheets' (padrão), 'csv' (diretório com tabela_base.csv e tabela_dados.csv),
+# 'parquet' (diretório com tabela_base.parquet e tabela_dados.parquet) ou 'sqlite' (arquivo de banco
+# com as tabelas tabela_base e tabela_dados). Fontes locais dispensam acesso à rede.
+FONTE_DADOS = os.environ.get('DASHBIRDS_FONTE', 'google_sheets')
+CAMINHO_FONTE = os.environ.get(
+    'DASHBIRDS_FONTE_CAMINHO',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dados')
+)
+
+def caminho_fonte():
+    """Localização da fonte de dados configurada: o caminho local ou as URLs das planilhas"""
+    if FONTE_DADOS == 'google_sheets':
+        return [URL_PLANILHA_BASE, URL_PLANILHA_DADOS]
+    return CAMINHO_FONTE
+
+
+def snapshot_da_fonte_atual(metadados):
+    """
+    Indica se o snapshot foi gerado a partir da fonte de dados configurada (tipo e caminho).
+    Snapshots antigos, sem a fonte registrada, vêm das planilhas.
+    """
+    return (metadados.get('fonte', 'google_sheets') == FONTE_DADOS
+            and metadados.get('caminho_fonte') == caminho_fonte())
+
+
+# Nome do arquivo (ou tabela do banco) de cada planilha nas fontes locais
+NOMES_TABELAS_FONTE = {'base': 'tabela_base', 'dados': 'tabela_dados'}
+# Versão do formato do snapshot: snapshots de outro formato são descartados
+FORMATO_SNAPSHOT = 2
+
+
+def url_exportacao_csv(sheet_url):
+    """Constrói a URL de exportação como CSV a partir do link de compartilhamento da planilha"""
+    if '/d/' not in sheet_url:
+        # URL direta de um arquivo CSV
+        return sheet_url
+
+    # Extrai o ID da planilha
+    sheet_id = sheet_url.split('/d/')[1].split('/edit')[0]
+
+    return f"https://docs.google.com/spreadsheets/d/{sheet_id}/export?format=csv"
+
+
+# Parâmetros do cliente HTTP usado nos downloads
+TIMEOUT_DOWNLOAD = (10, 60)  # (conexão, leitura) em segundos
+TENTATIVAS_DOWNLOAD = 3
+ESPERA_BASE_DOWNLOAD = 1.0  # segundos, dobrando a cada nova tentativa
+STATUS_REPETIR_DOWNLOAD = {429, 500, 502, 503, 504}
+
+
+@functools.lru_cache(maxsize=None)
+def obter_sessao_http():
+    """Sessão HTTP compartilhada pelo processo, reaproveitando as conexões entre os downloads"""
+    sessao = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+    sessao.mount('https://', adaptador)
+    sessao.mount('http://', adaptador)
+    return sessao
+
+
+class _LeitorComHash(io.RawIOBase):
+    """
+    Repassa o corpo da resposta HTTP ao parser de CSV sem acumular o conteúdo em memória,
+    calculando durante a leitura o hash completo e o hash dos primeiros n_bytes_prefixo bytes.
+    """
+
+    def __init__(self, origem, n_bytes_prefixo=None):
+        self.origem = origem
+        self.n_bytes_prefixo = n_bytes_prefixo
+        self.hash = hashlib.sha256()
+        self.hash_prefixo = None
+        self.limite_prefixo = b''  # bytes imediatamente antes e depois do prefixo
+        self.bytes = 0
+        self.ultimo_byte = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        bloco = self.origem.read(len(buffer))
+        n = len(bloco)
+
+        # O fim do prefixo está dentro deste bloco (e há pelo menos um byte depois dele)
+        p = self.n_bytes_prefixo
+        if p is not None and self.hash_prefixo is None and self.bytes <= p < self.bytes + n:
+            corte = p - self.bytes
+            self.hash.update(bloco[:corte])
+            self.hash_prefixo = self.hash.hexdigest()
+            self.limite_prefixo = (bloco[corte - 1:corte] if corte else self.ultimo_byte) + bloco[corte:corte + 1]
+            self.hash.update(bloco[corte:])
+        else:
+            self.hash.update(bloco)
+
+        if n:
+            self.ultimo_byte = bloco[-1:]
+        self.bytes += n
+        buffer[:n] = bloco
+        return n
+
+
+# Função para download direto da planilha como CSV
+def download_csv_from_google_sheet(sheet_url, validadores=None, sessao=None):
+    """
+    Faz download direto da planilha como CSV, sem necessidade de API ou credenciais.
+    Funciona apenas se a planilha estiver configurada para "Qualquer pessoa com o link pode visualizar".
+
+    Quando recebe os validadores da última versão baixada (ETag/Last-Modified, hash e tamanho),
+    faz uma requisição condicional. O corpo da resposta é lido em streaming diretamente pelo
+    parser de CSV, com timeout e novas tentativas (backoff exponencial com jitter) em falhas
+    temporárias. Não usa funções do Streamlit, podendo ser executada em outras threads.
+
+    Retorna um dicionário com a tabela lida (None se a planilha não mudou ou em caso de erro),
+    os hashes do conteúdo, os novos validadores, o indicador 'nao_modificado' e a mensagem de 'erro'.
+    """
+    validadores = validadores or {}
+    sessao = sessao or requests
+    resultado = {
+        'tabela': None,
+        'nao_modificado': False,
+        'etag': validadores.get('etag'),
+        'last_modified': validadores.get('last_modified'),
+        'erro': None
+    }
+
+    # Cabeçalhos da requisição condicional
+    cabecalhos = {}
+    if validadores.get('etag'):
+        cabecalhos['If-None-Match'] = validadores['etag']
+    if validadores.get('last_modified'):
+        cabecalhos['If-Modified-Since'] = validadores['last_modified']
+
+    for tentativa in range(TENTATIVAS_DOWNLOAD):
+        if tentativa:
+            time.sleep(random.uniform(0, ESPERA_BASE_DOWNLOAD * 2 ** tentativa))
+
+        try:
+            # Faz a requisição HTTP
+            with sessao.get(url_exportacao_csv(sheet_url), headers=cabecalhos,
+                            stream=True, timeout=TIMEOUT_DOWNLOAD) as response:
+
+                # Verifica se a requisição foi bem-sucedida
+                if response.status_code == 304:
+                    resultado['nao_modificado'] = True
+                    resultado['erro'] = None
+                    return resultado
+
+                if response.status_code != 200:
+                    resultado['erro'] = (
+                        f"Erro ao baixar a planilha: {response.status_code}. Verifique se a planilha está "
+                        "configurada para 'Qualquer pessoa com o link pode visualizar'."
+                    )
+                    if response.status_code in STATUS_REPETIR_DOWNLOAD:
+                        continue
+                    return resultado
+
+                # Lê o CSV diretamente do corpo da resposta
+                response.raw.decode_content = True
+                leitor = _LeitorComHash(response.raw, validadores.get('bytes'))
+                resultado['tabela'] = ler_csv(io.BufferedReader(leitor))
+                resultado['sha256'] = leitor.hash.hexdigest()
+                resultado['bytes'] = leitor.bytes
+                resultado['sha256_prefixo'] = leitor.hash_prefixo
+                resultado['limite_prefixo'] = leitor.limite_prefixo
+                resultado['etag'] = response.headers.get('ETag')
+                resultado['last_modified'] = response.headers.get('Last-Modified')
+                resultado['erro'] = None
+                return resultado
+
+        except (requests.RequestException, Urllib3HTTPError) as e:
+            resultado['erro'] = f"Erro ao fazer download da planilha: {e}"
+
+        except pd.errors.EmptyDataError:
+            resultado['erro'] = "A planilha baixada está vazia."
+            return resultado
+
+        except ValueError as e:
+            # Conteúdo que não é um CSV em UTF-8 (UnicodeDecodeError) ou mal formado (ParserError):
+            # uma nova tentativa receberia o mesmo conteúdo
+            resultado['tabela'] = None
+            resultado['erro'] = f"Não foi possível ler o CSV da planilha: {e}"
+            return resultado
+
+    return resultado
+
+
+def ler_csv(arquivo):
+    """Lê um CSV exportado da planilha a partir de um arquivo ou fluxo de bytes"""
+    return pd.read_csv(arquivo, encoding='utf-8', low_memory=False)
+
+
+def _resultado_leitura(validadores=None):
+    """Dicionário de resultado no mesmo formato de download_csv_from_google_sheet"""
+    validadores = validadores or {}
+    return {
+        'tabela': None,
+        'nao_modificado': False,
+        'etag': validadores.get('etag'),
+        'last_modified': validadores.get('last_modified'),
+        'erro': None
+    }
+
+
+def _arquivo_nao_modificado(caminho, validadores, resultado):
+    """
+    Usa a data de modificação e o tamanho do arquivo como validadores (no lugar do Last-Modified).
+    Retorna True, marcando o resultado como não modificado, se o arquivo não mudou.
+    """
+    validadores = validadores or {}
+    estado = os.stat(caminho)
+    resultado['last_modified'] = str(estado.st_mtime_ns)
+    resultado['etag'] = None
+    if validadores.get('last_modified') == resultado['last_modified'] and validadores.get('bytes') == estado.st_size:
+        resultado['nao_modificado'] = True
+        return True
+    return False
+
+
+def _hash_linhas(tabela, resultado, n_linhas_prefixo=None):
+    """
+    Hash do conteúdo de uma tabela lida de uma fonte tabular (Parquet ou SQLite), calculado
+    sobre o hash de cada linha, e hash das primeiras n_linhas_prefixo linhas. O prefixo sempre
+    termina em uma linha completa, por isso o limite é registrado como uma quebra de linha.
+    """
+    hashes = pd.util.hash_pandas_object(tabela, index=False).to_numpy()
+    resultado['sha256'] = hashlib.sha256(hashes.tobytes()).hexdigest()
+    resultado['sha256_prefixo'] = None
+    resultado['limite_prefixo'] = b''
+    if n_linhas_prefixo is not None and n_linhas_prefixo < len(tabela):
+        resultado['sha256_prefixo'] = hashlib.sha256(hashes[:n_linhas_prefixo].tobytes()).hexdigest()
+        resultado['limite_prefixo'] = b'\n'
+
+
+def ler_fonte_google_sheets(nome, validadores=None, sessao=None):
+    """Planilha do Google Sheets (ou CSV servido por HTTP) configurada para a tabela"""
+    url = {'base': URL_PLANILHA_BASE, 'dados': URL_PLANILHA_DADOS}[nome]
+    return download_csv_from_google_sheet(url, validadores, sessao)
+
+
+def ler_fonte_csv(nome, validadores=None, sessao=None):
+    """Arquivo CSV local, lido em streaming com os mesmos hashes do download das planilhas"""
+    resultado = _resultado_leitura(validadores)
+    caminho = os.path.join(CAMINHO_FONTE, f"{NOMES_TABELAS_FONTE[nome]}.csv")
+
+    try:
+        if _arquivo_nao_modificado(caminho, validadores, resultado):
+            return resultado
+
+        with open(caminho, 'rb') as arquivo:
+            leitor = _LeitorComHash(arquivo, (validadores or {}).get('bytes'))
+            resultado['tabela'] = ler_csv(io.BufferedReader(leitor))
+
+        resultado['sha256'] = leitor.hash.hexdigest()
+        resultado['bytes'] = leitor.bytes
+        resultado['sha256_prefixo'] = leitor.hash_prefixo
+        resultado['limite_prefixo'] = leitor.limite_prefixo
+
+    except OSError as e:
+        resultado['erro'] = f"Erro ao ler o arquivo {caminho}: {e}"
+
+    except pd.errors.EmptyDataError:
+        resultado['erro'] = f"O arquivo {caminho} está vazio."
+
+    except ValueError as e:
+        # Arquivo que não está em UTF-8 (UnicodeDecodeError) ou CSV mal formado (ParserError)
+        resultado['erro'] = f"Não foi possível ler o CSV do arquivo {caminho}: {e}"
+
+    return resultado
+
+
+def ler_fonte_parquet(nome, validadores=None, sessao=None):
+    """Arquivo Parquet local com a tabela"""
+    resultado = _resultado_leitura(validadores)
+    caminho = os.path.join(CAMINHO_FONTE, f"{NOMES_TABELAS_FONTE[nome]}.parquet")
+
+    try:
+        if _arquivo_nao_modificado(caminho, validadores, resultado):
+            return resultado
+
+        resultado['tabela'] = pd.read_parquet(caminho)
+        resultado['bytes'] = os.path.getsize(caminho)
+        _hash_linhas(resultado['tabela'], resultado, (validadores or {}).get('linhas'))
+
+    # Erros do pyarrow (arquivo corrompido, tipo não suportado) e colunas sem hash (listas)
+    except (OSError, ValueError, TypeError, pa.ArrowException) as e:
+        resultado['tabela'] = None
+        resultado['erro'] = f"Erro ao ler o arquivo {caminho}: {e}"
+
+    return resultado
+
+
+def ler_fonte_sqlite(nome, validadores=None, sessao=None):
+    """Tabela de um banco SQLite local (as duas tabelas ficam no mesmo arquivo)"""
+    resultado = _resultado_leitura(validadores)
+    caminho = CAMINHO_FONTE
+    tabela = NOMES_TABELAS_FONTE[nome]
+
+    try:
+        # O arquivo do banco muda quando qualquer uma das tabelas muda: a comparação pelo hash
+        # do conteúdo decide depois se esta tabela foi de fato alterada
+        if _arquivo_nao_modificado(caminho, validadores, resultado):
+            return resultado
+
+        with closing(sqlite3.connect(f"file:{caminho}?mode=ro", uri=True)) as conexao:
+            resultado['tabela'] = pd.read_sql_query(f'SELECT * FROM "{tabela}"', conexao)
+        resultado['bytes'] = os.path.getsize(caminho)
+        _hash_linhas(resultado['tabela'], resultado, (validadores or {}).get('linhas'))
+
+    except (OSError, ValueError, TypeError, sqlite3.Error, pd.errors.DatabaseError) as e:
+        resultado['tabela'] = None
+        resultado['erro'] = f"Erro ao ler a tabela {tabela} do banco {caminho}: {e}"
+
+    return resultado
+
+
+# Funções de leitura de cada fonte de dados: recebem o nome da tabela ('base' ou 'dados'), os
+# validadores da última leitura e a sessão HTTP, e retornam o resultado no formato do download
+FONTES_DADOS = {
+    'google_sheets': ler_fonte_google_sheets,
+    'csv': ler_fonte_csv,
+    'parquet': ler_fonte_parquet,
+    'sqlite': ler_fonte_sqlite
+}
+
+
+def ler_tabela_fonte(nome, validadores=None, sessao=None):
+    """Lê a tabela ('base' ou 'dados') da fonte de dados configurada"""
+    if FONTE_DADOS not in FONTES_DADOS:
+        resultado = _resultado_leitura(validadores)
+        resultado['erro'] = (
+            f"Fonte de dados desconhecida: '{FONTE_DADOS}'. Use uma de: {', '.join(FONTES_DADOS)}."
+        )
+        return resultado
+
+    return FONTES_DADOS[FONTE_DADOS](nome, validadores, sessao)
+
+
+def comparar_planilha(download, anterior):
+    """
+    Compara a planilha baixada com a versão registrada no snapshot.
+    Retorna 'inalterada', 'ampliada' (apenas novas linhas no final) ou 'alterada'.
+    """
+    if download['nao_modificado']:
+        return 'inalterada'
+
+    if not anterior or not anterior.get('sha256'):
+        return 'alterada'
+
+    if download['sha256'] == anterior['sha256']:
+        return 'inalterada'
+
+    # A versão anterior precisa ser um prefixo do novo conteúdo, terminando em uma quebra de linha
+    limite = download['limite_prefixo']
+    if (download['sha256_prefixo'] == anterior['sha256']
+            and 'linhas' in anterior
+            and (limite[:1] == b'\n' or limite[1:2] in (b'\r', b'\n'))):
+        return 'ampliada'
+
+    return 'alterada'
+
+
+def descrever_planilha(download, anterior=None):
+    """Registro de uma planilha no snapshot: hash, tamanho, número de linhas e validadores HTTP"""
+    if download['nao_modificado']:
+        return {**anterior, 'etag': download['etag'], 'last_modified': download['last_modified']}
+
+    return {
+        'sha256': download['sha256'],
+        'bytes': download['bytes'],
+        'linhas': len(download['tabela']),
+        'etag': download['etag'],
+        'last_modified': download['last_modified']
+    }
+
+
+# Fração máxima de valores distintos para uma coluna de texto ser convertida em categórica
+LIMITE_CARDINALIDADE_CATEGORICA = 0.5
+
+# Colunas numéricas mantidas em precisão dupla (coordenadas dos mapas)
+COLUNAS_PRECISAO_DUPLA = ['Latitude', 'Longitude']
+
+
+def _coluna_texto(serie):
+    return isinstance(serie.dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(serie.dtype)
+
+
+def otimizar_tipos(tabela_base, tabela_dados):
+    """
+    Esquema aplicado na carga dos dados, alterando as tabelas no próprio lugar:
+    - colunas de texto com poucos valores distintos viram categóricas, com as mesmas
+      categorias (ordenadas) nas duas tabelas quando a coluna aparece em ambas;
+    - colunas numéricas são reduzidas para o menor tipo adequado.
+    """
+    tabelas = [tabela_base, tabela_dados]
+
+    for coluna in dict.fromkeys([*tabela_base.columns, *tabela_dados.columns]):
+        series = [tabela[coluna] for tabela in tabelas if coluna in tabela.columns]
+        if not all(_coluna_texto(serie) for serie in series):
+            continue
+        if all(serie.nunique() > LIMITE_CARDINALIDADE_CATEGORICA * len(serie) for serie in series):
+            continue
+
+        valores = set()
+        for serie in series:
+            valores.update(serie.dropna().unique())
+
+        # Colunas com valores de tipos misturados permanecem como estão
+        if not all(isinstance(valor, str) for valor in valores):
+            continue
+
+        tipo = pd.CategoricalDtype(sorted(valores))
+        for tabela in tabelas:
+            if coluna in tabela.columns:
+                tabela[coluna] = tabela[coluna].astype(tipo)
+
+    for tabela in tabelas:
+        for coluna in tabela.select_dtypes(include='number').columns:
+            if coluna in COLUNAS_PRECISAO_DUPLA or coluna == 'species_id':
+                continue
+            if pd.api.types.is_integer_dtype(tabela[coluna].dtype):
+                tabela[coluna] = pd.to_numeric(tabela[coluna], downcast='integer')
+            elif pd.api.types.is_float_dtype(tabela[coluna].dtype):
+                tabela[coluna] = pd.to_numeric(tabela[coluna], downcast='float')
+
+    return tabela_base, tabela_dados
+
+
+def medir_memoria(*tabelas):
+    """
+    Uso de memória (em bytes) das tabelas e a estimativa do uso sem a otimização de tipos,
+    isto é, com textos como objetos Python e números em 64 bits.
+    Retorna {'antes': estimativa sem otimização, 'depois': uso atual}.
+    """
+    antes = 0
+    depois = 0
+    for tabela in tabelas:
+        depois += int(tabela.memory_usage(deep=True, index=False).sum())
+
+        for coluna in tabela.columns:
+            serie = tabela[coluna]
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                tamanhos = np.array([sys.getsizeof(categoria) for categoria in serie.cat.categories] + [sys.getsizeof(np.nan)])
+                antes += int(tamanhos[serie.cat.codes.to_numpy()].sum()) + 8 * len(serie)
+            elif pd.api.types.is_numeric_dtype(serie.dtype):
+                antes += 8 * len(serie)
+            else:
+                antes += int(serie.memory_usage(deep=True, index=False))
+
+    return {'antes': antes, 'depois': depois}
+
+
+def normalizar_nome_cientifico(nomes):
+    """Chave de comparação entre os nomes científicos das duas planilhas"""
+    return nomes.astype(object).str.strip().str.lower()
+
+
+def tabelas_combinaveis(tabela_base, tabela_dados):
+    """Indica se as observações podem ser associadas às espécies da tabela base pelo nome científico"""
+    return 'Scientific Name' in tabela_dados.columns and 'Nome científico' in tabela_base.columns
+
+
+@medido('processamento dos dados')
+def processar_dados(tabela_base, tabela_dados):
+    """
+    Converte as datas e associa cada observação ao ID inteiro da sua espécie ('species_id'),
+    que é a posição da espécie na tabela base (-1 quando o nome científico não é encontrado).
+    Os atributos da tabela base não são copiados para as observações: são buscados pelo ID
+    quando um gráfico ou lista precisa deles (ver anexar_atributos).
+    """
+    # Convertendo datas
+    if 'Date' in tabela_dados.columns:
+        tabela_dados['Date'] = pd.to_datetime(tabela_dados['Date'], errors='coerce')
+        tabela_dados['Year'] = tabela_dados['Date'].dt.year
+        tabela_dados['Month'] = tabela_dados['Date'].dt.month
+
+    # Associando as tabelas pelo nome científico
+    if tabelas_combinaveis(tabela_base, tabela_dados):
+        # Uma linha por espécie na tabela base (mantendo a primeira ocorrência de cada nome)
+        chaves_base = normalizar_nome_cientifico(tabela_base['Nome científico'])
+        unicas = ~chaves_base.duplicated().to_numpy()
+        tabela_base = tabela_base[unicas].reset_index(drop=True)
+
+        ids = pd.Index(chaves_base[unicas]).get_indexer(
+            normalizar_nome_cientifico(tabela_dados['Scientific Name'])
+        )
+        ids[tabela_dados['Scientific Name'].isna().to_numpy()] = -1
+        tabela_dados['species_id'] = ids.astype(np.int32)
+    else:
+        # Sem as colunas dos nomes científicos (avisado em montar_conjunto_dados)
+        tabela_dados['species_id'] = np.full(len(tabela_dados), -1, dtype=np.int32)
+
+    return otimizar_tipos(tabela_base, tabela_dados)
+
+
+@medido('acréscimo de observações')
+def acrescentar_observacoes(tabela_base, tabela_dados, novas_observacoes):
+    """Processa apenas as novas observações e as acrescenta aos dados já processados"""
+    # As tabelas atuais podem estar em uso (ou mapeadas somente leitura) e não são alteradas
+    tabela_base = tabela_base.copy()
+    _, novos_dados = processar_dados(tabela_base, novas_observacoes)
+
+    tabela_dados = pd.concat([tabela_dados, novos_dados], ignore_index=True)
+
+    # Categóricas com categorias diferentes viram texto na concatenação: refaz o esquema
+    return otimizar_tipos(tabela_base, tabela_dados)
+
+
+def atributo_por_observacao(tabela_dados, tabela_base, coluna):
+    """Valores de uma coluna da tabela base para cada observação, buscados pelo ID da espécie"""
+    valores = pd.api.extensions.take(
+        tabela_base[coluna].array, tabela_dados['species_id'].to_numpy(), allow_fill=True
+    )
+    return pd.Series(valores, index=tabela_dados.index, name=coluna)
+
+
+def anexar_atributos(df, tabela_base, colunas):
+    """
+    Acrescenta às observações as colunas pedidas da tabela base, buscadas pelo ID da espécie.
+    Colunas já presentes nas observações ou ausentes da tabela base são ignoradas.
+    """
+    if tabela_base is None or 'species_id' not in df.columns:
+        return df
+
+    colunas = [coluna for coluna in colunas if coluna in tabela_base.columns and coluna not in df.columns]
+    if not colunas:
+        return df
+
+    atributos = pd.DataFrame({coluna: atributo_por_observacao(df, tabela_base, coluna) for coluna in colunas})
+    return pd.concat([df, atributos], axis=1)
+
+
+def especies_nao_encontradas(tabela_dados):
+    """Nomes científicos das observações que não têm correspondência na tabela base"""
+    if 'species_id' not in tabela_dados.columns or 'Scientific Name' not in tabela_dados.columns:
+        return []
+
+    nomes = tabela_dados.loc[tabela_dados['species_id'].to_numpy() < 0, 'Scientific Name'].dropna().unique()
+    return sorted(str(nome) for nome in nomes)
+
+
+# Snapshot local em Parquet
+def _caminho_snapshot(nome):
+    return os.path.join(DIRETORIO_SNAPSHOT, nome)
+
+
+def _gravar_json_atomico(caminho, conteudo):
+    """Grava um JSON de forma atômica (arquivo temporário + os.replace)"""
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(conteudo, arquivo)
+    os.replace(temporario, caminho)
+
+
+def gravar_tabela_mapeavel(tabela, caminho):
+    """
+    Grava a tabela em Arrow IPC, sem compressão e em um único bloco, de modo que as colunas possam
+    ser mapeadas diretamente como arrays NumPy: categóricas são gravadas como os códigos inteiros,
+    datas como int64 e números com NaN como valores (e não nulos). As categorias e os tipos
+    originais ficam nos metadados do arquivo.
+    """
+    colunas = {}
+    tipos = {}
+    for coluna in tabela.columns:
+        serie = tabela[coluna]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            colunas[coluna] = pa.array(serie.cat.codes.to_numpy())
+            tipos[coluna] = {'categorias': serie.cat.categories.tolist(), 'ordenada': bool(serie.cat.ordered)}
+        elif pd.api.types.is_datetime64_dtype(serie.dtype):
+            colunas[coluna] = pa.array(serie.to_numpy().view(np.int64))
+            tipos[coluna] = {'dtype': str(serie.dtype)}
+        elif isinstance(serie.dtype, np.dtype) and serie.dtype.kind in 'iuf':
+            colunas[coluna] = pa.array(serie.to_numpy())
+        else:
+            colunas[coluna] = pa.array(serie, from_pandas=True)
+
+    tabela_arrow = pa.table(colunas, metadata={'dashbirds': json.dumps(tipos)})
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with pa.OSFile(temporario, 'wb') as arquivo, pa.ipc.new_file(arquivo, tabela_arrow.schema) as escritor:
+        escritor.write_table(tabela_arrow, max_chunksize=max(len(tabela), 1))
+    os.replace(temporario, caminho)
+
+
+def mapear_tabela(caminho):
+    """
+    Abre uma tabela gravada por gravar_tabela_mapeavel mapeando o arquivo em memória.
+    As colunas numéricas, de datas e os códigos das categóricas apontam diretamente para o
+    arquivo mapeado (sem cópia e somente leitura); apenas colunas de texto são convertidas.
+    """
+    tabela_arrow = pa.ipc.open_file(pa.memory_map(caminho)).read_all()
+    tipos = json.loads(tabela_arrow.schema.metadata[b'dashbirds'])
+
+    colunas = {}
+    for coluna, dados_coluna in zip(tabela_arrow.column_names, tabela_arrow.columns):
+        if pa.types.is_primitive(dados_coluna.type) and not pa.types.is_boolean(dados_coluna.type) \
+                and dados_coluna.null_count == 0:
+            # Tabelas vazias não têm nenhum bloco
+            if dados_coluna.num_chunks == 1:
+                valores = dados_coluna.chunk(0).to_numpy(zero_copy_only=True)
+            else:
+                valores = dados_coluna.to_numpy()
+        else:
+            valores = dados_coluna.to_pandas()
+
+        if coluna in tipos and 'categorias' in tipos[coluna]:
+            tipo = pd.CategoricalDtype(tipos[coluna]['categorias'], ordered=tipos[coluna]['ordenada'])
+            valores = pd.Categorical.from_codes(valores, dtype=tipo, validate=False)
+        elif coluna in tipos:
+            valores = valores.view(tipos[coluna]['dtype'])
+
+        colunas[coluna] = pd.Series(valores, name=coluna, copy=False)
+
+    return pd.DataFrame(colunas, index=pd.RangeIndex(tabela_arrow.num_rows), copy=False)
+
+
+@medido('leitura do snapshot')
+def carregar_snapshot():
+    """
+    Carrega o snapshot local dos dados processados.
+    Retorna (metadados, tabela_base, tabela_dados) ou None se não houver snapshot válido
+    (inclusive um snapshot de outra fonte de dados, ver snapshot_da_fonte_atual).
+    """
+    try:
+        with open(_caminho_snapshot('snapshot.json'), encoding='utf-8') as arquivo:
+            metadados = json.load(arquivo)
+
+        if metadados.get('formato') != FORMATO_SNAPSHOT or not snapshot_da_fonte_atual(metadados):
+            return None
+
+        caminhos_arrow = [_caminho_snapshot(f"{metadados['versao']}_{nome}.arrow") for nome in TABELAS_SNAPSHOT]
+        if MEMORIA_COMPARTILHADA and all(os.path.exists(caminho) for caminho in caminhos_arrow):
+            return (metadados, *[mapear_tabela(caminho) for caminho in caminhos_arrow])
+
+        tabelas = [
+            pd.read_parquet(_caminho_snapshot(f"{metadados['versao']}_{nome}.parquet"))
+            for nome in TABELAS_SNAPSHOT
+        ]
+        return (metadados, *tabelas)
+
+    except (OSError, ValueError, KeyError):
+        # Sem snapshot, snapshot incompleto ou sendo substituído por outro processo
+        return None
+
+
+@medido('gravação do snapshot')
+def salvar_snapshot(planilhas, tabela_base, tabela_dados, erros=None, acrescimo=None):
+    """
+    Grava os dados processados em Parquet, identificados pelo hash das duas planilhas.
+    Os arquivos de uma versão são gravados antes do snapshot.json que aponta para ela,
+    de modo que outros processos nunca leem um snapshot parcial. Uma falha na gravação
+    não interrompe a atualização: a mensagem é acrescentada à lista 'erros', se dada.
+    Quando a versão apenas acrescenta observações a outra, 'acrescimo' registra a versão
+    anterior e o seu número de observações (ver montar_conjunto_dados).
+    Retorna os metadados gravados.
+    """
+    versao = hashlib.sha256(
+        (planilhas['base']['sha256'] + planilhas['dados']['sha256']).encode()
+    ).hexdigest()[:12]
+    metadados = {
+        'versao': versao,
+        'formato': FORMATO_SNAPSHOT,
+        'fonte': FONTE_DADOS,
+        'caminho_fonte': caminho_fonte(),
+        'planilhas': planilhas,
+        'atualizado_em': datetime.now().timestamp()
+    }
+    if acrescimo is not None:
+        metadados['acrescimo'] = acrescimo
+
+    try:
+        os.makedirs(DIRETORIO_SNAPSHOT, exist_ok=True)
+
+        for nome, tabela in zip(TABELAS_SNAPSHOT, [tabela_base, tabela_dados]):
+            caminho = _caminho_snapshot(f"{versao}_{nome}.parquet")
+            temporario = f"{caminho}.{os.getpid()}.tmp"
+            tabela.to_parquet(temporario, index=False)
+            os.replace(temporario, caminho)
+
+            if MEMORIA_COMPARTILHADA:
+                gravar_tabela_mapeavel(tabela, _caminho_snapshot(f"{versao}_{nome}.arrow"))
+
+        _gravar_json_atomico(_caminho_snapshot('snapshot.json'), metadados)
+
+        # Removendo arquivos de versões anteriores (arquivos ainda mapeados por outros
+        # processos continuam válidos para eles até serem liberados)
+        for arquivo in os.listdir(DIRETORIO_SNAPSHOT):
+            if arquivo.endswith(('.parquet', '.arrow')) and not arquivo.startswith(versao):
+                os.remove(_caminho_snapshot(arquivo))
+
+    except Exception as e:
+        # O snapshot é apenas uma otimização: o dashboard continua com os dados em memória
+        if erros is not None:
+            erros.append(f"Não foi possível gravar o snapshot local dos dados: {e}")
+
+    return metadados
+
+
+def marcar_snapshot_atualizado(metadados):
+    """Renova a validade do snapshot quando as planilhas não mudaram"""
+    metadados = {**metadados, 'atualizado_em': datetime.now().timestamp()}
+    try:
+        _gravar_json_atomico(_caminho_snapshot('snapshot.json'), metadados)
+    except OSError:
+        pass
+    return metadados
+
+
+def atualizar_snapshot(snapshot=None, erros=None):
+    """
+    Consulta as planilhas na fonte de dados configurada (requisições condicionais ou data de
+    modificação dos arquivos locais) e atualiza o snapshot local.
+
+    - Planilhas inalteradas (HTTP 304 ou mesmo hash): apenas renova a validade do snapshot
+    - Somente novas linhas na planilha de observações: processa e acrescenta apenas essas linhas
+    - Qualquer outra alteração: reprocessa tudo
+
+    As mensagens de erro são acrescentadas à lista 'erros', se dada, para o chamador exibi-las.
+
+    Retorna (metadados, tabela_base, tabela_dados) ou None se o download falhar.
+    """
+    # Os validadores só valem para a mesma fonte de dados
+    anteriores = {}
+    if snapshot is not None and snapshot_da_fonte_atual(snapshot[0]):
+        anteriores = snapshot[0].get('planilhas', {})
+
+    # As duas planilhas são independentes e lidas em paralelo
+    sessao = obter_sessao_http() if FONTE_DADOS == 'google_sheets' else None
+    with medir_etapa('leitura das planilhas') as registro, ThreadPoolExecutor(max_workers=2) as executor:
+        # Tabela base com informações taxonômicas e ecológicas
+        futuro_base = executor.submit(ler_tabela_fonte, 'base', anteriores.get('base'), sessao)
+
+        # Tabela de dados de observações
+        futuro_dados = executor.submit(ler_tabela_fonte, 'dados', anteriores.get('dados'), sessao)
+
+        download_base = futuro_base.result()
+        download_dados = futuro_dados.result()
+        registro['linhas_saida'] = sum(
+            len(download['tabela']) for download in (download_base, download_dados) if download['tabela'] is not None
+        )
+
+    # Verificação de dados
+    falhou = False
+    for download in (download_base, download_dados):
+        if download['erro']:
+            if erros is not None:
+                erros.append(download['erro'])
+            falhou = True
+        elif download['nao_modificado'] and snapshot is None:
+            falhou = True
+    if falhou:
+        return None
+
+    situacao_base = comparar_planilha(download_base, anteriores.get('base'))
+    situacao_dados = comparar_planilha(download_dados, anteriores.get('dados'))
+
+    planilhas = {
+        'base': descrever_planilha(download_base, anteriores.get('base')),
+        'dados': descrever_planilha(download_dados, anteriores.get('dados'))
+    }
+
+    if snapshot is not None and situacao_base == 'inalterada' and situacao_dados == 'inalterada':
+        return (marcar_snapshot_atualizado({**snapshot[0], 'planilhas': planilhas}), *snapshot[1:])
+
+    if snapshot is not None and situacao_base == 'inalterada' and situacao_dados == 'ampliada':
+        novas_observacoes = download_dados['tabela'].iloc[anteriores['dados']['linhas']:].copy()
+        tabelas = acrescentar_observacoes(*snapshot[1:], novas_observacoes)
+        acrescimo = {'versao_anterior': snapshot[0]['versao'], 'linhas_anteriores': len(snapshot[2])}
+    else:
+        # Planilhas não modificadas (HTTP 304) são reaproveitadas a partir do snapshot (copiadas, pois
+        # o processamento altera as tabelas e as do snapshot podem estar em uso pelo dashboard)
+        tabela_base = snapshot[1].copy() if download_base['nao_modificado'] else download_base['tabela']
+        tabela_dados = snapshot[2].copy() if download_dados['nao_modificado'] else download_dados['tabela']
+        tabelas = processar_dados(tabela_base, tabela_dados)
+        acrescimo = None
+
+    metadados = salvar_snapshot(planilhas, *tabelas, erros=erros, acrescimo=acrescimo)
+
+    # Troca as tabelas recém-processadas pelas mapeadas do snapshot, compartilhadas com os outros processos
+    if MEMORIA_COMPARTILHADA:
+        mapeado = carregar_snapshot()
+        if mapeado is not None and mapeado[0]['versao'] == metadados['versao']:
+            return mapeado
+
+    return (metadados, *tabelas)
+
+
+# Colunas com índice pré-calculado para os filtros da barra lateral
+COLUNAS_FILTRO = ['Year', 'Location', 'Habitat (AVONET)']
+
+
+@medido('índice de filtros')
+def construir_indice_filtros(tabela_dados, tabela_base):
+    """
+    Pré-calcula, para cada coluna de filtro, as posições das observações com cada valor.
+    Colunas da tabela base (como o habitat) são buscadas pelo ID da espécie.
+    Retorna {coluna: {valor: array ordenado de posições}}.
+    """
+    indice = {}
+    for coluna in COLUNAS_FILTRO:
+        if coluna in tabela_dados.columns:
+            serie = tabela_dados[coluna]
+        elif coluna in tabela_base.columns:
+            serie = atributo_por_observacao(tabela_dados, tabela_base, coluna)
+        else:
+            continue
+
+        grupos = serie.groupby(serie, sort=False, observed=True).indices
+        indice[coluna] = {valor: _somente_leitura(posicoes.astype(np.int32)) for valor, posicoes in grupos.items()}
+    return indice
+
+
+def _somente_leitura(array):
+    array.setflags(write=False)
+    return array
+
+
+def congelar_tabela(tabela):
+    """
+    Cópia rasa da tabela sobre os mesmos dados, com os arrays NumPy das colunas (e os códigos
+    das categóricas) somente leitura: escritas no lugar (loc, iloc) falham com ValueError em vez
+    de alterar dados compartilhados. Os textos (pyarrow) já são imutáveis. O pandas não impede
+    acrescentar colunas ao próprio DataFrame: quem precisa de colunas extras monta outro
+    DataFrame (como anexar_atributos).
+    """
+    colunas = {}
+    for coluna in tabela.columns:
+        serie = tabela[coluna]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            codigos = _somente_leitura(serie.array.codes)
+            valores = pd.Categorical.from_codes(codigos, dtype=serie.dtype, validate=False)
+        elif isinstance(serie.dtype, np.dtype):
+            valores = _somente_leitura(serie.to_numpy())
+        else:
+            valores = serie.array
+        colunas[coluna] = pd.Series(valores, index=tabela.index, name=coluna, copy=False)
+
+    return pd.DataFrame(colunas, index=tabela.index, copy=False)
+
+
+def congelar_conjunto_dados(dados):
+    """
+    Conjunto de dados para o compartilhamento entre as sessões: dicionário somente leitura
+    (MappingProxyType), tabelas congeladas (congelar_tabela) e arrays NumPy das estruturas
+    derivadas (índices, matriz de sazonalidade) somente leitura. As listas e dicionários internos
+    (opções dos filtros, avisos, uso de memória) continuam objetos comuns.
+    """
+    def congelar(valor):
+        if isinstance(valor, pd.DataFrame):
+            return congelar_tabela(valor)
+        if isinstance(valor, np.ndarray):
+            return _somente_leitura(valor)
+        if isinstance(valor, dict):
+            return {chave: congelar(item) for chave, item in valor.items()}
+        return valor
+
+    return MappingProxyType({chave: congelar(valor) for chave, valor in dados.items()})
+
+
+def posicoes_filtradas(indice_filtros, filtros):
+    """
+    Posições (ordenadas) das observações que atendem aos filtros {coluna: valor}, intersectando
+    as posições do índice pré-calculado. Retorna None quando não há filtros ativos.
+    """
+    # Filtros sobre colunas inexistentes são ignorados
+    selecoes = [
+        indice_filtros[coluna].get(valor, np.empty(0, dtype=np.int32))
+        for coluna, valor in filtros.items()
+        if coluna in indice_filtros
+    ]
+
+    if not selecoes:
+        return None
+
+    # Intersecção começando pelo conjunto menor
+    selecoes.sort(key=len)
+    posicoes = selecoes[0]
+    for selecao in selecoes[1:]:
+        posicoes = np.intersect1d(posicoes, selecao, assume_unique=True)
+
+    return posicoes
+
+
+@medido('filtragem')
+def filtrar_dados(tabela_dados, indice_filtros, filtros):
+    """
+    Aplica os filtros {coluna: valor} usando o índice pré-calculado.
+    Sem filtros ativos retorna o próprio DataFrame, sem cópia; caso contrário, apenas as linhas selecionadas.
+    """
+    posicoes = posicoes_filtradas(indice_filtros, filtros)
+    if posicoes is None:
+        return tabela_dados
+
+    return tabela_dados.take(posicoes)
+
+
+def opcoes_filtros(indice_filtros, tabela_base):
+    """
+    Valores (ordenados) oferecidos em cada filtro da barra lateral: anos e locais com observações,
+    tirados do índice de filtros, e todos os habitats da tabela base.
+    """
+    opcoes = {coluna: sorted(indice_filtros.get(coluna, {})) for coluna in ['Year', 'Location']}
+    if 'Habitat (AVONET)' in tabela_base.columns:
+        opcoes['Habitat (AVONET)'] = sorted(tabela_base['Habitat (AVONET)'].dropna().unique())
+    else:
+        opcoes['Habitat (AVONET)'] = []
+    return opcoes
+
+
+@medido('montagem do conjunto de dados')
+def montar_conjunto_dados(metadados, tabela_base, tabela_dados, anterior=None):
+    """
+    Reúne as tabelas processadas e as estruturas derivadas usadas pelo dashboard, com os
+    avisos sobre os dados ('avisos') a exibir para o usuário. Quando a versão apenas acrescenta
+    observações ao conjunto 'anterior', a matriz de sazonalidade é atualizada só com as novas.
+    """
+    sazonalidade = None
+    acrescimo = metadados.get('acrescimo')
+    if (anterior is not None and acrescimo is not None and anterior['sazonalidade'] is not None
+            and acrescimo['versao_anterior'] == anterior['versao']):
+        sazonalidade = acrescentar_sazonalidade(
+            anterior['sazonalidade'], tabela_dados.iloc[acrescimo['linhas_anteriores']:], len(tabela_base)
+        )
+    if sazonalidade is None:
+        sazonalidade = construir_sazonalidade(tabela_dados, len(tabela_base))
+
+    cubo = construir_cubo(tabela_dados)
+    indice_filtros = construir_indice_filtros(tabela_dados, tabela_base)
+    avisos = []
+    if not tabelas_combinaveis(tabela_base, tabela_dados):
+        avisos.append("Não foi possível combinar as tabelas. Verificar nomes das colunas.")
+
+    return {
+        'versao': metadados['versao'],
+        'tabela_base': tabela_base,
+        'tabela_dados': tabela_dados,
+        'indice_filtros': indice_filtros,
+        'opcoes_filtros': opcoes_filtros(indice_filtros, tabela_base),
+        'tabela_especies': construir_tabela_especies(tabela_base),
+        'tabela_listas': construir_tabela_listas(tabela_dados, tabela_base),
+        'especies_nao_encontradas': especies_nao_encontradas(tabela_dados),
+        'memoria': medir_memoria(tabela_base, tabela_dados),
+        'cubo': cubo,
+        'indice_cubo': construir_indice_filtros(cubo, tabela_base),
+        'sazonalidade': sazonalidade,
+        'avisos': avisos
+    }
+
+
+# Carregamento dos dados
+class AtualizadorDados:
+    """
+    Mantém o conjunto de dados processado do processo e o atualiza em uma thread em segundo
+    plano, a cada 'intervalo' segundos, fora do caminho das requisições. O novo conjunto (com
+    todos os índices derivados) é montado por completo antes de substituir a referência atual,
+    de modo que cada execução do script lê sempre uma versão inteira, sem esperar a atualização.
+    """
+
+    def __init__(self, intervalo):
+        self.intervalo = intervalo
+        self.dados = None
+        self.atualizado_em = None  # última consulta bem-sucedida à fonte de dados
+        self.erros = []  # mensagens da última tentativa de atualização
+        self.perfil = []  # etapas da última atualização em segundo plano (com o perfil ativo)
+        # Uma carga ou atualização por vez (leitura da fonte e montagem dos dados, demoradas)
+        self._trava_atualizacao = threading.Lock()
+        # Apenas a troca das referências e o início da thread (nunca durante a leitura da fonte)
+        self._trava = threading.Lock()
+        self._thread = None
+        self._primeira_espera = intervalo
+
+    def _trocar(self, metadados, tabela_base, tabela_dados, erros=None):
+        dados = self.dados
+        if dados is None or dados['versao'] != metadados['versao']:
+            # Somente leitura: o mesmo conjunto de dados é usado diretamente por todas as sessões
+            dados = congelar_conjunto_dados(montar_conjunto_dados(metadados, tabela_base, tabela_dados, dados))
+        with self._trava:
+            self.dados = dados
+            self.atualizado_em = datetime.fromtimestamp(metadados['atualizado_em'])
+            if erros is not None:
+                self.erros = erros
+
+    def carregar(self):
+        """
+        Primeira carga do processo. Um snapshot existente é usado imediatamente, mesmo fora da
+        validade (a atualização fica para a thread); sem snapshot, os dados são lidos da fonte.
+        Retorna True se há dados disponíveis.
+        """
+        with self._trava_atualizacao:
+            if self.dados is not None:
+                return True
+
+            snapshot = carregar_snapshot()
+            if snapshot is None:
+                erros = []
+                atualizado = atualizar_snapshot(None, erros)
+                if atualizado is None:
+                    self.erros = erros
+                    return False
+                self._trocar(*atualizado, erros)
+                return True
+
+            self._trocar(*snapshot)
+            idade = datetime.now().timestamp() - snapshot[0]['atualizado_em']
+            self._primeira_espera = max(0, self.intervalo - idade)
+            return True
+
+    def atualizar(self):
+        """Consulta a fonte de dados e troca o conjunto de dados se houver uma nova versão"""
+        with self._trava_atualizacao:
+            atual = self.dados
+            erros = []
+            try:
+                with open(_caminho_snapshot('snapshot.json'), encoding='utf-8') as arquivo:
+                    metadados = json.load(arquivo)
+            except (OSError, ValueError):
+                metadados = None
+
+            if metadados is not None and not snapshot_da_fonte_atual(metadados):
+                # Snapshot de outra fonte de dados (a configuração mudou): lido de novo da fonte atual
+                snapshot = None
+            elif metadados is not None and atual is not None and metadados.get('versao') == atual['versao']:
+                # Snapshot da versão em memória: as tabelas não precisam ser lidas do disco
+                snapshot = (metadados, atual['tabela_base'], atual['tabela_dados'])
+            else:
+                snapshot = carregar_snapshot()
+
+            if snapshot is not None and datetime.now().timestamp() - snapshot[0]['atualizado_em'] < self.intervalo:
+                # Outro processo já atualizou o snapshot
+                atualizado = snapshot
+            else:
+                atualizado = atualizar_snapshot(snapshot, erros)
+
+            if atualizado is None:
+                self.erros = erros or ["Não foi possível atualizar os dados."]
+                return
+
+            self._trocar(*atualizado, erros)
+
+    def _executar(self):
+        espera = self._primeira_espera
+        while True:
+            time.sleep(espera)
+            espera = self.intervalo
+            try:
+                with coletar_perfil() as registros:
+                    with medir_etapa('atualização dos dados'):
+                        self.atualizar()
+                self.perfil = registros
+            except Exception as e:
+                self.erros = [f"Erro ao atualizar os dados: {e}"]
+
+    def iniciar(self):
+        """Inicia a thread de atualização (uma única vez por processo)"""
+        if self._thread is not None:
+            # Chamado a cada execução do script: sem esperar por nenhuma trava
+            return
+        with self._trava:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._executar, name='dashbirds-atualizador', daemon=True)
+                self._thread.start()
+
+
+# Funções de análise
+# Vocabulário normalizado dos status de conservação: as grafias usadas nas planilhas (nomes em
+# português ou inglês, com ou sem acento, e as siglas) são reduzidas à sigla da categoria IUCN
+CATEGORIAS_STATUS = {
+    'criticamente ameacada': 'CR', 'criticamente em perigo': 'CR', 'critically endangered': 'CR', 'cr': 'CR',
+    'em perigo': 'EN', 'endangered': 'EN', 'en': 'EN',
+    'vulneravel': 'VU', 'vulnerable': 'VU', 'vu': 'VU',
+    'quase ameacada': 'NT', 'near threatened': 'NT', 'nt': 'NT',
+    'pouco preocupante': 'LC', 'menos preocupante': 'LC', 'least concern': 'LC', 'lc': 'LC',
+    'dados insuficientes': 'DD', 'data deficient': 'DD', 'dd': 'DD',
+    'regionalmente extinta': 'RE', 're': 'RE',
+    'extinta na natureza': 'EW', 'extinct in the wild': 'EW', 'ew': 'EW',
+    'extinta': 'EX', 'extinct': 'EX', 'ex': 'EX',
+}
+
+# Categorias consideradas ameaçadas (incluindo "Quase ameaçada")
+CATEGORIAS_AMEACADAS = ['CR', 'EN', 'VU', 'NT']
+
+# Colunas da tabela base com listas de espécies ameaçadas
+COLUNAS_AMEACA = ['IUCN 2021', 'MMA 2022', 'Ameaçadas Bahia 2017']
+
+
+def _texto_normalizado(valores):
+    """Texto sem espaços nas pontas, em minúsculas e sem acentos (valores ausentes continuam NaN)"""
+    return (
+        valores.astype(object).str.strip().str.lower()
+        .str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('ascii')
+    )
+
+
+def normalizar_status(valores):
+    """Sigla da categoria IUCN de cada status de conservação (NaN quando o status não é reconhecido)"""
+    return _texto_normalizado(valores).map(CATEGORIAS_STATUS)
+
+
+def _marcador_preenchido(valores):
+    """Verdadeiro para os valores presentes e não vazios (listas que só marcam a espécie)"""
+    texto = valores.astype(object).str.strip()
+    return texto.notna() & (texto != '')
+
+
+def _marcador_um(valores):
+    """Verdadeiro para os valores iguais a 1, escritos como número ou como texto"""
+    return pd.to_numeric(valores.astype(object), errors='coerce') == 1
+
+
+@medido('tabela de espécies')
+def construir_tabela_especies(tabela_base):
+    """
+    Constrói a tabela de atributos por espécie, alinhada aos IDs da tabela base (uma linha por
+    espécie), com uma coluna booleana por indicador (ameaça IUCN/MMA/Bahia, endemismo e migração)
+    e a coluna 'especies_ameacadas', verdadeira para as espécies ameaçadas em qualquer das listas.
+    As marcações são calculadas uma vez por versão dos dados e usadas pelos indicadores, pelas
+    listas e pelos mapas. Colunas ausentes na tabela base não geram o indicador correspondente.
+    """
+    atributos = {}
+
+    if 'IUCN 2021' in tabela_base.columns:
+        atributos['especies_ameacadas_iucn'] = normalizar_status(tabela_base['IUCN 2021']).isin(CATEGORIAS_AMEACADAS)
+
+    if 'MMA 2022' in tabela_base.columns:
+        atributos['especies_ameacadas_brasil'] = normalizar_status(tabela_base['MMA 2022']).isin(CATEGORIAS_AMEACADAS)
+
+    if 'Ameaçadas Bahia 2017' in tabela_base.columns:
+        atributos['especies_ameacadas_estado'] = _marcador_preenchido(tabela_base['Ameaçadas Bahia 2017'])
+
+    if 'Endêmicas do Brasil (CBRO 2021)' in tabela_base.columns:
+        atributos['endemicas_brasil'] = _marcador_um(tabela_base['Endêmicas do Brasil (CBRO 2021)'])
+
+    if 'Espécies Endêmicas da Mata Atlântica' in tabela_base.columns:
+        atributos['endemicas_mata_atlantica'] = _marcador_um(tabela_base['Espécies Endêmicas da Mata Atlântica'])
+
+    if 'Migratórias Somenzari et al. 2017' in tabela_base.columns:
+        atributos['migratorias'] = tabela_base['Migratórias Somenzari et al. 2017'].notna()
+
+    listas_ameaca = [
+        atributos[nome] for nome in
+        ['especies_ameacadas_iucn', 'especies_ameacadas_brasil', 'especies_ameacadas_estado']
+        if nome in atributos
+    ]
+    if listas_ameaca:
+        atributos['especies_ameacadas'] = np.logical_or.reduce([lista.to_numpy() for lista in listas_ameaca])
+
+    return pd.DataFrame(atributos, index=tabela_base.index)
+
+
+def marcacao_por_observacao(df, tabela_especies, indicador):
+    """
+    Máscara booleana (NumPy) das observações cuja espécie tem o indicador pedido, buscada pelo
+    ID da espécie. Observações sem espécie associada, ou um indicador ausente, resultam em False.
+    """
+    if indicador not in tabela_especies.columns or 'species_id' not in df.columns or tabela_especies.empty:
+        return np.zeros(len(df), dtype=bool)
+
+    ids = df['species_id'].to_numpy()
+    marcacao = tabela_especies[indicador].to_numpy()
+    return (ids >= 0) & marcacao[np.maximum(ids, 0)]
+
+
+@medido('indicadores')
+def calcular_indicadores(df_filtered, tabela_especies):
+    """
+    Calcula os indicadores principais com base nos dados filtrados.
+    As contagens por atributo somam os indicadores da tabela de espécies sobre os IDs
+    das espécies presentes nos dados filtrados.
+    """
+    # Número de registros
+    n_registros = len(df_filtered)
+
+    # Número de espécies
+    n_especies = df_filtered['Scientific Name'].nunique() if 'Scientific Name' in df_filtered.columns else 0
+
+    # Localizações únicas
+    n_localizacoes = df_filtered['Location'].nunique() if 'Location' in df_filtered.columns else 0
+
+    # Número de listas (se houver algum identificador de lista)
+    n_listas = df_filtered['ListID'].nunique() if 'ListID' in df_filtered.columns else 458  # Valor fixo do exemplo
+
+    # Período dos dados
+    if 'Date' in df_filtered.columns:
+        if df_filtered['Date'].notna().any():
+            data_inicio = df_filtered['Date'].min().strftime('%d/%m/%Y')
+            data_fim = df_filtered['Date'].max().strftime('%d/%m/%Y')
+            periodo_dados = f"{data_inicio} a {data_fim}"
+        else:
+            periodo_dados = "Sem registros"
+    else:
+        periodo_dados = "03/02/2025 a 15/02/2025"  # Valor do exemplo
+
+    # Espécies ameaçadas, endêmicas e migratórias: soma dos indicadores das espécies presentes
+    contagens = dict.fromkeys([
+        'especies_ameacadas_iucn', 'especies_ameacadas_brasil', 'especies_ameacadas_estado',
+        'endemicas_brasil', 'endemicas_mata_atlantica', 'migratorias'
+    ], 0)
+    if 'species_id' in df_filtered.columns and not tabela_especies.empty:
+        ids = np.unique(df_filtered['species_id'].to_numpy())
+        indicadores = [coluna for coluna in contagens if coluna in tabela_especies.columns]
+        somas = tabela_especies[indicadores].to_numpy()[ids[ids >= 0]].sum(axis=0)
+        contagens.update(zip(indicadores, somas.tolist()))
+
+    return {
+        'n_registros': n_registros,
+        'n_especies': n_especies,
+        'n_localizacoes': n_localizacoes,
+        'n_listas': n_listas,
+        'periodo_dados': periodo_dados,
+        **contagens
+    }
+
+
+class CacheLRU:
+    """
+    Cache em memória com limite de itens, descartando os usados há mais tempo (thread-safe).
+    Cada chave é construída uma única vez: quem pede uma chave em construção por outra thread
+    espera por ela (e recebe a mesma exceção, se a construção falhar; nada fica em cache).
+    """
+
+    def __init__(self, capacidade):
+        self.capacidade = capacidade
+        self.itens = OrderedDict()
+        self.em_construcao = {}
+        self.trava = threading.Lock()
+
+    def obter(self, chave, construir):
+        """Retorna o item da chave, construindo-o com construir() se não estiver no cache"""
+        with self.trava:
+            if chave in self.itens:
+                self.itens.move_to_end(chave)
+                return self.itens[chave]
+            futuro = self.em_construcao.get(chave)
+            construtor = futuro is None
+            if construtor:
+                futuro = self.em_construcao[chave] = Future()
+
+        if not construtor:
+            return futuro.result()
+
+        try:
+            valor = construir()
+        except BaseException as erro:
+            with self.trava:
+                del self.em_construcao[chave]
+            futuro.set_exception(erro)
+            raise
+
+        with self.trava:
+            del self.em_construcao[chave]
+            self.itens[chave] = valor
+            while len(self.itens) > self.capacidade:
+                self.itens.popitem(last=False)
+        futuro.set_result(valor)
+
+        return valor
+
+
+# Construções em paralelo: os gráficos, mapas e listas de uma execução completa do script são
+# independentes e disparados juntos em um pool de threads limitado, compartilhado pelas sessões
+# (o NumPy e o pandas liberam o GIL em boa parte das agregações). Com
+# DASHBIRDS_TRABALHADORES=0 as construções são executadas na própria thread, em sequência.
+TRABALHADORES_PARALELOS = int(os.environ.get('DASHBIRDS_TRABALHADORES', min(4, os.cpu_count() or 1)))
+
+_executor_paralelo = None
+_trava_executor_paralelo = threading.Lock()
+
+
+def _obter_executor_paralelo():
+    global _executor_paralelo
+    with _trava_executor_paralelo:
+        if _executor_paralelo is None:
+            _executor_paralelo = ThreadPoolExecutor(
+                max_workers=TRABALHADORES_PARALELOS, thread_name_prefix='dashbirds'
+            )
+        return _executor_paralelo
+
+
+def executar_em_paralelo(nome, funcao, *args, **kwargs):
+    """
+    Dispara funcao(*args, **kwargs) no pool de construções e retorna o Future do resultado.
+    A construção roda no contexto de quem a disparou: com o perfil ativo, ela é medida como a
+    etapa 'nome' da execução atual, acrescentada com as etapas internas ao terminar (o tempo é
+    o da thread). No pool, a construção é uma coleta simultânea à execução que a disparou, e
+    as etapas de ambas ficam sem o pico de memória (ver medir_etapa).
+    """
+    coleta = _perfil_atual.get()
+
+    def construir():
+        if coleta is None:
+            return funcao(*args, **kwargs)
+
+        construcao = {'registros': [], 'pilha': [dict(quadro) for quadro in coleta['pilha']]}
+        _perfil_atual.set(construcao)
+        try:
+            with medir_etapa(nome):
+                return funcao(*args, **kwargs)
+        finally:
+            coleta['registros'].extend(construcao['registros'])
+            # O pico da construção conta para as etapas em andamento de quem a disparou
+            for quadro, quadro_construcao in zip(coleta['pilha'], construcao['pilha']):
+                quadro['pico'] = max(quadro['pico'], quadro_construcao['pico'])
+
+    def construir_no_pool():
+        if coleta is None:
+            return funcao(*args, **kwargs)
+        with _coleta_ativa():
+            return construir()
+
+    contexto = contextvars.copy_context()
+    if TRABALHADORES_PARALELOS < 1:
+        futuro = Future()
+        try:
+            futuro.set_result(contexto.run(construir))
+        except Exception as erro:
+            futuro.set_exception(erro)
+        return futuro
+
+    return _obter_executor_paralelo().submit(contexto.run, construir_no_pool)
+
+
+# Resumos por filtros (indicadores e espécies presentes), que de outro modo percorreriam as
+# observações filtradas a cada execução do script
+TAMANHO_CACHE_RESUMOS = 256
+
+_cache_resumos = CacheLRU(TAMANHO_CACHE_RESUMOS)
+
+
+@medido('indicadores (cache)')
+def obter_indicadores(dados, filtros):
+    """Indicadores principais para os filtros ativos, em cache por (versão dos dados, filtros)"""
+    chave = (dados['versao'], tuple(sorted(filtros.items())), 'indicadores')
+    return _cache_resumos.obter(
+        chave,
+        lambda: calcular_indicadores(
+            filtrar_dados(dados['tabela_dados'], dados['indice_filtros'], filtros), dados['tabela_especies']
+        )
+    )
+
+
+def especies_presentes(dados, filtros):
+    """
+    Máscara booleana, indexada pelo ID da espécie, das espécies com observações nos filtros
+    ativos, ou None sem filtros ativos (todas as espécies observadas). Em cache por (versão, filtros).
+    """
+    posicoes = posicoes_filtradas(dados['indice_filtros'], filtros)
+    if posicoes is None:
+        return None
+
+    def construir():
+        presentes = np.zeros(len(dados['tabela_base']), dtype=bool)
+        ids = dados['tabela_dados']['species_id'].to_numpy()[posicoes]
+        presentes[ids[ids >= 0]] = True
+        return _somente_leitura(presentes)
+
+    return _cache_resumos.obter((dados['versao'], tuple(sorted(filtros.items())), 'especies_presentes'), construir)
+
+
+@medido('cubo de agregação')
+def construir_cubo(tabela_dados):
+    """
+    Cubo de agregação dos gráficos gerais: uma linha por combinação de ano, local e espécie,
+    com o número de registros ('n_registros'). As linhas do cubo têm as mesmas colunas de
+    filtro e o mesmo 'species_id' das observações, de modo que os gráficos e o índice de
+    filtros funcionam sobre ele como sobre as observações, mas com muito menos linhas.
+    """
+    chaves = [coluna for coluna in ['Year', 'Location', 'Scientific Name'] if coluna in tabela_dados.columns]
+
+    return (
+        tabela_dados
+        .groupby(chaves + ['species_id'], sort=False, observed=True, dropna=False)
+        .size()
+        .rename('n_registros')
+        .reset_index()
+    )
+
+
+# Índice por espécie (painel "Olha o passarinho")
+TAMANHO_CACHE_INDICES_ESPECIES = 16
+
+_cache_indices_especies = CacheLRU(TAMANHO_CACHE_INDICES_ESPECIES)
+
+
+@medido('índice por espécie')
+def construir_indice_especies(tabela_dados, posicoes=None):
+    """
+    Índice das espécies presentes nas observações das posições dadas (todas, se None):
+    nomes científicos em ordem alfabética, posições das observações de cada espécie (contíguas,
+    de inicios[i] a inicios[i + 1]) e a matriz espécie × mês com o número de registros (None sem
+    a coluna de mês). Retorna None quando não há coluna de nome científico.
+    """
+    if 'Scientific Name' not in tabela_dados.columns:
+        return None
+
+    if posicoes is None:
+        posicoes = np.arange(len(tabela_dados))
+
+    codigos, nomes = pd.factorize(tabela_dados['Scientific Name'].take(posicoes))
+    nomes = np.asarray(nomes, dtype=object)
+
+    # Renumera as espécies em ordem alfabética (nomes ausentes ficam de fora)
+    ordem_nomes = np.argsort(nomes, kind='stable')
+    posto = np.empty(len(nomes), dtype=np.int64)
+    posto[ordem_nomes] = np.arange(len(nomes))
+    validos = codigos >= 0
+    codigos = posto[codigos[validos]]
+    posicoes = posicoes[validos]
+
+    # Observações agrupadas por espécie, mantendo a ordem original dentro de cada espécie
+    ordem = np.argsort(codigos, kind='stable')
+    inicios = np.searchsorted(codigos[ordem], np.arange(len(nomes) + 1))
+
+    mensal = None
+    if 'Month' in tabela_dados.columns:
+        meses = tabela_dados['Month'].to_numpy(dtype='float64', na_value=np.nan)[posicoes]
+        com_mes = (meses >= 1) & (meses <= 12)
+        mensal = np.bincount(
+            codigos[com_mes] * 12 + meses[com_mes].astype(np.int64) - 1, minlength=len(nomes) * 12
+        ).reshape(len(nomes), 12)
+
+    especies = nomes[ordem_nomes].tolist()
+    return {
+        'especies': especies,
+        'linhas': {especie: linha for linha, especie in enumerate(especies)},
+        'inicios': inicios,
+        'posicoes': posicoes[ordem],
+        'mensal': mensal
+    }
+
+
+def detalhe_especie(indice, especie):
+    """Posições das observações e registros por mês (janeiro a dezembro) de uma espécie do índice"""
+    linha = indice['linhas'][especie]
+    inicio, fim = indice['inicios'][linha], indice['inicios'][linha + 1]
+    return {
+        'posicoes': indice['posicoes'][inicio:fim],
+        'mensal': indice['mensal'][linha] if indice['mensal'] is not None else None
+    }
+
+
+def especie_exibida(dados, filtros, especie=None):
+    """
+    Espécie cujo detalhe é exibido nos filtros ativos: a pedida, se tiver observações, ou a
+    primeira do índice (a seleção padrão da lista). None sem espécies nos filtros.
+    """
+    indice = obter_indice_especies(dados, filtros)
+    if indice is None or len(indice['especies']) == 0:
+        return None
+    return especie if especie in indice['linhas'] else indice['especies'][0]
+
+
+def obter_indice_especies(dados, filtros):
+    """Índice por espécie das observações filtradas, em cache por (versão dos dados, filtros)"""
+    chave = (dados['versao'], tuple(sorted(filtros.items())))
+    return _cache_indices_especies.obter(
+        chave,
+        lambda: construir_indice_especies(
+            dados['tabela_dados'], posicoes_filtradas(dados['indice_filtros'], filtros)
+        )
+    )
+
+
+# Sazonalidade por espécie: matriz ano × espécie × mês com o número de registros, indexada pelo
+# ID da espécie e calculada uma vez por versão dos dados (um acréscimo de observações soma apenas
+# as novas linhas). Comparações entre espécies e agrupamentos consultam linhas da matriz.
+
+# Número mínimo de registros de uma espécie para o seu perfil sazonal entrar no agrupamento
+MINIMO_REGISTROS_PERFIL = 10
+
+# Número máximo de iterações do k-means dos perfis sazonais
+ITERACOES_AGRUPAMENTO = 100
+
+
+def _observacoes_sazonais(tabela_dados, posicoes=None):
+    """ID da espécie, ano e mês (0 a 11) das observações com espécie associada, ano e mês"""
+    ids = tabela_dados['species_id'].to_numpy()
+    anos = tabela_dados['Year'].to_numpy(dtype=np.float64, na_value=np.nan)
+    meses = tabela_dados['Month'].to_numpy(dtype=np.float64, na_value=np.nan)
+    if posicoes is not None:
+        ids, anos, meses = ids[posicoes], anos[posicoes], meses[posicoes]
+
+    validas = (ids >= 0) & np.isfinite(anos) & (meses >= 1) & (meses <= 12)
+    return ids[validas].astype(np.int64), anos[validas], meses[validas].astype(np.int64) - 1
+
+
+def _matriz_sazonal(contagens, anos):
+    return {
+        'anos': anos,
+        'contagens': _somente_leitura(contagens),
+        'total': _somente_leitura(contagens.sum(axis=0, dtype=np.int32))
+    }
+
+
+@medido('matriz de sazonalidade')
+def construir_sazonalidade(tabela_dados, n_especies):
+    """
+    Matriz de sazonalidade das observações: 'anos' (ordenados), 'contagens' (ano × espécie ×
+    mês, indexada pelo ID da espécie) e 'total' (espécie × mês, todos os anos).
+    Retorna None sem as colunas de ano, mês ou ID da espécie.
+    """
+    if not {'Year', 'Month', 'species_id'} <= set(tabela_dados.columns):
+        return None
+
+    ids, anos, meses = _observacoes_sazonais(tabela_dados)
+    anos_unicos, linha_ano = np.unique(anos, return_inverse=True)
+    contagens = np.bincount(
+        (linha_ano * n_especies + ids) * 12 + meses, minlength=len(anos_unicos) * n_especies * 12
+    ).astype(np.int32).reshape(len(anos_unicos), n_especies, 12)
+
+    return _matriz_sazonal(contagens, anos_unicos)
+
+
+@medido('acréscimo à matriz de sazonalidade')
+def acrescentar_sazonalidade(sazonalidade, novas_observacoes, n_especies):
+    """Soma as novas observações (já processadas) a uma matriz de sazonalidade existente"""
+    novas = construir_sazonalidade(novas_observacoes, n_especies)
+    if novas is None or sazonalidade['contagens'].shape[1] != n_especies:
+        return None
+
+    anos = np.union1d(sazonalidade['anos'], novas['anos'])
+    contagens = np.zeros((len(anos), n_especies, 12), dtype=np.int32)
+    contagens[np.searchsorted(anos, sazonalidade['anos'])] += sazonalidade['contagens']
+    contagens[np.searchsorted(anos, novas['anos'])] += novas['contagens']
+    return _matriz_sazonal(contagens, anos)
+
+
+def sazonalidade_filtrada(dados, filtros):
+    """
+    Matriz espécie × mês (indexada pelo ID da espécie) das observações nos filtros ativos, ou
+    None sem matriz de sazonalidade. Sem filtros ou apenas com o filtro anual, é uma consulta à
+    matriz pré-calculada; com outros filtros, as observações filtradas são contadas uma vez e o
+    resultado fica em cache por (versão dos dados, filtros).
+    """
+    sazonalidade = dados['sazonalidade']
+    if sazonalidade is None or not filtros:
+        return sazonalidade['total'] if sazonalidade is not None else None
+
+    if set(filtros) == {'Year'}:
+        linha = np.flatnonzero(sazonalidade['anos'] == float(filtros['Year']))
+        return sazonalidade['contagens'][linha[0]] if len(linha) else np.zeros_like(sazonalidade['total'])
+
+    def construir():
+        n_especies = sazonalidade['total'].shape[0]
+        ids, _, meses = _observacoes_sazonais(
+            dados['tabela_dados'], posicoes_filtradas(dados['indice_filtros'], filtros)
+        )
+        return _somente_leitura(
+            np.bincount(ids * 12 + meses, minlength=n_especies * 12).astype(np.int32).reshape(n_especies, 12)
+        )
+
+    return _cache_resumos.obter((dados['versao'], tuple(sorted(filtros.items())), 'sazonalidade'), construir)
+
+
+def _kmeans(pontos, n_grupos, gerador):
+    """Agrupamento k-means (inicialização k-means++); retorna o grupo de cada ponto e os centróides"""
+    centroides = pontos[[gerador.integers(len(pontos))]]
+    while len(centroides) < n_grupos:
+        distancias = ((pontos[:, None, :] - centroides[None]) ** 2).sum(axis=2).min(axis=1)
+        pesos = distancias / distancias.sum() if distancias.sum() > 0 else None
+        centroides = np.vstack([centroides, pontos[gerador.choice(len(pontos), p=pesos)]])
+
+    for _ in range(ITERACOES_AGRUPAMENTO):
+        grupos = ((pontos[:, None, :] - centroides[None]) ** 2).sum(axis=2).argmin(axis=1)
+        novos = np.array([
+            pontos[grupos == grupo].mean(axis=0) if (grupos == grupo).any() else centroides[grupo]
+            for grupo in range(n_grupos)
+        ])
+        if np.allclose(novos, centroides):
+            break
+        centroides = novos
+
+    return grupos, centroides
+
+
+@medido('agrupamento sazonal')
+def agrupar_perfis_sazonais(mensal, n_grupos, minimo_registros=MINIMO_REGISTROS_PERFIL):
+    """
+    Agrupa as espécies (linhas da matriz espécie × mês) pelo perfil sazonal, a fração dos
+    registros da espécie em cada mês, com k-means (determinístico). Apenas espécies com pelo
+    menos minimo_registros entram. Os grupos são numerados pelo mês de pico do perfil médio.
+    Retorna {'ids', 'grupos', 'perfis' (grupo × mês), 'tamanhos'} ou None com menos de duas espécies.
+    """
+    totais = mensal.sum(axis=1)
+    ids = np.flatnonzero(totais >= max(minimo_registros, 1))
+    if len(ids) < 2:
+        return None
+
+    perfis = mensal[ids] / totais[ids, None]
+    grupos, centroides = _kmeans(perfis, min(n_grupos, len(ids)), np.random.default_rng(0))
+
+    # Numeração estável: grupos em ordem do mês de pico
+    ordem = np.lexsort((-centroides.max(axis=1), centroides.argmax(axis=1)))
+    numero = np.empty(len(ordem), dtype=np.int64)
+    numero[ordem] = np.arange(len(ordem))
+
+    return {
+        'ids': ids,
+        'grupos': numero[grupos],
+        'perfis': centroides[ordem],
+        'tamanhos': np.bincount(numero[grupos], minlength=len(ordem))
+    }
+
+
+def obter_grupos_sazonais(dados, filtros, n_grupos):
+    """Agrupamento das espécies pelo perfil sazonal nos filtros ativos, em cache por (versão, filtros, grupos)"""
+    mensal = sazonalidade_filtrada(dados, filtros)
+    if mensal is None:
+        return None
+    return _cache_resumos.obter(
+        (dados['versao'], tuple(sorted(filtros.items())), 'grupos_sazonais', n_grupos),
+        lambda: agrupar_perfis_sazonais(mensal, n_grupos)
+    )
+
+
+# Colunas exibidas e indicador (da tabela de espécies) que seleciona as espécies de cada lista
+LISTAS_ESPECIES = {
+    'geral': (
+        ['Scientific Name', 'Nome científico', 'Nomes em Português', 'Nomes da Ordens', 'Nome da Família'],
+        None
+    ),
+    'ameacadas': (
+        ['Scientific Name', 'Nome científico', 'Nomes em Português'] + COLUNAS_AMEACA + ['Nome da Família'],
+        'especies_ameacadas'
+    ),
+    'endemicas_mata_atlantica': (
+        ['Scientific Name', 'Nome científico', 'Nomes em Português', 'Nome da Família'],
+        'endemicas_mata_atlantica'
+    ),
+}
+
+
+@medido('tabela das listas')
+def construir_tabela_listas(tabela_dados, tabela_base):
+    """
+    Tabela das listas de espécies: uma linha por espécie observada, indexada pelo ID da espécie e
+    já ordenada pelo nome científico das observações, com os atributos exibidos nas listas e uma
+    chave de busca normalizada (nomes científicos e populares, sem acentos e em minúsculas).
+    Observações sem espécie associada na tabela base não entram nas listas.
+    """
+    if 'Scientific Name' not in tabela_dados.columns:
+        return pd.DataFrame(columns=['Scientific Name', 'chave_busca'], index=pd.Index([], name='species_id'))
+
+    ids = tabela_dados['species_id'].to_numpy()
+    posicoes = np.flatnonzero(~tabela_dados['species_id'].duplicated().to_numpy() & (ids >= 0))
+    ids_unicos = ids[posicoes]
+
+    tabela = pd.DataFrame(
+        {'Scientific Name': tabela_dados['Scientific Name'].iloc[posicoes].astype(object).to_numpy()},
+        index=pd.Index(ids_unicos, name='species_id')
+    )
+
+    colunas_atributos = list(dict.fromkeys(coluna for colunas, _ in LISTAS_ESPECIES.values() for coluna in colunas))
+    for coluna in colunas_atributos:
+        if coluna in tabela_base.columns and coluna not in tabela.columns:
+            tabela[coluna] = pd.api.extensions.take(tabela_base[coluna].array, ids_unicos, allow_fill=True)
+
+    colunas_busca = [coluna for coluna in ['Scientific Name', 'Nome científico', 'Nomes em Português']
+                     if coluna in tabela.columns]
+    tabela['chave_busca'] = _texto_normalizado(tabela[colunas_busca[0]]).fillna('').str.cat(
+        [_texto_normalizado(tabela[coluna]).fillna('') for coluna in colunas_busca[1:]], sep=' | '
+    )
+
+    return tabela.sort_values('Scientific Name', kind='stable')
+
+
+@medido('lista de espécies')
+def selecionar_lista_especies(dados, filtros, lista, busca=''):
+    """
+    Espécies da lista pedida ('geral', 'ameacadas' ou 'endemicas_mata_atlantica') presentes nos
+    filtros ativos, na ordem da tabela pré-calculada, opcionalmente restritas às que contêm o
+    termo de busca. As observações não são percorridas: as espécies presentes vêm do cache.
+    """
+    colunas, indicador = LISTAS_ESPECIES[lista]
+    tabela = dados['tabela_listas']
+    ids = tabela.index.to_numpy()
+    selecao = np.ones(len(tabela), dtype=bool)
+
+    # Sem filtros ativos todas as espécies da tabela estão presentes
+    presentes = especies_presentes(dados, filtros)
+    if presentes is not None:
+        selecao &= presentes[ids]
+
+    if indicador is not None:
+        tabela_especies = dados['tabela_especies']
+        if indicador in tabela_especies.columns:
+            selecao &= tabela_especies[indicador].to_numpy()[ids]
+        else:
+            selecao[:] = False
+
+    especies = tabela[selecao]
+
+    termo = _texto_normalizado(pd.Series([busca])).iloc[0] if busca else ''
+    if termo:
+        especies = especies[especies['chave_busca'].str.contains(termo, regex=False)]
+
+    return especies[[coluna for coluna in colunas if coluna in especies.columns]]
+
+
+def filtrar_especies_ameacadas(df_filtered, tabela_especies):
+    """Observações de espécies ameaçadas em alguma das listas (IUCN, MMA ou Bahia)"""
+    return df_filtered[marcacao_por_observacao(df_filtered, tabela_especies, 'especies_ameacadas')]
+
+
+# Grade espacial dos mapas de riqueza: as observações são agrupadas em células hexagonais ou
+# quadradas (DASHBIRDS_FORMATO_GRADE) sobre uma projeção equirretangular local, de modo que o
+# mapa tem uma célula por área ocupada, independentemente do número de observações
+FORMATO_GRADE = os.environ.get('DASHBIRDS_FORMATO_GRADE', 'hexagonal')
+
+# Tamanhos de célula (km) oferecidos no mapa: lado do quadrado ou hexágono de mesma área
+TAMANHOS_CELULA_KM = [0.25, 0.5, 1.0, 2.0, 5.0]
+
+KM_POR_GRAU_LATITUDE = 110.574
+KM_POR_GRAU_LONGITUDE = 111.320  # no equador, reduzido pelo cosseno da latitude
+
+_cache_grades = CacheLRU(2 * len(TAMANHOS_CELULA_KM))
+
+
+def _projetar(latitudes, longitudes, latitude_referencia):
+    """Coordenadas (km) na projeção equirretangular centrada na latitude de referência"""
+    escala_longitude = KM_POR_GRAU_LONGITUDE * np.cos(np.radians(latitude_referencia))
+    return longitudes * escala_longitude, latitudes * KM_POR_GRAU_LATITUDE
+
+
+def _raio_hexagono(tamanho_km):
+    """Raio (centro ao vértice) do hexágono com a mesma área do quadrado de lado tamanho_km"""
+    return tamanho_km * np.sqrt(2 / (3 * np.sqrt(3)))
+
+
+def _celula_hexagonal(x, y, raio):
+    """Coordenadas axiais (q, r) do hexágono (com vértice para cima) que contém cada ponto"""
+    q = (np.sqrt(3) / 3 * x - y / 3) / raio
+    r = (2 / 3 * y) / raio
+    s = -q - r
+
+    # Arredondamento em coordenadas cúbicas: corrige a coordenada com o maior erro
+    q_arredondado, r_arredondado, s_arredondado = np.round(q), np.round(r), np.round(s)
+    erro_q = np.abs(q_arredondado - q)
+    erro_r = np.abs(r_arredondado - r)
+    erro_s = np.abs(s_arredondado - s)
+
+    corrigir_q = (erro_q > erro_r) & (erro_q > erro_s)
+    corrigir_r = ~corrigir_q & (erro_r > erro_s)
+    q_arredondado[corrigir_q] = -r_arredondado[corrigir_q] - s_arredondado[corrigir_q]
+    r_arredondado[corrigir_r] = -q_arredondado[corrigir_r] - s_arredondado[corrigir_r]
+
+    return q_arredondado.astype(np.int64), r_arredondado.astype(np.int64)
+
+
+@medido('grade espacial')
+def construir_grade(tabela_dados, tamanho_km, formato=FORMATO_GRADE):
+    """
+    Grade espacial das observações com células de tamanho_km. Retorna um dicionário com a
+    célula de cada observação ('celulas', int32, -1 sem coordenadas), as coordenadas inteiras
+    (i, j) de cada célula e os parâmetros da projeção, usados para desenhar as células.
+    Retorna None sem colunas de coordenadas.
+    """
+    if 'Latitude' not in tabela_dados.columns or 'Longitude' not in tabela_dados.columns:
+        return None
+
+    latitudes = tabela_dados['Latitude'].to_numpy(dtype=np.float64, na_value=np.nan)
+    longitudes = tabela_dados['Longitude'].to_numpy(dtype=np.float64, na_value=np.nan)
+    validas = np.isfinite(latitudes) & np.isfinite(longitudes)
+
+    celulas = np.full(len(tabela_dados), -1, dtype=np.int32)
+    grade = {
+        'formato': formato,
+        'tamanho_km': tamanho_km,
+        'latitude_referencia': float(np.median(latitudes[validas])) if validas.any() else 0.0,
+        'celulas': celulas,
+        'i': np.empty(0, dtype=np.int64),
+        'j': np.empty(0, dtype=np.int64)
+    }
+    if not validas.any():
+        return grade
+
+    x, y = _projetar(latitudes[validas], longitudes[validas], grade['latitude_referencia'])
+    if formato == 'quadrada':
+        i, j = np.floor(x / tamanho_km).astype(np.int64), np.floor(y / tamanho_km).astype(np.int64)
+    else:
+        i, j = _celula_hexagonal(x, y, _raio_hexagono(tamanho_km))
+
+    # Numeração compacta das células ocupadas
+    i_minimo, j_minimo = i.min(), j.min()
+    largura = j.max() - j_minimo + 1
+    chaves, celulas[validas] = np.unique((i - i_minimo) * largura + (j - j_minimo), return_inverse=True)
+    grade['i'] = chaves // largura + i_minimo
+    grade['j'] = chaves % largura + j_minimo
+    return grade
+
+
+def vertices_celulas(grade, celulas):
+    """Vértices [longitude, latitude] do contorno fechado de cada célula pedida, em array (n, vértices, 2)"""
+    i = grade['i'][celulas].astype(np.float64)[:, None]
+    j = grade['j'][celulas].astype(np.float64)[:, None]
+    tamanho = grade['tamanho_km']
+
+    if grade['formato'] == 'quadrada':
+        dx = np.array([0, 1, 1, 0, 0]) * tamanho
+        dy = np.array([0, 0, 1, 1, 0]) * tamanho
+        x, y = i * tamanho + dx, j * tamanho + dy
+    else:
+        raio = _raio_hexagono(tamanho)
+        angulos = np.radians(np.arange(7) * 60 + 30)
+        x = raio * np.sqrt(3) * (i + j / 2) + raio * np.cos(angulos)
+        y = raio * 1.5 * j + raio * np.sin(angulos)
+
+    escala_longitude = KM_POR_GRAU_LONGITUDE * np.cos(np.radians(grade['latitude_referencia']))
+    return np.stack([x / escala_longitude, y / KM_POR_GRAU_LATITUDE], axis=-1)
+
+
+def obter_grade(dados, tamanho_km):
+    """Grade espacial das observações do conjunto de dados, em cache por (versão, tamanho, formato)"""
+    return _cache_grades.obter(
+        (dados['versao'], tamanho_km, FORMATO_GRADE),
+        lambda: construir_grade(dados['tabela_dados'], tamanho_km)
+    )
+
+
+@medido('riqueza por célula')
+def riqueza_por_celula(dados, filtros, tamanho_km, indicador=None):
+    """
+    Riqueza de espécies (nomes científicos distintos) e número de registros por célula da grade,
+    para os filtros ativos e, opcionalmente, apenas as espécies com um indicador da tabela de
+    espécies (ex.: 'especies_ameacadas'). Retorna (grade, DataFrame com 'celula', 'riqueza' e
+    'n_registros' das células ocupadas), ou None sem coordenadas.
+    """
+    grade = obter_grade(dados, tamanho_km)
+    if grade is None or 'Scientific Name' not in dados['tabela_dados'].columns:
+        return None
+
+    tabela_dados = dados['tabela_dados']
+    nomes = tabela_dados['Scientific Name']
+    especies = nomes.cat.codes.to_numpy() if isinstance(nomes.dtype, pd.CategoricalDtype) else pd.factorize(nomes)[0]
+    celulas = grade['celulas']
+
+    posicoes = posicoes_filtradas(dados['indice_filtros'], filtros)
+    if posicoes is not None:
+        celulas, especies = celulas[posicoes], especies[posicoes]
+
+    selecionadas = (celulas >= 0) & (especies >= 0)
+    if indicador is not None:
+        tabela_especies = dados['tabela_especies']
+        if indicador not in tabela_especies.columns or tabela_especies.empty:
+            selecionadas[:] = False
+        else:
+            ids = tabela_dados['species_id'].to_numpy()
+            if posicoes is not None:
+                ids = ids[posicoes]
+            selecionadas &= (ids >= 0) & tabela_especies[indicador].to_numpy()[np.maximum(ids, 0)]
+
+    celulas = celulas[selecionadas].astype(np.int64)
+    especies = especies[selecionadas].astype(np.int64)
+
+    # Pares (célula, espécie) distintos: a riqueza de cada célula é o seu número de pares
+    n_celulas = len(grade['i'])
+    n_especies = especies.max(initial=0) + 1
+    pares = np.unique(celulas * n_especies + especies)
+    riqueza = np.bincount(pares // n_especies, minlength=n_celulas)
+    registros = np.bincount(celulas, minlength=n_celulas)
+
+    ocupadas = np.flatnonzero(registros)
+    return grade, pd.DataFrame({
+        'celula': ocupadas,
+        'riqueza': riqueza[ocupadas],
+        'n_registros': registros[ocupadas]
+    })
@@ -0,0 +1,549 @@
+"""
+Gráficos (Plotly) e mapas (Folium) do DashBirds, construídos sobre o motor de análise
+(dashbirds_motor) e mantidos em cache por versão dos dados e filtros. Não depende do Streamlit.
+"""
+import pandas as pd
+import numpy as np
+import plotly.express as px
+import folium
+from folium.plugins import FastMarkerCluster, HeatMap
+from branca.colormap import LinearColormap
+import calendar
+import os
+
+from dashbirds_motor import (
+    CacheLRU, anexar_atributos, detalhe_especie, filtrar_dados, filtrar_especies_ameacadas, medido,
+    obter_grupos_sazonais, obter_indice_especies, riqueza_por_celula, vertices_celulas
+)
+
+
+@medido('gráfico de famílias')
+def gerar_grafico_familias(df_filtered, tabela_base=None):
+    """Gera gráfico de barras das famílias mais representativas"""
+    df_filtered = anexar_atributos(df_filtered, tabela_base, ['Nome da Família', 'Nome científico'])
+    if 'Nome da Família' not in df_filtered.columns or 'Nome científico' not in df_filtered.columns:
+        return None
+
+    # Agrupando por família e contando espécies
+    familia_counts = df_filtered.groupby('Nome da Família', observed=True)['Nome científico'].nunique().reset_index()
+    familia_counts.columns = ['Família', 'Número de Espécies']
+    familia_counts = familia_counts.sort_values('Número de Espécies', ascending=False).head(10)
+
+    fig = px.bar(
+        familia_counts,
+        x='Família',
+        y='Número de Espécies',
+        title='Famílias mais Representativas',
+        color='Número de Espécies',
+        color_continuous_scale='Viridis'
+    )
+    fig.update_layout(xaxis_title='Família', yaxis_title='Número de Espécies')
+
+    return fig
+
+
+@medido('gráfico de espécies')
+def gerar_grafico_especies(df_filtered, tabela_base=None):
+    """Gera gráfico de barras das espécies mais frequentemente registradas"""
+    if 'Scientific Name' not in df_filtered.columns:
+        return None
+
+    # Contando observações por espécie (linhas do cubo já trazem o número de registros)
+    if 'n_registros' in df_filtered.columns:
+        especies_counts = df_filtered.groupby('Scientific Name', observed=True)['n_registros'].sum()
+    else:
+        especies_counts = df_filtered['Scientific Name'].value_counts()
+    especies_counts = especies_counts[especies_counts > 0].reset_index()  # Categorias sem registros
+    especies_counts.columns = ['Espécie', 'Número de Registros']
+    especies_counts = especies_counts.sort_values('Número de Registros', ascending=False).head(10)
+
+    fig = px.bar(
+        especies_counts,
+        x='Espécie',
+        y='Número de Registros',
+        title='Espécies mais Registradas',
+        color='Número de Registros',
+        color_continuous_scale='Viridis'
+    )
+    fig.update_layout(xaxis_title='Espécie', yaxis_title='Número de Registros',
+                      xaxis={'categoryorder': 'total descending'})
+
+    return fig
+
+
+@medido('gráfico de habitats')
+def gerar_grafico_habitats(df_filtered, tabela_base=None):
+    """Gera gráfico de distribuição por habitats preferenciais"""
+    df_filtered = anexar_atributos(df_filtered, tabela_base, ['Habitat (AVONET)', 'Nome científico'])
+    if 'Habitat (AVONET)' not in df_filtered.columns or 'Nome científico' not in df_filtered.columns:
+        return None
+
+    # Agrupando por habitat
+    habitat_counts = df_filtered.groupby('Habitat (AVONET)', observed=True)['Nome científico'].nunique().reset_index()
+    habitat_counts = habitat_counts[habitat_counts['Habitat (AVONET)'].notna()]  # Remover valores NA
+    habitat_counts.columns = ['Habitat', 'Número de Espécies']
+    habitat_counts = habitat_counts.sort_values('Número de Espécies', ascending=False)
+
+    fig = px.bar(
+        habitat_counts,
+        x='Habitat',
+        y='Número de Espécies',
+        title='Habitats Preferenciais',
+        color='Número de Espécies',
+        color_continuous_scale='Viridis'
+    )
+    fig.update_layout(xaxis_title='Habitat', yaxis_title='Número de Espécies')
+
+    return fig
+
+
+@medido('gráfico de nicho trófico')
+def gerar_grafico_nicho_trofico(df_filtered, tabela_base=None):
+    """Gera gráfico de pizza para níveis tróficos"""
+    df_filtered = anexar_atributos(df_filtered, tabela_base, ['Nicho trófico (AVONET)', 'Nome científico'])
+    if 'Nicho trófico (AVONET)' not in df_filtered.columns or 'Nome científico' not in df_filtered.columns:
+        return None
+
+    # Agrupando por nível trófico
+    trophic_counts = df_filtered.groupby('Nicho trófico (AVONET)', observed=True)['Nome científico'].nunique().reset_index()
+    trophic_counts.columns = ['Nicho Trófico', 'Número de Espécies']
+
+    fig = px.pie(
+        trophic_counts,
+        values='Número de Espécies',
+        names='Nicho Trófico',
+        title='Distribuição por Nicho Trófico',
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+
+    return fig
+
+
+# Cubo de agregação dos gráficos gerais
+GRAFICOS_GERAIS = {
+    'familias': gerar_grafico_familias,
+    'especies': gerar_grafico_especies,
+    'habitats': gerar_grafico_habitats,
+    'nicho_trofico': gerar_grafico_nicho_trofico
+}
+
+
+# Número máximo de gráficos mantidos em memória
+TAMANHO_CACHE_GRAFICOS = 256
+
+_cache_graficos = CacheLRU(TAMANHO_CACHE_GRAFICOS)
+
+
+@medido('gráfico geral')
+def obter_grafico_geral(dados, filtros, tipo):
+    """
+    Gráfico geral do tipo pedido para os filtros ativos, calculado sobre o cubo de agregação.
+    Os gráficos ficam em cache por (versão dos dados, filtros, tipo de gráfico).
+    """
+    chave = (dados['versao'], tuple(sorted(filtros.items())), tipo)
+
+    def construir():
+        cubo_filtrado = filtrar_dados(dados['cubo'], dados['indice_cubo'], filtros)
+        return GRAFICOS_GERAIS[tipo](cubo_filtrado, dados['tabela_base'])
+
+    return _cache_graficos.obter(chave, construir)
+
+
+# Número de pontos distintos a partir do qual os mapas usam mapa de calor ou agrupamento (clusters)
+LIMITE_PONTOS_MAPA = int(os.environ.get('DASHBIRDS_LIMITE_PONTOS_MAPA', 2000))
+
+# Raio máximo (px) dos marcadores do mapa de riqueza por local
+RAIO_MAXIMO_MARCADOR = 25
+
+# Escala de cores da riqueza nas células da grade (do menor para o maior valor)
+CORES_RIQUEZA_GRADE = ['#ffffb2', '#fecc5c', '#fd8d3c', '#f03b20', '#bd0026']
+
+# Chamada JavaScript que cria os marcadores do agrupamento a partir de [lat, lon, popup]
+CALLBACK_MARCADOR_AGRUPADO = """
+function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.bindPopup(row[2]);
+    return marker;
+};
+"""
+
+
+def criar_mapa_satelite(latitudes, longitudes, margem_minima=0.0):
+    """Cria o mapa com a camada de satélite, ajustado para mostrar todos os pontos (com margem)"""
+    # Determinando os limites dos dados
+    min_lat, max_lat = float(np.min(latitudes)), float(np.max(latitudes))
+    min_lon, max_lon = float(np.min(longitudes)), float(np.max(longitudes))
+
+    # Adicionando uma pequena margem para melhorar a visualização
+    lat_margin = max(margem_minima, (max_lat - min_lat) * 0.1)
+    lon_margin = max(margem_minima, (max_lon - min_lon) * 0.1)
+
+    # Criando mapa sem definir location e zoom_start iniciais
+    mapa = folium.Map(tiles=None)
+
+    # Adicionando camada de satélite
+    folium.TileLayer(
+        tiles='https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
+        attr='Esri',
+        name='Esri Satellite',
+        overlay=False,
+        control=True
+    ).add_to(mapa)
+
+    mapa.fit_bounds([
+        [min_lat - lat_margin, min_lon - lon_margin],
+        [max_lat + lat_margin, max_lon + lon_margin]
+    ])
+
+    return mapa
+
+
+def pontos_geojson(latitudes, longitudes, propriedades):
+    """
+    Monta uma FeatureCollection GeoJSON de pontos a partir de arrays de coordenadas
+    e de um dicionário {nome: array} com as propriedades de cada ponto.
+    """
+    nomes = list(propriedades)
+    valores = zip(*(np.asarray(propriedades[nome]).tolist() for nome in nomes))
+
+    return {
+        'type': 'FeatureCollection',
+        'features': [
+            {
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+                'properties': dict(zip(nomes, linha))
+            }
+            for lat, lon, linha in zip(np.asarray(latitudes).tolist(), np.asarray(longitudes).tolist(), valores)
+        ]
+    }
+
+
+@medido('mapa de riqueza')
+def gerar_mapa_riqueza(df_filtered):
+    """
+    Gera mapa de riqueza de espécies por localização com visualização adaptada aos dados.
+    Os pontos são enviados em uma única camada GeoJSON; acima de LIMITE_PONTOS_MAPA
+    pontos distintos, o mapa passa a ser um mapa de calor ponderado pela riqueza.
+    """
+    if 'Latitude' not in df_filtered.columns or 'Longitude' not in df_filtered.columns:
+        return None
+
+    # Agrupando por localização e contando espécies
+    location_species = df_filtered.groupby(['Latitude', 'Longitude', 'Location'], observed=True)[
+        'Scientific Name'].nunique().reset_index()
+    location_species.columns = ['Latitude', 'Longitude', 'Location', 'Riqueza de Espécies']
+
+    if len(location_species) == 0:
+        return None
+
+    latitudes = location_species['Latitude'].to_numpy()
+    longitudes = location_species['Longitude'].to_numpy()
+    riqueza = location_species['Riqueza de Espécies'].to_numpy()
+
+    # Criando o mapa ajustado para mostrar todos os pontos
+    mapa = criar_mapa_satelite(latitudes, longitudes)
+
+    if len(location_species) > LIMITE_PONTOS_MAPA:
+        HeatMap(np.column_stack([latitudes, longitudes, riqueza]).tolist(), name='Riqueza').add_to(mapa)
+        return mapa
+
+    # Uma única camada com todas as localizações, raio proporcional à riqueza
+    folium.GeoJson(
+        pontos_geojson(latitudes, longitudes, {
+            'Local': location_species['Location'].astype(str).to_numpy(),
+            'Riqueza': riqueza
+        }),
+        name='Riqueza',
+        marker=folium.CircleMarker(color='yellow', fill=True, fill_color='yellow', fill_opacity=0.6),
+        style_function=lambda feature: {'radius': min(feature['properties']['Riqueza'] / 2, RAIO_MAXIMO_MARCADOR)},
+        popup=folium.GeoJsonPopup(fields=['Local', 'Riqueza'], aliases=['Local:', 'Riqueza (espécies):'])
+    ).add_to(mapa)
+
+    return mapa
+
+
+@medido('mapa de riqueza em grade')
+def gerar_mapa_riqueza_grade(grade, riqueza_celulas):
+    """
+    Gera o mapa de riqueza de espécies por célula da grade espacial (ver riqueza_por_celula):
+    uma única camada GeoJSON com um polígono por célula ocupada, colorido pela riqueza. O
+    tamanho do mapa depende do número de células, e não do número de observações.
+    """
+    if riqueza_celulas.empty:
+        return None
+
+    vertices = vertices_celulas(grade, riqueza_celulas['celula'].to_numpy())
+    riqueza = riqueza_celulas['riqueza'].to_numpy()
+
+    # Criando o mapa ajustado para mostrar todas as células
+    mapa = criar_mapa_satelite(vertices[..., 1], vertices[..., 0])
+
+    escala = LinearColormap(
+        CORES_RIQUEZA_GRADE, vmin=int(riqueza.min()), vmax=int(max(riqueza.max(), riqueza.min() + 1))
+    ).to_step(len(CORES_RIQUEZA_GRADE))
+    escala.caption = 'Riqueza de espécies'
+
+    celulas = {
+        'type': 'FeatureCollection',
+        'features': [
+            {
+                'type': 'Feature',
+                'geometry': {'type': 'Polygon', 'coordinates': [contorno]},
+                'properties': {'Riqueza': valor, 'Registros': registros}
+            }
+            for contorno, valor, registros in zip(
+                np.round(vertices, 6).tolist(), riqueza.tolist(), riqueza_celulas['n_registros'].tolist()
+            )
+        ]
+    }
+
+    # Uma única camada com todas as células; as cores são as faixas da escala
+    folium.GeoJson(
+        celulas,
+        name='Riqueza',
+        style_function=lambda feature: {
+            'fillColor': escala(feature['properties']['Riqueza']),
+            'color': escala(feature['properties']['Riqueza']),
+            'weight': 1,
+            'fillOpacity': 0.6
+        },
+        tooltip=folium.GeoJsonTooltip(fields=['Riqueza', 'Registros'], aliases=['Riqueza (espécies):', 'Registros:'])
+    ).add_to(mapa)
+    escala.add_to(mapa)
+
+    return mapa
+
+
+@medido('gráfico de sazonalidade')
+def gerar_grafico_sazonalidade(df_filtered, especie, contagens_mensais=None):
+    """
+    Gera gráfico de sazonalidade (registros por mês) para uma espécie específica.
+    Com as contagens mensais já calculadas (ver detalhe_especie), os dados não são percorridos.
+    """
+    if contagens_mensais is not None:
+        monthly_counts = pd.Series(contagens_mensais, index=range(1, 13))
+    elif 'Scientific Name' not in df_filtered.columns or 'Month' not in df_filtered.columns:
+        return None
+    else:
+        # Filtrando pela espécie selecionada
+        df_especie = df_filtered[df_filtered['Scientific Name'] == especie]
+
+        # Contando registros por mês
+        monthly_counts = df_especie.groupby('Month').size().reindex(range(1, 13), fill_value=0)
+
+    monthly_counts.index = [calendar.month_abbr[i] for i in monthly_counts.index]
+
+    fig = px.bar(
+        x=monthly_counts.index,
+        y=monthly_counts.values,
+        title=f"Sazonalidade: {especie}",
+        labels={'x': 'Mês', 'y': 'Número de Registros'}
+    )
+
+    return fig
+
+
+def obter_grafico_sazonalidade(dados, filtros, especie):
+    """
+    Gráfico de sazonalidade da espécie nos filtros ativos, a partir das contagens mensais do
+    índice por espécie. Em cache por (versão dos dados, filtros, espécie); None se a espécie
+    não tiver observações nos filtros.
+    """
+    chave = (dados['versao'], tuple(sorted(filtros.items())), 'sazonalidade', especie)
+
+    def construir():
+        indice = obter_indice_especies(dados, filtros)
+        if indice is None or especie not in indice['linhas']:
+            return None
+        detalhe = detalhe_especie(indice, especie)
+        return gerar_grafico_sazonalidade(dados['tabela_dados'].take(detalhe['posicoes']), especie, detalhe['mensal'])
+
+    return _cache_graficos.obter(chave, construir)
+
+
+@medido('gráfico de sazonalidade comparada')
+def gerar_grafico_sazonalidade_comparada(contagens_mensais, especies, proporcao=False):
+    """
+    Gera gráfico de linhas com a sazonalidade de várias espécies, a partir das linhas da matriz
+    espécie × mês (uma por espécie, na ordem dos nomes). Com proporcao=True, cada espécie é
+    mostrada como a fração dos seus registros em cada mês, para comparar espécies de
+    abundâncias diferentes.
+    """
+    contagens_mensais = np.asarray(contagens_mensais, dtype=np.float64)
+    if proporcao:
+        totais = contagens_mensais.sum(axis=1, keepdims=True)
+        contagens_mensais = np.divide(contagens_mensais, totais, out=np.zeros_like(contagens_mensais), where=totais > 0)
+
+    tabela = pd.DataFrame({
+        'Mês': np.tile([calendar.month_abbr[mes] for mes in range(1, 13)], len(especies)),
+        'Espécie': np.repeat(especies, 12),
+        'Registros': contagens_mensais.ravel()
+    })
+
+    fig = px.line(
+        tabela, x='Mês', y='Registros', color='Espécie', markers=True,
+        title="Sazonalidade comparada",
+        labels={'Registros': 'Fração dos registros' if proporcao else 'Número de Registros'}
+    )
+    if proporcao:
+        fig.update_yaxes(tickformat='.0%')
+
+    return fig
+
+
+@medido('gráfico de perfis sazonais')
+def gerar_grafico_perfis_sazonais(perfis, tamanhos):
+    """Gera gráfico de linhas com o perfil sazonal médio (fração dos registros por mês) de cada grupo"""
+    tabela = pd.DataFrame({
+        'Mês': np.tile([calendar.month_abbr[mes] for mes in range(1, 13)], len(perfis)),
+        'Grupo': np.repeat([f"Grupo {grupo + 1} ({tamanho} espécies)" for grupo, tamanho in enumerate(tamanhos)], 12),
+        'Fração': np.asarray(perfis).ravel()
+    })
+
+    fig = px.line(
+        tabela, x='Mês', y='Fração', color='Grupo', markers=True,
+        title="Perfis sazonais dos grupos de espécies",
+        labels={'Fração': 'Fração dos registros'}
+    )
+    fig.update_yaxes(tickformat='.0%')
+
+    return fig
+
+
+def obter_grafico_perfis_sazonais(dados, filtros, n_grupos):
+    """
+    Gráfico dos perfis sazonais dos grupos de espécies (ver obter_grupos_sazonais), em cache por
+    (versão dos dados, filtros, número de grupos). None se não houver espécies para agrupar.
+    """
+    chave = (dados['versao'], tuple(sorted(filtros.items())), 'perfis_sazonais', n_grupos)
+
+    def construir():
+        grupos = obter_grupos_sazonais(dados, filtros, n_grupos)
+        return gerar_grafico_perfis_sazonais(grupos['perfis'], grupos['tamanhos']) if grupos is not None else None
+
+    return _cache_graficos.obter(chave, construir)
+
+
+@medido('mapa de ocorrência')
+def gerar_mapa_ocorrencia(df_filtered, especie):
+    """
+    Gera mapa de ocorrência para uma espécie específica com visualização adaptada aos dados.
+    Registros com coordenadas idênticas viram um único ponto com o número de registros;
+    acima de LIMITE_PONTOS_MAPA pontos distintos, os marcadores são agrupados (clusters).
+    """
+    if 'Scientific Name' not in df_filtered.columns or 'Latitude' not in df_filtered.columns:
+        return None
+
+    # Filtrando pela espécie selecionada
+    df_especie = df_filtered[df_filtered['Scientific Name'] == especie].dropna(subset=['Latitude', 'Longitude'])
+
+    if len(df_especie) == 0:
+        return None
+
+    # Um ponto por coordenada, com o número de registros e o período
+    pontos = df_especie.groupby(['Latitude', 'Longitude'], sort=False).agg(
+        Local=('Location', 'first'),
+        Registros=('Latitude', 'size'),
+        Inicio=('Date', 'min'),
+        Fim=('Date', 'max')
+    ).reset_index()
+
+    latitudes = pontos['Latitude'].to_numpy()
+    longitudes = pontos['Longitude'].to_numpy()
+    inicio = pontos['Inicio'].dt.strftime('%d/%m/%Y').fillna('-')
+    fim = pontos['Fim'].dt.strftime('%d/%m/%Y').fillna('-')
+    periodos = np.where(inicio == fim, inicio, inicio + ' a ' + fim)
+
+    # Criando o mapa ajustado para mostrar todos os pontos (com margem mínima)
+    mapa = criar_mapa_satelite(latitudes, longitudes, margem_minima=0.01)
+
+    if len(pontos) > LIMITE_PONTOS_MAPA:
+        popups = (
+            'Local: ' + pontos['Local'].astype(str) + '<br>Registros: ' + pontos['Registros'].astype(str)
+            + '<br>Data: ' + pd.Series(periodos, index=pontos.index).astype(str)
+        )
+        FastMarkerCluster(
+            list(zip(latitudes.tolist(), longitudes.tolist(), popups.tolist())),
+            callback=CALLBACK_MARCADOR_AGRUPADO,
+            name='Registros'
+        ).add_to(mapa)
+        return mapa
+
+    # Uma única camada com todos os pontos
+    folium.GeoJson(
+        pontos_geojson(latitudes, longitudes, {
+            'Local': pontos['Local'].astype(str).to_numpy(),
+            'Registros': pontos['Registros'].to_numpy(),
+            'Data': periodos.astype(str)
+        }),
+        name='Registros',
+        marker=folium.Marker(icon=folium.Icon(color='green', icon='leaf', prefix='fa')),
+        popup=folium.GeoJsonPopup(fields=['Data', 'Local', 'Registros'], aliases=['Data:', 'Local:', 'Registros:'])
+    ).add_to(mapa)
+
+    return mapa
+
+
+# Número máximo de mapas mantidos em memória (cada mapa pode ter alguns MB)
+TAMANHO_CACHE_MAPAS = int(os.environ.get('DASHBIRDS_CACHE_MAPAS', 32))
+
+# Mapas (objetos do Folium, para o st_folium) e HTML renderizado dos mapas estáticos
+_cache_mapas = CacheLRU(TAMANHO_CACHE_MAPAS)
+_cache_html_mapas = CacheLRU(TAMANHO_CACHE_MAPAS)
+
+
+def construir_mapa(dados, filtros, tipo, especie=None, tamanho_celula=None):
+    """
+    Constrói o mapa do tipo pedido ('riqueza', 'riqueza_ameacadas' ou 'ocorrencia') para os
+    filtros ativos, sem cache. Com tamanho_celula (km), os mapas de riqueza agregam as
+    observações em uma grade espacial em vez de por local. Retorna None quando não há dados.
+    """
+    if tipo == 'ocorrencia':
+        # Apenas as observações da espécie, localizadas pelo índice por espécie
+        indice = obter_indice_especies(dados, filtros)
+        if indice is None or especie not in indice['linhas']:
+            return None
+        posicoes = detalhe_especie(indice, especie)['posicoes']
+        return gerar_mapa_ocorrencia(dados['tabela_dados'].take(posicoes), especie)
+
+    if tamanho_celula is not None:
+        indicador = 'especies_ameacadas' if tipo == 'riqueza_ameacadas' else None
+        resultado = riqueza_por_celula(dados, filtros, tamanho_celula, indicador)
+        return gerar_mapa_riqueza_grade(*resultado) if resultado is not None else None
+
+    dados_filtrados = filtrar_dados(dados['tabela_dados'], dados['indice_filtros'], filtros)
+
+    if tipo == 'riqueza':
+        return gerar_mapa_riqueza(dados_filtrados)
+
+    dados_ameacados = filtrar_especies_ameacadas(dados_filtrados, dados['tabela_especies'])
+    return gerar_mapa_riqueza(dados_ameacados) if not dados_ameacados.empty else None
+
+
+@medido('mapa')
+def obter_mapa(dados, filtros, tipo, especie=None, tamanho_celula=None):
+    """
+    Mapa do tipo pedido para os filtros ativos (ver construir_mapa), para exibição interativa.
+    Os mapas ficam em cache por (versão dos dados, filtros, tipo de mapa, espécie, tamanho da
+    célula): um mapa reaproveitado gera exatamente o mesmo HTML, que o Streamlit não reenvia ao
+    navegador. Retorna None quando não há dados para o mapa.
+    """
+    chave = (dados['versao'], tuple(sorted(filtros.items())), tipo, especie, tamanho_celula)
+    return _cache_mapas.obter(chave, lambda: construir_mapa(dados, filtros, tipo, especie, tamanho_celula))
+
+
+@medido('HTML do mapa')
+def obter_html_mapa(dados, filtros, tipo, especie=None, tamanho_celula=None):
+    """
+    Documento HTML completo do mapa pedido, para exibição estática (sem retorno de estado ao
+    script). Fica em cache com a mesma chave dos mapas; o objeto do mapa, construído apenas
+    para a renderização, não é mantido. Retorna None quando não há dados para o mapa.
+    """
+    chave = (dados['versao'], tuple(sorted(filtros.items())), tipo, especie, tamanho_celula)
+
+    def construir():
+        mapa = construir_mapa(dados, filtros, tipo, especie, tamanho_celula)
+        return mapa.get_root().render() if mapa is not None else None
+
+    return _cache_html_mapas.obter(chave, construir)
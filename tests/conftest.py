@@ -0,0 +1,51 @@
+"""
+Configuração comum dos testes: os módulos do dashboard ficam na raiz do repositório e os
+arquivos de exemplo das planilhas em tests/dados.
+"""
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+DIRETORIO_DADOS = os.path.join(RAIZ, 'tests', 'dados')
+
+
+def ler_arquivo_dados(nome):
+    """Conteúdo (bytes) de um arquivo de exemplo de tests/dados"""
+    with open(os.path.join(DIRETORIO_DADOS, nome), 'rb') as arquivo:
+        return arquivo.read()
+
+
+@pytest.fixture
+def snapshot_temporario(tmp_path, monkeypatch):
+    """Diretório do snapshot isolado por teste, sem memória compartilhada"""
+    import dashbirds_motor as motor
+
+    monkeypatch.setattr(motor, 'DIRETORIO_SNAPSHOT', str(tmp_path / 'snapshot'))
+    monkeypatch.setattr(motor, 'MEMORIA_COMPARTILHADA', False)
+    return tmp_path / 'snapshot'
+
+
+@pytest.fixture
+def executar_dashboard(monkeypatch, snapshot_temporario):
+    """Executa o dashboard (AppTest) em uma nova sessão, com os dados de tests/dados como fonte local"""
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    import dashbirds_motor as motor
+
+    monkeypatch.setattr(motor, 'FONTE_DADOS', 'csv')
+    monkeypatch.setattr(motor, 'CAMINHO_FONTE', DIRETORIO_DADOS)
+    # Atualizador de outro teste (com outro diretório de snapshot) não é reaproveitado
+    st.cache_resource.clear()
+
+    def executar():
+        app = AppTest.from_file(os.path.join(RAIZ, 'dashbirds.py'), default_timeout=60)
+        app.run()
+        assert not app.exception
+        return app
+
+    return executar
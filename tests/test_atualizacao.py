@@ -0,0 +1,234 @@
+"""
+Atualização do snapshot contra um servidor HTTP local que serve os CSV de tests/dados no
+lugar das planilhas: resposta 304, conteúdo com o mesmo hash, apenas novas linhas e
+alteração completa.
+"""
+import hashlib
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+import dashbirds_motor as motor
+from conftest import ler_arquivo_dados
+
+
+class ServidorPlanilhas:
+    """Servidor HTTP em uma porta livre, com o conteúdo de cada caminho e ETag opcional"""
+
+    def __init__(self):
+        self.conteudos = {}
+        self.usar_etag = True
+        self.respostas = []
+
+        servidor = self
+
+        class Tratador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                conteudo = servidor.conteudos.get(self.path)
+                if conteudo is None:
+                    self.send_response(404)
+                    self.end_headers()
+                    servidor.respostas.append((self.path, 404))
+                    return
+
+                etag = f'"{hashlib.sha256(conteudo).hexdigest()[:16]}"'
+                if servidor.usar_etag and self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    servidor.respostas.append((self.path, 304))
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/csv; charset=utf-8')
+                self.send_header('Content-Length', str(len(conteudo)))
+                if servidor.usar_etag:
+                    self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(conteudo)
+                servidor.respostas.append((self.path, 200))
+
+            def log_message(self, *args):
+                pass
+
+        self.http = ThreadingHTTPServer(('127.0.0.1', 0), Tratador)
+        self.url = f"http://127.0.0.1:{self.http.server_address[1]}"
+        self.thread = threading.Thread(target=self.http.serve_forever, daemon=True)
+        self.thread.start()
+
+    def fechar(self):
+        self.http.shutdown()
+        self.http.server_close()
+
+
+@pytest.fixture
+def servidor(monkeypatch, snapshot_temporario):
+    servidor = ServidorPlanilhas()
+    servidor.conteudos['/base.csv'] = ler_arquivo_dados('tabela_base.csv')
+    servidor.conteudos['/dados.csv'] = ler_arquivo_dados('tabela_dados.csv')
+
+    monkeypatch.setattr(motor, 'FONTE_DADOS', 'google_sheets')
+    monkeypatch.setattr(motor, 'URL_PLANILHA_BASE', f"{servidor.url}/base.csv")
+    monkeypatch.setattr(motor, 'URL_PLANILHA_DADOS', f"{servidor.url}/dados.csv")
+    yield servidor
+    servidor.fechar()
+
+
+def reconstrucao_completa(nome_dados):
+    """Tabelas processadas do zero a partir dos arquivos de exemplo"""
+    return motor.processar_dados(
+        motor.ler_csv(io.BytesIO(ler_arquivo_dados('tabela_base.csv'))),
+        motor.ler_csv(io.BytesIO(ler_arquivo_dados(nome_dados)))
+    )
+
+
+def test_primeira_carga(servidor):
+    erros = []
+    snapshot = motor.atualizar_snapshot(None, erros)
+
+    assert erros == []
+    assert snapshot is not None
+    assert 'acrescimo' not in snapshot[0]
+    assert motor.carregar_snapshot()[0]['versao'] == snapshot[0]['versao']
+    pd.testing.assert_frame_equal(snapshot[2], reconstrucao_completa('tabela_dados.csv')[1])
+
+
+def test_nao_modificado_304(servidor):
+    anterior = motor.atualizar_snapshot(None)
+    servidor.respostas.clear()
+
+    atualizado = motor.atualizar_snapshot(anterior)
+
+    assert sorted(servidor.respostas) == [('/base.csv', 304), ('/dados.csv', 304)]
+    assert atualizado[0]['versao'] == anterior[0]['versao']
+    assert atualizado[0]['atualizado_em'] >= anterior[0]['atualizado_em']
+    assert atualizado[1] is anterior[1] and atualizado[2] is anterior[2]
+
+
+def test_mesmo_hash_sem_validadores(servidor):
+    servidor.usar_etag = False
+    anterior = motor.atualizar_snapshot(None)
+    servidor.respostas.clear()
+
+    atualizado = motor.atualizar_snapshot(anterior)
+
+    # Sem ETag o servidor responde 200, e a planilha é reconhecida pelo hash do conteúdo
+    assert sorted(servidor.respostas) == [('/base.csv', 200), ('/dados.csv', 200)]
+    assert atualizado[0]['versao'] == anterior[0]['versao']
+    assert atualizado[1] is anterior[1] and atualizado[2] is anterior[2]
+
+
+def test_apenas_novas_linhas(servidor):
+    anterior = motor.atualizar_snapshot(None)
+    servidor.conteudos['/dados.csv'] = ler_arquivo_dados('tabela_dados_ampliada.csv')
+
+    atualizado = motor.atualizar_snapshot(anterior)
+
+    assert atualizado[0]['versao'] != anterior[0]['versao']
+    assert atualizado[0]['acrescimo'] == {
+        'versao_anterior': anterior[0]['versao'], 'linhas_anteriores': len(anterior[2])
+    }
+    tabela_base, tabela_dados = reconstrucao_completa('tabela_dados_ampliada.csv')
+    pd.testing.assert_frame_equal(atualizado[1], tabela_base)
+    pd.testing.assert_frame_equal(atualizado[2], tabela_dados)
+
+
+def test_alteracao_completa(servidor):
+    anterior = motor.atualizar_snapshot(None)
+    servidor.conteudos['/dados.csv'] = ler_arquivo_dados('tabela_dados_alterada.csv')
+
+    atualizado = motor.atualizar_snapshot(anterior)
+
+    assert atualizado[0]['versao'] != anterior[0]['versao']
+    assert 'acrescimo' not in atualizado[0]
+    pd.testing.assert_frame_equal(atualizado[2], reconstrucao_completa('tabela_dados_alterada.csv')[1])
+    assert motor.carregar_snapshot()[0]['versao'] == atualizado[0]['versao']
+
+
+def test_falha_no_download(servidor):
+    anterior = motor.atualizar_snapshot(None)
+    del servidor.conteudos['/dados.csv']
+    erros = []
+
+    assert motor.atualizar_snapshot(anterior, erros) is None
+    assert len(erros) == 1 and '404' in erros[0]
+
+
+@pytest.mark.parametrize('conteudo', [
+    'Scientific Name,Location\nEspécie,Localização\n'.encode('latin-1'),
+    b'Scientific Name,Location\n"Genus0 species0,Local 0\n'
+], ids=['latin-1', 'mal formado'])
+def test_csv_ilegivel(servidor, snapshot_temporario, conteudo):
+    servidor.conteudos['/dados.csv'] = conteudo
+    erros = []
+
+    assert motor.atualizar_snapshot(None, erros) is None
+    assert len(erros) == 1 and 'Não foi possível ler o CSV' in erros[0]
+
+    # Na primeira carga, o erro chega à interface pelo atualizador em vez de uma exceção
+    atualizador = motor.AtualizadorDados(3600)
+    assert atualizador.carregar() is False
+    assert atualizador.erros == erros
+
+
+def test_iniciar_durante_atualizacao(servidor, monkeypatch):
+    atualizador = motor.AtualizadorDados(3600)
+    assert atualizador.carregar() is True
+    anterior = atualizador.dados
+
+    iniciada = threading.Event()
+    liberar = threading.Event()
+
+    def atualizar_snapshot_lento(snapshot, erros=None):
+        # Leitura da fonte demorada: só termina quando o teste libera
+        iniciada.set()
+        liberar.wait(10)
+        metadados = {**snapshot[0], 'versao': 'nova', 'atualizado_em': snapshot[0]['atualizado_em'] + 1}
+        return metadados, snapshot[1], snapshot[2]
+
+    monkeypatch.setattr(motor, 'atualizar_snapshot', atualizar_snapshot_lento)
+    atualizador.intervalo = 0  # snapshot sempre vencido para atualizar()
+    atualizacao = threading.Thread(target=atualizador.atualizar)
+    atualizacao.start()
+    assert iniciada.wait(10)
+
+    # Cada execução do script chama iniciar() e lê os dados atuais sem esperar pela atualização
+    execucao = threading.Thread(target=atualizador.iniciar)
+    execucao.start()
+    execucao.join(2)
+    bloqueada = execucao.is_alive()
+    assert atualizador.dados is anterior
+
+    liberar.set()
+    atualizacao.join(10)
+    assert not bloqueada
+    assert atualizador.dados['versao'] == 'nova'
+    assert atualizador.erros == []
+
+
+def test_dados_somente_leitura(servidor):
+    atualizador = motor.AtualizadorDados(3600)
+    assert atualizador.carregar() is True
+    dados = atualizador.dados
+    original = reconstrucao_completa('tabela_dados.csv')[1]
+
+    with pytest.raises(TypeError):
+        dados['versao'] = 'outra'
+
+    for nome in ['tabela_base', 'tabela_dados', 'tabela_especies', 'tabela_listas', 'cubo']:
+        tabela = dados[nome]
+        for posicao, coluna in enumerate(tabela.columns):
+            if isinstance(tabela[coluna].dtype, pd.StringDtype):
+                continue  # textos do pyarrow, imutáveis
+            # Nas colunas de datas, o pandas transforma o erro de escrita em AssertionError
+            with pytest.raises((ValueError, AssertionError)):
+                tabela.iloc[0, posicao] = tabela.iloc[1, posicao]
+
+    for indice in ['indice_filtros', 'indice_cubo']:
+        for posicoes_por_valor in dados[indice].values():
+            assert not any(posicoes.flags.writeable for posicoes in posicoes_por_valor.values())
+    assert not any(array.flags.writeable for array in dados['sazonalidade'].values())
+
+    pd.testing.assert_frame_equal(dados['tabela_dados'], original)
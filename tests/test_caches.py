@@ -0,0 +1,60 @@
+"""
+Caches do processo entre execuções do script: o dashboard é executado com o AppTest do
+Streamlit sobre os arquivos de exemplo (fonte local em CSV) e, depois da primeira execução,
+uma nova sessão com as mesmas escolhas deve encontrar em cache tudo o que a primeira construiu.
+"""
+import pytest
+
+import dashbirds_motor as motor
+import dashbirds_visualizacoes as visualizacoes
+
+
+def contar_construcoes(monkeypatch, cache):
+    """Número de consultas ao cache e chaves construídas ('construidas'), atualizados a cada consulta"""
+    contagem = {'consultas': 0, 'construidas': []}
+    obter = cache.obter
+
+    def obter_contando(chave, construir):
+        def construir_contando():
+            contagem['construidas'].append(chave)
+            return construir()
+
+        contagem['consultas'] += 1
+        return obter(chave, construir_contando)
+
+    monkeypatch.setattr(cache, 'obter', obter_contando)
+    return contagem
+
+
+def verificar_cache(monkeypatch, executar_dashboard, cache):
+    # Os arquivos de exemplo têm a mesma versão em todos os testes: começa sem nada em cache
+    monkeypatch.setattr(cache, 'itens', type(cache.itens)())
+    contagem = contar_construcoes(monkeypatch, cache)
+
+    executar_dashboard()
+    assert contagem['construidas']
+
+    contagem['consultas'] = 0
+    contagem['construidas'].clear()
+    executar_dashboard()
+    assert contagem['consultas'] > 0
+    assert contagem['construidas'] == []
+
+
+def test_cache_graficos(monkeypatch, executar_dashboard):
+    verificar_cache(monkeypatch, executar_dashboard, visualizacoes._cache_graficos)
+
+
+@pytest.mark.parametrize('interativos', ['', 'riqueza'], ids=['estáticos', 'interativos'])
+def test_cache_mapas(monkeypatch, executar_dashboard, interativos):
+    monkeypatch.setenv('DASHBIRDS_MAPAS_INTERATIVOS', interativos)
+    cache = visualizacoes._cache_mapas if interativos else visualizacoes._cache_html_mapas
+    verificar_cache(monkeypatch, executar_dashboard, cache)
+
+
+def test_cache_indices_especies(monkeypatch, executar_dashboard):
+    verificar_cache(monkeypatch, executar_dashboard, motor._cache_indices_especies)
+
+
+def test_cache_resumos(monkeypatch, executar_dashboard):
+    verificar_cache(monkeypatch, executar_dashboard, motor._cache_resumos)
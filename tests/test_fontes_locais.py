@@ -0,0 +1,116 @@
+"""
+Fontes de dados locais (CSV, Parquet e SQLite): arquivos que não podem ser lidos viram a
+mensagem de erro do resultado, exibida pelo dashboard, em vez de uma exceção.
+"""
+import io
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+import pytest
+
+import dashbirds_motor as motor
+from conftest import ler_arquivo_dados
+
+
+@pytest.fixture
+def fonte_local(tmp_path, monkeypatch):
+    monkeypatch.setattr(motor, 'CAMINHO_FONTE', str(tmp_path))
+    return tmp_path
+
+
+@pytest.mark.parametrize('conteudo', [
+    'Scientific Name,Location\nEspécie,Localização\n'.encode('latin-1'),
+    b'Scientific Name,Location\n"Genus0 species0,Local 0\n',
+    b''
+], ids=['latin-1', 'mal formado', 'vazio'])
+def test_csv_ilegivel(fonte_local, conteudo):
+    (fonte_local / 'tabela_dados.csv').write_bytes(conteudo)
+
+    resultado = motor.ler_fonte_csv('dados')
+
+    assert resultado['tabela'] is None
+    assert 'tabela_dados.csv' in resultado['erro']
+
+
+def test_parquet_ilegivel(fonte_local):
+    (fonte_local / 'tabela_base.parquet').write_bytes(b'PAR1 corrompido')
+
+    resultado = motor.ler_fonte_parquet('base')
+
+    assert resultado['tabela'] is None
+    assert 'tabela_base.parquet' in resultado['erro']
+
+
+def test_parquet_com_listas(fonte_local):
+    # Lido pelo pyarrow, mas sem hash por linha (listas não são hasheáveis)
+    pd.DataFrame({'Scientific Name': [['Genus0', 'species0']]}).to_parquet(fonte_local / 'tabela_dados.parquet')
+
+    resultado = motor.ler_fonte_parquet('dados')
+
+    assert resultado['tabela'] is None
+    assert 'tabela_dados.parquet' in resultado['erro']
+
+
+def test_sqlite_texto_invalido(fonte_local, monkeypatch):
+    caminho = fonte_local / 'dashbirds.db'
+    with closing(sqlite3.connect(caminho)) as conexao:
+        conexao.execute('CREATE TABLE tabela_dados ("Scientific Name" TEXT)')
+        conexao.execute("INSERT INTO tabela_dados VALUES (CAST(X'FF00' AS TEXT))")
+        conexao.commit()
+    monkeypatch.setattr(motor, 'CAMINHO_FONTE', str(caminho))
+
+    resultado = motor.ler_fonte_sqlite('dados')
+
+    assert resultado['tabela'] is None
+    assert 'tabela_dados' in resultado['erro']
+
+
+def test_carga_com_fonte_ilegivel(fonte_local, monkeypatch, snapshot_temporario):
+    (fonte_local / 'tabela_base.csv').write_bytes(b'Nome cient\xedfico\nGenus0 species0\n')
+    (fonte_local / 'tabela_dados.csv').write_bytes(b'Scientific Name\nGenus0 species0\n')
+    monkeypatch.setattr(motor, 'FONTE_DADOS', 'csv')
+
+    atualizador = motor.AtualizadorDados(3600)
+
+    assert atualizador.carregar() is False
+    assert len(atualizador.erros) == 1 and 'tabela_base.csv' in atualizador.erros[0]
+
+
+def copiar_fonte_csv(diretorio, nome_dados='tabela_dados.csv'):
+    diretorio.mkdir()
+    (diretorio / 'tabela_base.csv').write_bytes(ler_arquivo_dados('tabela_base.csv'))
+    (diretorio / 'tabela_dados.csv').write_bytes(ler_arquivo_dados(nome_dados))
+    return diretorio
+
+
+def test_troca_de_fonte(tmp_path, monkeypatch, snapshot_temporario):
+    monkeypatch.setattr(motor, 'FONTE_DADOS', 'csv')
+    monkeypatch.setattr(motor, 'CAMINHO_FONTE', str(copiar_fonte_csv(tmp_path / 'csv')))
+    atualizador = motor.AtualizadorDados(3600)
+    assert atualizador.carregar() is True
+    versao_csv = atualizador.dados['versao']
+    assert motor.carregar_snapshot()[0]['caminho_fonte'] == str(tmp_path / 'csv')
+
+    # Outro tipo de fonte, com as observações alteradas: o snapshot (ainda válido) do CSV é ignorado
+    diretorio_parquet = tmp_path / 'parquet'
+    diretorio_parquet.mkdir()
+    for nome, arquivo in [('tabela_base', 'tabela_base.csv'), ('tabela_dados', 'tabela_dados_alterada.csv')]:
+        motor.ler_csv(io.BytesIO(ler_arquivo_dados(arquivo))).to_parquet(diretorio_parquet / f"{nome}.parquet")
+    monkeypatch.setattr(motor, 'FONTE_DADOS', 'parquet')
+    monkeypatch.setattr(motor, 'CAMINHO_FONTE', str(diretorio_parquet))
+
+    assert motor.carregar_snapshot() is None
+    novo_processo = motor.AtualizadorDados(3600)
+    assert novo_processo.carregar() is True
+    assert novo_processo.dados['versao'] != versao_csv
+    assert motor.carregar_snapshot()[0]['fonte'] == 'parquet'
+
+    # Mesmo tipo de fonte em outro caminho: a atualização lê a nova fonte em vez do snapshot recente
+    monkeypatch.setattr(motor, 'FONTE_DADOS', 'csv')
+    monkeypatch.setattr(motor, 'CAMINHO_FONTE', str(copiar_fonte_csv(tmp_path / 'ampliada', 'tabela_dados_ampliada.csv')))
+
+    atualizador.atualizar()
+    assert atualizador.erros == []
+    assert len(atualizador.dados['tabela_dados']) == 48
+    assert motor.carregar_snapshot()[0]['caminho_fonte'] == str(tmp_path / 'ampliada')
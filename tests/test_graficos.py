@@ -0,0 +1,37 @@
+"""
+Gráficos gerais sobre os arquivos de exemplo, incluindo uma tabela base sem a coluna dos nomes
+científicos (tabelas não combináveis), caso em que os gráficos por espécie da tabela base não
+são gerados e o dashboard informa que os dados são insuficientes.
+"""
+import io
+
+import pytest
+
+import dashbirds_motor as motor
+import dashbirds_visualizacoes as visualizacoes
+from conftest import ler_arquivo_dados
+
+
+def montar_dados(versao, sem_coluna_base=None):
+    tabela_base = motor.ler_csv(io.BytesIO(ler_arquivo_dados('tabela_base.csv')))
+    tabela_dados = motor.ler_csv(io.BytesIO(ler_arquivo_dados('tabela_dados.csv')))
+    if sem_coluna_base is not None:
+        tabela_base = tabela_base.drop(columns=sem_coluna_base)
+    return motor.montar_conjunto_dados({'versao': versao}, *motor.processar_dados(tabela_base, tabela_dados))
+
+
+@pytest.mark.parametrize('tipo', list(visualizacoes.GRAFICOS_GERAIS))
+def test_graficos_gerais(tipo):
+    dados = montar_dados('graficos')
+
+    assert visualizacoes.obter_grafico_geral(dados, {}, tipo) is not None
+
+
+@pytest.mark.parametrize('tipo', ['familias', 'habitats', 'nicho_trofico'])
+def test_graficos_sem_nome_cientifico(tipo):
+    dados = montar_dados('graficos-sem-nome-cientifico', 'Nome científico')
+    assert dados['avisos']
+
+    assert visualizacoes.obter_grafico_geral(dados, {}, tipo) is None
+    # As observações não dependem da tabela base
+    assert visualizacoes.obter_grafico_geral(dados, {}, 'especies') is not None
@@ -0,0 +1,145 @@
+"""
+Equivalência dos indicadores principais com a implementação original, que filtrava a junção
+completa das observações com a tabela base: a versão atual soma os indicadores da tabela de
+espécies sobre os IDs das espécies presentes, a partir do índice de filtros e em cache.
+"""
+import io
+import itertools
+
+import pandas as pd
+import pytest
+
+import dashbirds_motor as motor
+from conftest import ler_arquivo_dados
+
+COLUNAS_FILTRO = ['Year', 'Location', 'Habitat (AVONET)']
+
+
+def calcular_indicadores_referencia(df_filtered):
+    """calcular_indicadores como na versão original do dashboard (sobre a junção completa)"""
+    n_registros = len(df_filtered)
+    n_especies = df_filtered['Scientific Name'].nunique() if 'Scientific Name' in df_filtered.columns else 0
+    n_localizacoes = df_filtered['Location'].nunique() if 'Location' in df_filtered.columns else 0
+    n_listas = df_filtered['ListID'].nunique() if 'ListID' in df_filtered.columns else 458
+
+    if 'Date' in df_filtered.columns:
+        data_inicio = df_filtered['Date'].min().strftime('%d/%m/%Y')
+        data_fim = df_filtered['Date'].max().strftime('%d/%m/%Y')
+        periodo_dados = f"{data_inicio} a {data_fim}"
+    else:
+        periodo_dados = "03/02/2025 a 15/02/2025"
+
+    categorias = ['Vulnerável', 'Em perigo', 'Criticamente ameaçada', 'Quase ameaçada', 'VU', 'EN', 'CR', 'NT']
+
+    especies_ameacadas_iucn = 0
+    if 'IUCN 2021' in df_filtered.columns:
+        especies_ameacadas_iucn = df_filtered[
+            df_filtered['IUCN 2021'].isin(categorias)
+        ]['Scientific Name'].nunique()
+
+    especies_ameacadas_brasil = 0
+    if 'MMA 2022' in df_filtered.columns:
+        especies_ameacadas_brasil = df_filtered[
+            df_filtered['MMA 2022'].isin(categorias)
+        ]['Scientific Name'].nunique()
+
+    especies_ameacadas_estado = 0
+    if 'Ameaçadas Bahia 2017' in df_filtered.columns:
+        especies_ameacadas_estado = df_filtered[
+            df_filtered['Ameaçadas Bahia 2017'].notna() &
+            (df_filtered['Ameaçadas Bahia 2017'] != '')
+            ]['Scientific Name'].nunique()
+
+    endemicas_brasil = 0
+    if 'Endêmicas do Brasil (CBRO 2021)' in df_filtered.columns:
+        endemicas_brasil = df_filtered[df_filtered['Endêmicas do Brasil (CBRO 2021)'] == 1][
+            'Scientific Name'].nunique()
+
+    endemicas_mata_atlantica = 0
+    if 'Espécies Endêmicas da Mata Atlântica' in df_filtered.columns:
+        endemicas_mata_atlantica = df_filtered[df_filtered['Espécies Endêmicas da Mata Atlântica'] == 1][
+            'Scientific Name'].nunique()
+
+    migratorias = 0
+    if 'Migratórias Somenzari et al. 2017' in df_filtered.columns:
+        migratorias = df_filtered[df_filtered['Migratórias Somenzari et al. 2017'].notna()][
+            'Scientific Name'].nunique()
+
+    return {
+        'n_registros': n_registros,
+        'n_especies': n_especies,
+        'n_localizacoes': n_localizacoes,
+        'n_listas': n_listas,
+        'periodo_dados': periodo_dados,
+        'especies_ameacadas_iucn': especies_ameacadas_iucn,
+        'especies_ameacadas_brasil': especies_ameacadas_brasil,
+        'especies_ameacadas_estado': especies_ameacadas_estado,
+        'endemicas_brasil': endemicas_brasil,
+        'endemicas_mata_atlantica': endemicas_mata_atlantica,
+        'migratorias': migratorias
+    }
+
+
+def juncao_referencia(tabela_base, tabela_dados):
+    """Datas convertidas e junção das observações com a tabela base, como na versão original"""
+    if 'Date' in tabela_dados.columns:
+        tabela_dados['Date'] = pd.to_datetime(tabela_dados['Date'], errors='coerce')
+        tabela_dados['Year'] = tabela_dados['Date'].dt.year
+        tabela_dados['Month'] = tabela_dados['Date'].dt.month
+
+    tabela_dados['species_key'] = tabela_dados['Scientific Name'].str.strip().str.lower()
+    tabela_base['species_key'] = tabela_base['Nome científico'].str.strip().str.lower()
+    return pd.merge(tabela_dados, tabela_base, on='species_key', how='left', suffixes=('_obs', '_base'))
+
+
+def filtrar_referencia(dados_completos, filtros):
+    for coluna, valor in filtros.items():
+        dados_completos = dados_completos[dados_completos[coluna] == valor]
+    return dados_completos
+
+
+def ler_tabelas(sem_coluna):
+    tabela_base = motor.ler_csv(io.BytesIO(ler_arquivo_dados('tabela_base.csv')))
+    tabela_dados = motor.ler_csv(io.BytesIO(ler_arquivo_dados('tabela_dados.csv')))
+    if sem_coluna is not None:
+        tabela_dados = tabela_dados.drop(columns=sem_coluna)
+    return tabela_base, tabela_dados
+
+
+def combinacoes_filtros(opcoes):
+    """Todos os filtros com cada valor de ano, local e habitat (ou sem o filtro), mais um sem registros"""
+    valores = [[None, *opcoes.get(coluna, [])] for coluna in COLUNAS_FILTRO]
+    for combinacao in itertools.product(*valores):
+        yield {coluna: valor for coluna, valor in zip(COLUNAS_FILTRO, combinacao) if valor is not None}
+
+
+@pytest.mark.parametrize('sem_coluna', [None, 'ListID', 'Date'], ids=['completo', 'sem ListID', 'sem Date'])
+def test_indicadores_equivalentes(sem_coluna):
+    dados_completos = juncao_referencia(*ler_tabelas(sem_coluna))
+    dados = motor.montar_conjunto_dados(
+        {'versao': f"indicadores-{sem_coluna}"}, *motor.processar_dados(*ler_tabelas(sem_coluna))
+    )
+
+    combinacoes = list(combinacoes_filtros(dados['opcoes_filtros']))
+    assert len(combinacoes) > 10
+
+    selecoes_vazias = 0
+    for filtros in combinacoes:
+        df_filtered = filtrar_referencia(dados_completos, filtros)
+        indicadores = dict(motor.obter_indicadores(dados, filtros))
+
+        if df_filtered.empty and 'Date' in df_filtered.columns:
+            # A versão original falhava aqui (NaT.strftime); a atual informa o período vazio
+            with pytest.raises(ValueError):
+                calcular_indicadores_referencia(df_filtered)
+            assert indicadores.pop('periodo_dados') == "Sem registros"
+            esperado = calcular_indicadores_referencia(df_filtered.drop(columns='Date'))
+            del esperado['periodo_dados']
+            selecoes_vazias += 1
+        else:
+            esperado = calcular_indicadores_referencia(df_filtered)
+
+        assert indicadores == esperado, filtros
+
+    # As combinações incluem seleções sem nenhuma observação
+    assert selecoes_vazias > 0 or sem_coluna == 'Date'
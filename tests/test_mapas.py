@@ -0,0 +1,28 @@
+"""
+Exibição dos mapas estáticos: HTML em um iframe (st.iframe), com o components.html como
+alternativa nas versões do Streamlit sem o st.iframe.
+"""
+import streamlit as st
+import streamlit.components.v1 as components
+
+
+def test_mapas_estaticos_em_iframe(executar_dashboard, monkeypatch):
+    html = []
+    monkeypatch.setattr(components, 'html', lambda *args, **kwargs: html.append(args))
+
+    app = executar_dashboard()
+
+    iframes = app.get('iframe')
+    assert iframes and all(iframe.proto.WhichOneof('type') == 'srcdoc' for iframe in iframes)
+    assert html == []
+
+
+def test_mapas_estaticos_sem_st_iframe(executar_dashboard, monkeypatch):
+    html = []
+    monkeypatch.delattr(st, 'iframe')
+    monkeypatch.setattr(components, 'html', lambda mapa, **kwargs: html.append(mapa))
+
+    app = executar_dashboard()
+
+    assert not list(app.get('iframe'))
+    assert html and all(mapa.lstrip().lower().startswith('<!doctype html>') for mapa in html)
@@ -0,0 +1,79 @@
+"""
+Perfil de execução: o pico de memória de uma etapa só é registrado quando nenhuma outra coleta
+executou ao mesmo tempo, pois o tracemalloc mede (e reinicia o pico de) o processo inteiro.
+"""
+import threading
+import tracemalloc
+
+import numpy as np
+import pytest
+
+import dashbirds_motor as motor
+
+MB = 2 ** 20
+
+
+@pytest.fixture(autouse=True)
+def perfil_ativo(monkeypatch):
+    monkeypatch.setattr(motor, 'PERFIL_ATIVO', True)
+    ativo = tracemalloc.is_tracing()
+    yield
+    if not ativo:
+        tracemalloc.stop()
+
+
+def alocar(mb):
+    """Aloca e libera um bloco de 'mb' MB (pico sem saldo)"""
+    bloco = np.ones(mb * MB, dtype=np.uint8)
+    return int(bloco[0])
+
+
+def test_pico_sem_concorrencia():
+    with motor.coletar_perfil() as registros:
+        with motor.medir_etapa('externa'):
+            with motor.medir_etapa('interna'):
+                alocar(8)
+
+    externa, interna = registros
+    assert interna['pico_mb'] >= 8
+    assert externa['pico_mb'] >= interna['pico_mb']
+    assert abs(interna['alocado_mb']) < 1
+
+
+def test_pico_com_coletas_simultaneas():
+    juntas = threading.Barrier(2)
+    resultados = {}
+
+    def coletar(nome):
+        with motor.coletar_perfil() as registros:
+            with motor.medir_etapa(nome):
+                juntas.wait(5)
+                alocar(4)
+                juntas.wait(5)
+        resultados[nome] = registros
+
+    threads = [threading.Thread(target=coletar, args=(nome,)) for nome in ['a', 'b']]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert [registro['pico_mb'] for registros in resultados.values() for registro in registros] == [None, None]
+    assert all(registros[0]['tempo_ms'] > 0 for registros in resultados.values())
+
+
+@pytest.mark.parametrize('trabalhadores', [0, 2], ids=['em sequência', 'pool'])
+def test_pico_das_construcoes(monkeypatch, trabalhadores):
+    monkeypatch.setattr(motor, 'TRABALHADORES_PARALELOS', trabalhadores)
+
+    with motor.coletar_perfil() as registros:
+        with motor.medir_etapa('execução'):
+            motor.executar_em_paralelo('construção', alocar, 8).result()
+
+    execucao, construcao = registros
+    if trabalhadores == 0:
+        # Na própria thread, o pico da construção conta para a etapa que a disparou
+        assert construcao['pico_mb'] >= 8
+        assert execucao['pico_mb'] >= construcao['pico_mb']
+    else:
+        assert execucao['pico_mb'] is None and construcao['pico_mb'] is None